@@ -1,9 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator, Tuple
+import asyncio
+import json
+import math
+import struct
+import time
+
+from core.sensor_partitions import to_epoch
+from utils.decimation import MinMaxDecimator
 
 router = APIRouter()  # Data collection API routes
 
+# Points per streamed chunk, and the binary point layout (ts, value)
+STREAM_BATCH_POINTS = 500
+# Rows read per reader-connection checkout when streaming sensor data
+SENSOR_PAGE_ROWS = 2000
+_POINT_STRUCT = struct.Struct("<dd")
+
 # Import global host_processor from main module
 def get_host_processor():
     """Get the host processor instance from main module"""
@@ -29,16 +44,177 @@ async def get_latest_data():
 
 @router.get("/history")
 async def get_historical_data(
+    device_id: Optional[str] = None,
     start_time: str = None,
     end_time: str = None,
-    limit: int = 100
+    limit: int = 100,
+    width: Optional[int] = Query(None, ge=1, le=20000),
+    format: str = Query("ndjson", pattern="^(ndjson|binary)$"),
+    history_id: Optional[str] = None,
+    channel: str = Query("A", pattern="^[ABab]$")
 ):
-    return {
-        "data": [],
-        "start_time": start_time,
-        "end_time": end_time,
-        "count": 0
-    }
+    """
+    Stream stored time-series data in constant memory.
+
+    Sources:
+        device_id  - sensor data from the day partitions / rollup tables
+        history_id - detector elution curve from the chunk store (ts = seconds since start)
+
+    Args:
+        start_time/end_time: ISO timestamps for device_id; seconds since run start for history_id
+        width: target pixel width; when set, output is min/max decimated to at most
+               2 points per pixel and long ranges are read from the coarsest rollup that fits
+        limit: max raw points when width is not set (0 = unlimited)
+        format: "ndjson" (meta line, one point per line, end line) or
+                "binary" (little-endian float64 pairs: ts, value)
+    """
+    if not device_id and not history_id:
+        raise HTTPException(status_code=400, detail="device_id or history_id is required")
+
+    try:
+        # Elution curves are indexed by seconds since run start, sensor data by wall-clock time
+        parse = _to_seconds if history_id else to_epoch
+        start_ts = parse(start_time)
+        end_ts = parse(end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid time format: {e}")
+
+    if history_id:
+        from data.elution_curve_store import ElutionCurveChunkStore
+
+        store = ElutionCurveChunkStore()
+        if start_ts is None:
+            start_ts = 0.0
+        if end_ts is None:
+            # 洗脱曲线每秒一个点：终点为最后一个已保存的点
+            total_points = await asyncio.to_thread(store.persisted_points, history_id)
+            end_ts = float(max(total_points - 1, 0))
+        source = _iter_elution_points(store, history_id, channel.upper(), start_ts, end_ts)
+        meta = {"source": "elution_curve", "history_id": history_id, "channel": channel.upper(), "level": "raw"}
+    else:
+        db_manager = get_db_manager()
+        if not db_manager:
+            raise HTTPException(status_code=503, detail="Database not initialized")
+
+        end_ts = end_ts if end_ts is not None else time.time()
+        start_ts = start_ts if start_ts is not None else end_ts - 3600
+        level = db_manager.sensor_store.level_for_bucket((end_ts - start_ts) / width) if width else None
+        source = _iter_sensor_points(db_manager, device_id, start_ts, end_ts, level)
+        meta = {"source": "sensor_data", "device_id": device_id, "level": level or "raw"}
+
+    meta.update({"start_ts": start_ts, "end_ts": end_ts, "width": width})
+    points = _decimate(source, start_ts, end_ts, width) if width else _limit(source, limit)
+
+    if format == "binary":
+        headers = {f"X-History-{key.replace('_', '-').title()}": str(value) for key, value in meta.items()}
+        return StreamingResponse(_binary_stream(points), media_type="application/octet-stream", headers=headers)
+    return StreamingResponse(_ndjson_stream(meta, points), media_type="application/x-ndjson")
+
+
+def _to_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a numeric offset in seconds (elution curve bounds); None stays None"""
+    if value is None or value == "":
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = math.nan
+    if not math.isfinite(seconds):
+        raise ValueError(f"expected seconds since run start, got {value!r}")
+    return seconds
+
+
+def get_db_manager():
+    """Get the database manager instance from main module"""
+    import main
+    return getattr(main, 'db_manager', None)
+
+
+async def _iter_sensor_points(db_manager, device_id: str, start_ts: float, end_ts: float,
+                              level: Optional[str]) -> AsyncIterator[Tuple[float, float, float]]:
+    """Yield (ts, min, max) rows in time order, borrowing a reader connection once per page"""
+    after = None
+    while True:
+        # Slow clients must not pin a reader for the whole response
+        async with db_manager.get_connection(readonly=True) as conn:
+            rows, after = await db_manager.sensor_store.read_page(
+                conn, device_id, start_ts, end_ts, level, after, SENSOR_PAGE_ROWS)
+        for ts, value_min, value_max, _ in rows:
+            yield ts, value_min, value_max
+        if after is None:
+            break
+
+
+async def _iter_elution_points(store, history_id: str, channel: str, start_ts: float,
+                               end_ts: float) -> AsyncIterator[Tuple[float, float, float]]:
+    """Yield (second, value, value) from the elution curve chunk store, one chunk at a time"""
+    from data.elution_curve_store import CHANNELS
+
+    start = max(int(start_ts), 0)
+    end = int(end_ts) + 1
+    chunks = store.iter_chunks(history_id, start, end)
+    column = 0 if channel == "A" else 1
+
+    try:
+        while True:
+            item = await asyncio.to_thread(next, chunks, None)
+            if item is None:
+                break
+            offset, values = item
+            for i in range(len(values) // CHANNELS):
+                index = offset + i
+                if index < start or index >= end:
+                    continue
+                value = values[i * CHANNELS + column]
+                yield float(index), value, value
+    finally:
+        # 客户端提前断开时停止读取
+        chunks.close()
+
+
+async def _limit(source: AsyncIterator, limit: int) -> AsyncIterator[Tuple[float, float]]:
+    count = 0
+    async for ts, value, _ in source:
+        if limit and count >= limit:
+            break
+        count += 1
+        yield ts, value
+
+
+async def _decimate(source: AsyncIterator, start_ts: float, end_ts: float,
+                    width: int) -> AsyncIterator[Tuple[float, float]]:
+    decimator = MinMaxDecimator(start_ts, end_ts, width)
+    async for ts, value_min, value_max in source:
+        for point in decimator.add(ts, value_min, value_max):
+            yield point
+    for point in decimator.finish():
+        yield point
+
+
+async def _ndjson_stream(meta: Dict[str, Any], points: AsyncIterator) -> AsyncIterator[bytes]:
+    yield (json.dumps({"type": "meta", **meta}) + "\n").encode()
+    count = 0
+    lines: List[str] = []
+    async for ts, value in points:
+        lines.append(f'{{"ts":{ts!r},"value":{value!r}}}')
+        count += 1
+        if len(lines) >= STREAM_BATCH_POINTS:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+    yield (json.dumps({"type": "end", "count": count}) + "\n").encode()
+
+
+async def _binary_stream(points: AsyncIterator) -> AsyncIterator[bytes]:
+    batch = bytearray()
+    async for ts, value in points:
+        batch += _POINT_STRUCT.pack(ts, value)
+        if len(batch) >= STREAM_BATCH_POINTS * _POINT_STRUCT.size:
+            yield bytes(batch)
+            batch.clear()
+    if batch:
+        yield bytes(batch)
 
 @router.get("/detector/{device_name}")
 async def get_detector_data(device_name: str = "detector_1"):
@@ -64,6 +240,93 @@ async def get_default_detector_data():
     """Get data for default detector (detector_1)"""
     return await get_detector_data("detector_1")
 
+@router.get("/detector-coalescing")
+async def get_detector_coalescing():
+    """Get detector frame coalescing settings and statistics"""
+    host_processor = get_host_processor()
+
+    if not host_processor:
+        raise HTTPException(status_code=503, detail="Data processor not initialized")
+
+    return host_processor.detector_coalescer.get_stats()
+
+@router.put("/detector-coalescing")
+async def set_detector_coalescing(
+    enabled: bool = Query(..., description="Publish detector samples as frames on chromatography/detector/{device}/frame"),
+    max_samples: Optional[int] = Query(None, ge=1, le=1000, description="Samples per frame"),
+    max_interval: Optional[float] = Query(None, gt=0, le=60, description="Frame time window in seconds")
+):
+    """
+    Enable/disable detector frame coalescing.
+    When enabled, per-sample signal/retention_time messages are replaced by frame messages,
+    and wavelength is published (retained) only when it changes.
+    """
+    host_processor = get_host_processor()
+
+    if not host_processor:
+        raise HTTPException(status_code=503, detail="Data processor not initialized")
+
+    try:
+        host_processor.set_detector_coalescing(enabled, max_samples, max_interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return host_processor.detector_coalescer.get_stats()
+
+@router.get("/detector-streaming")
+async def get_detector_streaming():
+    """Get detector continuous-acquisition state (sample rate, buffered samples, lost samples)"""
+    host_processor = get_host_processor()
+
+    if not host_processor:
+        raise HTTPException(status_code=503, detail="Data processor not initialized")
+
+    return host_processor.get_detector_streaming_status()
+
+@router.put("/detector-streaming")
+async def set_detector_streaming(
+    enabled: bool = Query(..., description="Sample the detector continuously into a timestamped ring buffer"),
+    sample_rate: Optional[float] = Query(None, gt=0, le=100, description="Sampling rate in Hz"),
+    device_id: Optional[str] = Query(None, description="Detector device ID (all detectors if omitted)")
+):
+    """
+    Enable/disable detector continuous acquisition.
+    Samples are timestamped on arrival and published as frames on
+    chromatography/detector/{device}/frame each collection cycle.
+    """
+    host_processor = get_host_processor()
+
+    if not host_processor:
+        raise HTTPException(status_code=503, detail="Data processor not initialized")
+
+    try:
+        return await host_processor.set_detector_streaming(enabled, sample_rate, device_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/deadband")
+async def get_deadband():
+    """Get change-only publishing rules and published/suppressed counters"""
+    host_processor = get_host_processor()
+
+    if not host_processor:
+        raise HTTPException(status_code=503, detail="Data processor not initialized")
+
+    return host_processor.deadband.get_stats()
+
+@router.put("/deadband")
+async def set_deadband(enabled: bool = Query(..., description="Publish slow-moving status topics only on change or heartbeat")):
+    """Enable/disable change-only (deadband) publishing for pressure, bubble, pump and relay topics"""
+    host_processor = get_host_processor()
+
+    if not host_processor:
+        raise HTTPException(status_code=503, detail="Data processor not initialized")
+
+    host_processor.deadband.enabled = enabled
+    if not enabled:
+        host_processor.deadband.reset()
+    return host_processor.deadband.get_stats()
+
 @router.get("/all-devices")
 async def get_all_device_data():
     """Get latest data for all registered devices"""
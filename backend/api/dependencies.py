@@ -4,8 +4,8 @@ API Dependency Injection Factories
 """
 
 from typing import Optional
-from core.mqtt_manager import MQTTManager
-from core.database import DatabaseManager
+from core.mqtt_manager import MQTTManager, create_mqtt_manager
+from core.database import DatabaseManager, db_manager as shared_db_manager
 from services.experiment_function_manager import ExperimentFunctionManager
 from services.initialization_manager import InitializationManager
 from services.experiment_data_manager import ExperimentDataManager
@@ -26,15 +26,15 @@ def get_mqtt_manager() -> MQTTManager:
     """获取MQTT管理器实例"""
     global _mqtt_manager
     if _mqtt_manager is None:
-        _mqtt_manager = MQTTManager()
+        _mqtt_manager = create_mqtt_manager()
     return _mqtt_manager
 
 
 def get_db_manager() -> DatabaseManager:
-    """获取数据库管理器实例"""
+    """获取数据库管理器实例（与main.py共用core.database中的全局实例，随应用生命周期关闭）"""
     global _db_manager
     if _db_manager is None:
-        _db_manager = DatabaseManager()
+        _db_manager = shared_db_manager
     return _db_manager
 
 
@@ -15,7 +15,7 @@ from models.experiment_control_models import (
 )
 from models.experiment_function_models import ExperimentConfig
 from services.experiment_function_manager import ExperimentFunctionManager
-from core.mqtt_manager import MQTTManager
+from core.mqtt_manager import create_mqtt_manager
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -27,7 +27,7 @@ def get_experiment_manager() -> ExperimentFunctionManager:
     """获取实验管理器实例"""
     global _experiment_manager
     if _experiment_manager is None:
-        mqtt_manager = MQTTManager()
+        mqtt_manager = create_mqtt_manager()
         _experiment_manager = ExperimentFunctionManager(mqtt_manager)
     return _experiment_manager
 
@@ -16,7 +16,7 @@ from models.experiment_models import (
 )
 from data.database_utils import ChromatographyDB
 from services.experiment_data_manager import ExperimentDataManager
-from core.mqtt_manager import MQTTManager
+from core.mqtt_manager import create_mqtt_manager
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -29,7 +29,7 @@ def get_database() -> ChromatographyDB:
 
 def get_experiment_data_manager() -> ExperimentDataManager:
     """获取实验数据管理器实例"""
-    mqtt_manager = MQTTManager()
+    mqtt_manager = create_mqtt_manager()
     return ExperimentDataManager(mqtt_manager)
 
 # ===== 实验数据管理API =====
@@ -14,6 +14,8 @@ from hardware.hardware_config import (
     set_global_mock_mode,
     get_global_mock_mode
 )
+from hardware.drivers.serial_driver import get_serial_metrics
+from hardware.drivers.http_driver import network_manager
 
 router = APIRouter(prefix="/api/hardware", tags=["hardware"])
 
@@ -86,6 +88,22 @@ async def get_mock_mode(device_id: Optional[str] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/serial-metrics", response_model=Dict[str, Any])
+async def get_serial_port_metrics():
+    """
+    获取各串口的命令队列、响应延迟和错误统计
+    """
+    return {"success": True, "ports": get_serial_metrics()}
+
+
+@router.get("/network-metrics", response_model=Dict[str, Any])
+async def get_network_metrics():
+    """
+    获取收集模块HTTP连接池和各设备的请求、重试、延迟统计
+    """
+    return {"success": True, **network_manager.get_stats()}
+
+
 @router.get("/devices-status", response_model=Dict[str, Any])
 async def get_all_devices_status():
     """
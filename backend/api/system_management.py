@@ -13,4 +13,10 @@ async def get_system_status():
 
 @router.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
\ No newline at end of file
+    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+
+@router.get("/database-pool")
+async def get_database_pool_stats():
+    """获取SQLite连接池统计信息"""
+    from data.connection_pool import get_all_pool_stats
+    return {"pools": get_all_pool_stats(), "timestamp": datetime.now().isoformat()}
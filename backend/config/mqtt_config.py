@@ -0,0 +1,244 @@
+"""
+MQTT连接配置
+MQTT Connection Configuration
+
+配置来源（后者覆盖前者）：
+1. 默认值（与开发文档一致的公共broker）
+2. JSON配置文件：MQTT_CONFIG_FILE 指定的路径，或 config/mqtt.json（存在时）
+3. 环境变量 MQTT_*（安装了 python-dotenv 时同时读取 .env）
+
+mode 为 "loopback" 时使用进程内回环broker（core/mqtt_loopback.py），不连接网络。
+
+配置文件示例：
+    {
+        "mode": "network",
+        "host": "localhost",
+        "port": 8883,
+        "client_id": "chromatography_host",
+        "clean_session": false,
+        "tls": {"enabled": true, "ca_certs": "/etc/mosquitto/ca.crt"},
+        "default_qos": 0,
+        "topic_qos": {"experiments/+/collection/control": 1},
+        "offline_buffer": {"max_messages": 1000, "max_bytes": 1048576},
+        "reconnect": {"min_delay": 1, "max_delay": 60, "jitter": 0.5, "max_attempts": 0}
+    }
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.topic_router import validate_topic_filter
+
+logger = logging.getLogger(__name__)
+
+try:
+    from dotenv import load_dotenv
+    DOTENV_AVAILABLE = True
+except ImportError:  # python-dotenv为可选依赖
+    DOTENV_AVAILABLE = False
+
+DEFAULT_CONFIG_FILE = Path(__file__).resolve().parent / "mqtt.json"
+
+
+@dataclass
+class MQTTConfig:
+    """MQTT连接、会话、QoS和离线缓冲配置"""
+    mode: str = "network"                  # network: 连接broker；loopback: 进程内回环broker
+    host: str = "broker.emqx.io"
+    port: int = 1883
+    client_id: Optional[str] = None        # 为空时自动生成（持久会话使用基于主机名的固定ID）
+    keepalive: int = 60
+    clean_session: bool = True
+    username: Optional[str] = None
+    password: Optional[str] = None
+
+    # TLS
+    tls_enabled: bool = False
+    tls_ca_certs: Optional[str] = None
+    tls_certfile: Optional[str] = None
+    tls_keyfile: Optional[str] = None
+    tls_insecure: bool = False             # 跳过证书主机名校验（仅用于测试环境）
+
+    # QoS：按主题过滤器（支持 +/# 通配符）指定，未匹配的主题使用 default_qos
+    default_qos: int = 0
+    topic_qos: Dict[str, int] = field(default_factory=lambda: {
+        "experiments/+/collection/control": 1,
+    })
+
+    # 离线发布缓冲：断线期间的消息按顺序缓存，重连后依次补发
+    offline_buffer_enabled: bool = True
+    offline_buffer_max_messages: int = 1000
+    offline_buffer_max_bytes: int = 1024 * 1024
+
+    # 断线重连：指数退避 + 随机抖动，max_attempts 为0表示不限次数
+    reconnect_enabled: bool = True
+    reconnect_min_delay: float = 1.0
+    reconnect_max_delay: float = 60.0
+    reconnect_jitter: float = 0.5
+    reconnect_max_attempts: int = 0
+    connect_timeout: float = 10.0         # connect() 等待首次连接建立的时间（秒）
+
+    def __post_init__(self):
+        if not self.client_id:
+            if self.clean_session:
+                self.client_id = "chromatography_system_" + str(int(time.time()))
+            else:
+                # 持久会话需要固定的client_id，broker才能恢复会话中的订阅和消息
+                self.client_id = "chromatography_system_" + socket.gethostname()
+        self.validate()
+
+    def validate(self):
+        """校验配置，无效时抛出 ValueError"""
+        if self.mode not in ("network", "loopback"):
+            raise ValueError(f"无效的MQTT模式: {self.mode}（可选 network / loopback）")
+        if not self.host:
+            raise ValueError("MQTT host 不能为空")
+        if not 0 < self.port < 65536:
+            raise ValueError(f"无效的MQTT端口: {self.port}")
+        if self.keepalive < 0:
+            raise ValueError(f"无效的keepalive: {self.keepalive}")
+        for name, qos in [("default_qos", self.default_qos)] + list(self.topic_qos.items()):
+            if qos not in (0, 1, 2):
+                raise ValueError(f"无效的QoS {qos}: {name}")
+        for topic_filter in self.topic_qos:
+            validate_topic_filter(topic_filter)
+        if self.offline_buffer_max_messages < 0 or self.offline_buffer_max_bytes < 0:
+            raise ValueError("离线缓冲上限不能为负数")
+        if self.reconnect_min_delay <= 0 or self.reconnect_max_delay < self.reconnect_min_delay:
+            raise ValueError(f"无效的重连退避区间: {self.reconnect_min_delay} ~ {self.reconnect_max_delay}")
+        if not 0 <= self.reconnect_jitter <= 1:
+            raise ValueError(f"reconnect_jitter 必须在 0~1 之间: {self.reconnect_jitter}")
+        if self.reconnect_max_attempts < 0:
+            raise ValueError("reconnect_max_attempts 不能为负数")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """用于状态接口展示（不包含密码）"""
+        return {
+            "mode": self.mode,
+            "host": self.host,
+            "port": self.port,
+            "client_id": self.client_id,
+            "keepalive": self.keepalive,
+            "clean_session": self.clean_session,
+            "username": self.username,
+            "tls_enabled": self.tls_enabled,
+            "default_qos": self.default_qos,
+            "topic_qos": dict(self.topic_qos),
+            "offline_buffer_enabled": self.offline_buffer_enabled,
+            "offline_buffer_max_messages": self.offline_buffer_max_messages,
+            "offline_buffer_max_bytes": self.offline_buffer_max_bytes,
+            "reconnect_enabled": self.reconnect_enabled,
+            "reconnect_min_delay": self.reconnect_min_delay,
+            "reconnect_max_delay": self.reconnect_max_delay,
+            "reconnect_jitter": self.reconnect_jitter,
+            "reconnect_max_attempts": self.reconnect_max_attempts,
+            "connect_timeout": self.connect_timeout,
+        }
+
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_topic_qos(value: str) -> Dict[str, int]:
+    """解析 "filter=qos,filter=qos" 格式"""
+    result = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        topic_filter, _, qos = item.rpartition("=")
+        if not topic_filter:
+            raise ValueError(f"无效的MQTT_TOPIC_QOS项: {item}")
+        result[topic_filter.strip()] = int(qos)
+    return result
+
+
+def _from_file(path: Path) -> Dict[str, Any]:
+    """读取JSON配置文件并展开 tls / offline_buffer / reconnect 分组"""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    groups = ("tls", "offline_buffer", "reconnect")
+    values = {key: value for key, value in raw.items() if key not in groups}
+    for group in groups:
+        for key, value in raw.get(group, {}).items():
+            values[f"{group}_{key}"] = value
+    return values
+
+
+# 环境变量 -> (配置字段, 解析函数)
+_ENV_FIELDS = {
+    "MQTT_MODE": ("mode", str),
+    "MQTT_HOST": ("host", str),
+    "MQTT_PORT": ("port", int),
+    "MQTT_CLIENT_ID": ("client_id", str),
+    "MQTT_KEEPALIVE": ("keepalive", int),
+    "MQTT_CLEAN_SESSION": ("clean_session", _parse_bool),
+    "MQTT_USERNAME": ("username", str),
+    "MQTT_PASSWORD": ("password", str),
+    "MQTT_TLS": ("tls_enabled", _parse_bool),
+    "MQTT_TLS_CA_CERTS": ("tls_ca_certs", str),
+    "MQTT_TLS_CERTFILE": ("tls_certfile", str),
+    "MQTT_TLS_KEYFILE": ("tls_keyfile", str),
+    "MQTT_TLS_INSECURE": ("tls_insecure", _parse_bool),
+    "MQTT_DEFAULT_QOS": ("default_qos", int),
+    "MQTT_OFFLINE_BUFFER": ("offline_buffer_enabled", _parse_bool),
+    "MQTT_OFFLINE_BUFFER_MESSAGES": ("offline_buffer_max_messages", int),
+    "MQTT_OFFLINE_BUFFER_BYTES": ("offline_buffer_max_bytes", int),
+    "MQTT_RECONNECT": ("reconnect_enabled", _parse_bool),
+    "MQTT_RECONNECT_MIN_DELAY": ("reconnect_min_delay", float),
+    "MQTT_RECONNECT_MAX_DELAY": ("reconnect_max_delay", float),
+    "MQTT_RECONNECT_JITTER": ("reconnect_jitter", float),
+    "MQTT_RECONNECT_MAX_ATTEMPTS": ("reconnect_max_attempts", int),
+    "MQTT_CONNECT_TIMEOUT": ("connect_timeout", float),
+}
+
+
+def load_mqtt_config(path: Optional[str] = None) -> MQTTConfig:
+    """
+    加载MQTT配置
+
+    Args:
+        path: JSON配置文件路径；为空时使用 MQTT_CONFIG_FILE 或 config/mqtt.json
+
+    Returns:
+        MQTTConfig
+    """
+    if DOTENV_AVAILABLE:
+        load_dotenv()
+
+    values: Dict[str, Any] = {}
+
+    config_path = Path(path or os.environ.get("MQTT_CONFIG_FILE") or DEFAULT_CONFIG_FILE)
+    if config_path.exists():
+        values.update(_from_file(config_path))
+        logger.info(f"加载MQTT配置文件: {config_path}")
+    elif path or os.environ.get("MQTT_CONFIG_FILE"):
+        raise FileNotFoundError(f"MQTT配置文件不存在: {config_path}")
+
+    for env_name, (field_name, parse) in _ENV_FIELDS.items():
+        raw = os.environ.get(env_name)
+        if raw is not None and raw != "":
+            values[field_name] = parse(raw)
+
+    topic_qos_env = os.environ.get("MQTT_TOPIC_QOS")
+    if topic_qos_env:
+        topic_qos = dict(values.get("topic_qos") or MQTTConfig.__dataclass_fields__["topic_qos"].default_factory())
+        topic_qos.update(_parse_topic_qos(topic_qos_env))
+        values["topic_qos"] = topic_qos
+
+    unknown = set(values) - set(MQTTConfig.__dataclass_fields__)
+    if unknown:
+        raise ValueError(f"未知的MQTT配置项: {', '.join(sorted(unknown))}")
+
+    return MQTTConfig(**values)
+
+
+__all__ = ['MQTTConfig', 'load_mqtt_config', 'DOTENV_AVAILABLE']
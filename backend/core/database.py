@@ -5,6 +5,7 @@ SQLite数据库连接管理
 
 import sqlite3
 import asyncio
+import aiosqlite
 from pathlib import Path
 from typing import Optional, Dict, List, Any
 import logging
@@ -12,12 +13,20 @@ import json
 from datetime import datetime
 from contextlib import asynccontextmanager
 
+from core.log_sink import LogWriteBehindSink, LogSinkConfig
+from core.sensor_partitions import SensorPartitionStore
+
 logger = logging.getLogger(__name__)
 
 class DatabaseManager:
-    """SQLite数据库管理器"""
+    """SQLite数据库管理器
+
+    基于aiosqlite，所有阻塞I/O都在连接各自的后台线程中执行，不占用事件循环。
+    WAL模式下读写分离：只读查询从读连接池中并发执行，写操作共用一个写连接串行提交。
+    """
 
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, max_readers: int = 4,
+                 log_sink_config: Optional[LogSinkConfig] = None):
         if db_path is None:
             # 默认数据库路径
             db_dir = Path(__file__).parent.parent / "data" / "database"
@@ -25,8 +34,19 @@ class DatabaseManager:
         else:
             self.db_path = Path(db_path)
 
-        self.connection_pool = {}
-        self._lock = asyncio.Lock()
+        # 读连接池（空闲连接队列）与写连接
+        self.max_readers = max_readers
+        self.connection_pool: Optional[asyncio.Queue] = None
+        self._reader_count = 0
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()  # 写连接锁
+        self._init_lock = asyncio.Lock()
+
+        # 日志批量写入队列：start_log_sink()后log_*方法只入队，由后台任务批量提交
+        self.log_sink = LogWriteBehindSink(self, log_sink_config)
+
+        # 传感器数据时间分区存储
+        self.sensor_store = SensorPartitionStore()
 
     async def initialize(self):
         """初始化数据库连接"""
@@ -41,6 +61,11 @@ class DatabaseManager:
 
             # 测试连接
             await self.test_connection()
+
+            # 传感器分区登记表和汇总表
+            async with self.get_connection() as conn:
+                await self.sensor_store.ensure_schema(conn)
+            await self.migrate_legacy_sensor_data()
             logger.info(f"数据库连接成功: {self.db_path}")
 
         except Exception as e:
@@ -54,7 +79,7 @@ class DatabaseManager:
             init_script = self.db_path.parent / "init_database.py"
             if init_script.exists():
                 import subprocess
-                result = subprocess.run([
+                result = await asyncio.to_thread(subprocess.run, [
                     "python", str(init_script), "--init", "--db-path", str(self.db_path)
                 ], capture_output=True, text=True)
 
@@ -73,121 +98,207 @@ class DatabaseManager:
 
     async def _basic_initialize(self):
         """基本数据库初始化"""
-        conn = sqlite3.connect(self.db_path)
-        conn.execute("PRAGMA foreign_keys = ON")
-
-        # 创建基本的设备配置表
-        conn.execute('''
-            CREATE TABLE IF NOT EXISTS device_config (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                device_id VARCHAR(50) UNIQUE NOT NULL,
-                device_name VARCHAR(100) NOT NULL,
-                device_type VARCHAR(50) NOT NULL,
-                communication_type VARCHAR(20) NOT NULL,
-                connection_params TEXT,
-                status VARCHAR(20) DEFAULT 'inactive',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        async with self.get_connection() as conn:
+            # 创建基本的设备配置表
+            await conn.execute('''
+                CREATE TABLE IF NOT EXISTS device_config (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    device_id VARCHAR(50) UNIQUE NOT NULL,
+                    device_name VARCHAR(100) NOT NULL,
+                    device_type VARCHAR(50) NOT NULL,
+                    communication_type VARCHAR(20) NOT NULL,
+                    connection_params TEXT,
+                    status VARCHAR(20) DEFAULT 'inactive',
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+
+    async def _open_connection(self) -> aiosqlite.Connection:
+        """打开并配置一个连接（连接在自己的线程中运行）"""
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = sqlite3.Row  # 启用字典式访问
+        await conn.execute("PRAGMA journal_mode = WAL")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        await conn.execute("PRAGMA busy_timeout = 5000")
+        await conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    async def _acquire_reader(self) -> aiosqlite.Connection:
+        """获取读连接：优先复用空闲连接，未达上限时新建，否则等待归还"""
+        async with self._init_lock:
+            if self.connection_pool is None:
+                self.connection_pool = asyncio.Queue()
+            if self.connection_pool.empty() and self._reader_count < self.max_readers:
+                self._reader_count += 1
+                try:
+                    return await self._open_connection()
+                except Exception:
+                    self._reader_count -= 1
+                    raise
+        return await self.connection_pool.get()
+
+    async def _get_writer(self) -> aiosqlite.Connection:
+        """获取写连接（调用方需持有写锁）"""
+        if self._writer is None:
+            self._writer = await self._open_connection()
+        return self._writer
 
     @asynccontextmanager
-    async def get_connection(self):
-        """获取数据库连接（异步上下文管理器）"""
-        async with self._lock:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # 启用字典式访问
-            conn.execute("PRAGMA foreign_keys = ON")
+    async def get_connection(self, readonly: bool = False):
+        """获取数据库连接（异步上下文管理器）
+
+        Args:
+            readonly: 只读查询使用读连接池，可与其他读操作及写操作并发执行；
+                      否则使用写连接，退出时提交，异常时回滚
+        """
+        if readonly:
+            conn = await self._acquire_reader()
             try:
                 yield conn
             finally:
-                conn.close()
+                self.connection_pool.put_nowait(conn)
+            return
+
+        async with self._lock:
+            conn = await self._get_writer()
+            try:
+                yield conn
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+    async def start_log_sink(self):
+        """启动日志批量写入"""
+        await self.log_sink.start()
+
+    async def stop_log_sink(self):
+        """停止日志批量写入并刷新剩余日志"""
+        await self.log_sink.stop()
+
+    async def close(self):
+        """关闭所有数据库连接（先刷新缓存的日志）"""
+        await self.stop_log_sink()
+        async with self._lock:
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+
+        if self.connection_pool is not None:
+            while not self.connection_pool.empty():
+                conn = self.connection_pool.get_nowait()
+                await conn.close()
+                self._reader_count -= 1
+
+    async def _fetchall(self, query: str, params=()) -> List[Dict]:
+        """在读连接上执行查询并返回字典列表"""
+        async with self.get_connection(readonly=True) as conn:
+            rows = await conn.execute_fetchall(query, params)
+            return [dict(row) for row in rows]
+
+    async def _execute_write(self, query: str, params=()) -> aiosqlite.Cursor:
+        """在写连接上执行写操作并提交"""
+        async with self.get_connection() as conn:
+            return await conn.execute(query, params)
+
+    async def _write_log(self, table: str, query: str, params: tuple) -> Optional[int]:
+        """写入日志记录：批量写入已启动时入队，否则直接写入
+
+        Returns:
+            直接写入时返回lastrowid，入队时返回None
+        """
+        if self.log_sink.is_running:
+            await self.log_sink.submit(table, query, params)
+            return None
+        cursor = await self._execute_write(query, params)
+        return cursor.lastrowid
 
     async def test_connection(self):
         """测试数据库连接"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            result = cursor.fetchone()
+        async with self.get_connection(readonly=True) as conn:
+            async with conn.execute("SELECT 1") as cursor:
+                result = await cursor.fetchone()
             return result[0] == 1
 
     # 设备配置操作
     async def get_device_config(self, device_id: str = None) -> List[Dict]:
         """获取设备配置"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            if device_id:
-                cursor.execute(
-                    "SELECT * FROM device_config WHERE device_id = ?", (device_id,)
-                )
-                result = cursor.fetchone()
-                return [dict(result)] if result else []
-            else:
-                cursor.execute("SELECT * FROM device_config")
-                results = cursor.fetchall()
-                return [dict(row) for row in results]
+        if device_id:
+            results = await self._fetchall(
+                "SELECT * FROM device_config WHERE device_id = ? LIMIT 1", (device_id,)
+            )
+            return results[:1]
+        else:
+            return await self._fetchall("SELECT * FROM device_config")
 
     async def update_device_status(self, device_id: str, status: str):
         """更新设备状态"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "UPDATE device_config SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE device_id = ?",
-                (status, device_id)
-            )
-            conn.commit()
-            return cursor.rowcount > 0
+        cursor = await self._execute_write(
+            "UPDATE device_config SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE device_id = ?",
+            (status, device_id)
+        )
+        return cursor.rowcount > 0
 
-    # 传感器数据操作
+    # 传感器数据操作（按天分区，写入时同步更新10s/1m/10m汇总表）
     async def insert_sensor_data(self, device_id: str, value: float, data_type: str = None,
                                 unit: str = None, raw_data: Dict = None):
         """插入传感器数据"""
+        return await self.insert_sensor_data_batch([{
+            "device_id": device_id,
+            "value": value,
+            "data_type": data_type,
+            "unit": unit,
+            "raw_data": raw_data,
+        }])
+
+    async def insert_sensor_data_batch(self, rows: List[Dict[str, Any]]):
+        """批量插入传感器数据（一个事务）
+
+        Args:
+            rows: 字典列表，键: device_id, value, data_type, unit, raw_data, ts(可选)
+        """
+        records = []
+        for row in rows:
+            raw_data = row.get("raw_data")
+            records.append({
+                **row,
+                "raw_data": json.dumps(raw_data) if raw_data and not isinstance(raw_data, str) else raw_data
+            })
+
         async with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO sensor_data (device_id, value, data_type, unit, raw_data)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                device_id,
-                value,
-                data_type,
-                unit,
-                json.dumps(raw_data) if raw_data else None
-            ))
-            conn.commit()
-            return cursor.lastrowid
+            return await self.sensor_store.insert(conn, records)
 
     async def get_sensor_data(self, device_id: str = None, limit: int = 100,
                              start_time: str = None, end_time: str = None) -> List[Dict]:
-        """获取传感器数据"""
+        """获取传感器原始数据（按时间倒序，从最新分区开始扫描直到满足limit）"""
+        async with self.get_connection(readonly=True) as conn:
+            return await self.sensor_store.query_raw(conn, device_id, limit, start_time, end_time)
+
+    async def get_sensor_series(self, device_id: str, start_time: str = None,
+                                end_time: str = None, max_points: int = 1000) -> Dict[str, Any]:
+        """获取传感器时间序列，自动选择满足点数预算的分辨率（raw/10s/1m/10m）"""
+        async with self.get_connection(readonly=True) as conn:
+            return await self.sensor_store.query_series(conn, device_id, start_time, end_time, max_points)
+
+    async def migrate_legacy_sensor_data(self, batch_size: int = 5000) -> int:
+        """把旧版单表 sensor_data 的历史数据迁移到分区（每批一个事务，已迁移的部分不会重复）"""
+        total = 0
+        while True:
+            async with self.get_connection() as conn:
+                migrated = await self.sensor_store.migrate_legacy_batch(conn, batch_size)
+            if not migrated:
+                break
+            total += migrated
+        if total:
+            logger.info(f"旧版 sensor_data 迁移到分区: {total} 条")
+        return total
+
+    async def drop_sensor_partitions_before(self, before: str) -> List[str]:
+        """删除早于指定时间的原始数据分区（汇总数据保留）"""
         async with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            query = "SELECT * FROM sensor_data WHERE 1=1"
-            params = []
-
-            if device_id:
-                query += " AND device_id = ?"
-                params.append(device_id)
-
-            if start_time:
-                query += " AND timestamp >= ?"
-                params.append(start_time)
-
-            if end_time:
-                query += " AND timestamp <= ?"
-                params.append(end_time)
-
-            query += " ORDER BY timestamp DESC LIMIT ?"
-            params.append(limit)
-
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-            return [dict(row) for row in results]
+            return await self.sensor_store.drop_partitions_before(conn, before)
 
     # 审计日志操作
     async def log_audit(self, user_id: str, action_type: str, target_type: str,
@@ -195,124 +306,101 @@ class DatabaseManager:
                        before_state: Dict = None, after_state: Dict = None,
                        error_message: str = None):
         """记录审计日志"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            log_id = f"audit_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        log_id = f"audit_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
 
-            cursor.execute('''
-                INSERT INTO audit_logs (
-                    log_id, user_id, action_type, target_type, target_id,
-                    action_description, before_state, after_state, result, error_message
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+        await self._write_log("audit_logs", '''
+            INSERT INTO audit_logs (
                 log_id, user_id, action_type, target_type, target_id,
-                action_description,
-                json.dumps(before_state) if before_state else None,
-                json.dumps(after_state) if after_state else None,
-                result, error_message
-            ))
-            conn.commit()
-            return log_id
+                action_description, before_state, after_state, result, error_message
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            log_id, user_id, action_type, target_type, target_id,
+            action_description,
+            json.dumps(before_state) if before_state else None,
+            json.dumps(after_state) if after_state else None,
+            result, error_message
+        ))
+        return log_id
 
     async def log_system_event(self, event_type: str, severity: str, source: str,
                               message: str, details: Dict = None):
         """记录系统事件"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
+        event_id = f"event_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
 
-            event_id = f"event_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
-
-            cursor.execute('''
-                INSERT INTO system_events (event_id, event_type, severity, source, message, details)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                event_id, event_type, severity, source, message,
-                json.dumps(details) if details else None
-            ))
-            conn.commit()
-            return event_id
+        await self._write_log("system_events", '''
+            INSERT INTO system_events (event_id, event_type, severity, source, message, details)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            event_id, event_type, severity, source, message,
+            json.dumps(details) if details else None
+        ))
+        return event_id
 
     async def log_device_operation(self, device_id: str, operation_type: str,
                                   operation_name: str = None, parameters: Dict = None,
                                   result: str = "success", response_time: int = None,
                                   error_code: str = None, error_message: str = None):
         """记录设备操作日志"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            log_id = f"device_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
-
-            cursor.execute('''
-                INSERT INTO device_operation_logs (
-                    log_id, device_id, operation_type, operation_name, parameters,
-                    result, response_time, error_code, error_message
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                log_id, device_id, operation_type, operation_name,
-                json.dumps(parameters) if parameters else None,
+        log_id = f"device_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+
+        await self._write_log("device_operation_logs", '''
+            INSERT INTO device_operation_logs (
+                log_id, device_id, operation_type, operation_name, parameters,
                 result, response_time, error_code, error_message
-            ))
-            conn.commit()
-            return log_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            log_id, device_id, operation_type, operation_name,
+            json.dumps(parameters) if parameters else None,
+            result, response_time, error_code, error_message
+        ))
+        return log_id
 
     # MQTT消息日志
     async def log_mqtt_message(self, topic: str, payload: str, direction: str = "publish",
                                qos: int = 0, retained: bool = False, device_id: str = None):
-        """记录MQTT消息到数据库"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO mqtt_messages (topic, payload, direction, qos, retained, device_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                topic,
-                payload,
-                direction,
-                qos,
-                1 if retained else 0,
-                device_id
-            ))
-            conn.commit()
-            return cursor.lastrowid
+        """记录MQTT消息到数据库（批量写入已启动时返回None）"""
+        return await self._write_log("mqtt_messages", '''
+            INSERT INTO mqtt_messages (topic, payload, direction, qos, retained, device_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            topic,
+            payload,
+            direction,
+            qos,
+            1 if retained else 0,
+            device_id
+        ))
 
     # 分析方法操作
     async def get_methods(self, method_type: str = None, is_active: bool = True) -> List[Dict]:
         """获取分析方法列表"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
-
-            query = "SELECT * FROM method_storage WHERE 1=1"
-            params = []
+        query = "SELECT * FROM method_storage WHERE 1=1"
+        params = []
 
-            if method_type:
-                query += " AND method_type = ?"
-                params.append(method_type)
+        if method_type:
+            query += " AND method_type = ?"
+            params.append(method_type)
 
-            if is_active is not None:
-                query += " AND is_active = ?"
-                params.append(1 if is_active else 0)
+        if is_active is not None:
+            query += " AND is_active = ?"
+            params.append(1 if is_active else 0)
 
-            query += " ORDER BY created_at DESC"
+        query += " ORDER BY created_at DESC"
 
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-            return [dict(row) for row in results]
+        return await self._fetchall(query, params)
 
     # 数据库统计信息
     async def get_database_stats(self) -> Dict:
         """获取数据库统计信息"""
-        async with self.get_connection() as conn:
-            cursor = conn.cursor()
-
+        async with self.get_connection(readonly=True) as conn:
             stats = {}
 
             # 获取各表的记录数
             tables = ['device_config', 'sensor_data', 'audit_logs', 'system_events', 'method_storage']
             for table in tables:
                 try:
-                    cursor.execute(f"SELECT COUNT(*) FROM {table}")
-                    stats[f"{table}_count"] = cursor.fetchone()[0]
+                    async with conn.execute(f"SELECT COUNT(*) FROM {table}") as cursor:
+                        stats[f"{table}_count"] = (await cursor.fetchone())[0]
                 except Exception as e:
                     stats[f"{table}_count"] = f"Error: {e}"
 
@@ -320,14 +408,22 @@ class DatabaseManager:
             stats['database_size_bytes'] = self.db_path.stat().st_size
             stats['database_size_mb'] = round(stats['database_size_bytes'] / 1024 / 1024, 2)
 
-            # 最新传感器数据时间
+            # 最新传感器数据时间（优先取最新分区）
             try:
-                cursor.execute("SELECT MAX(timestamp) FROM sensor_data")
-                result = cursor.fetchone()
+                partitions = self.sensor_store.get_partition_stats()
+                stats['sensor_partitions'] = partitions
+                latest_table = partitions['newest_partition'] or 'sensor_data'
+                async with conn.execute(f"SELECT MAX(timestamp) FROM {latest_table}") as cursor:
+                    result = await cursor.fetchone()
                 stats['latest_sensor_data'] = result[0] if result[0] else None
             except:
                 stats['latest_sensor_data'] = None
 
+            # 连接状态
+            stats['reader_connections'] = self._reader_count
+            stats['max_readers'] = self.max_readers
+            stats['log_sink'] = self.log_sink.get_stats()
+
             return stats
 
 # 创建全局数据库管理器实例
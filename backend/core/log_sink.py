@@ -0,0 +1,199 @@
+"""
+日志批量写入队列
+Write-behind Log Sink
+
+审计日志、系统事件、设备操作日志和MQTT消息日志先缓存在内存中，
+按时间间隔或数量阈值触发，每张表一次 executemany 批量提交。
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LogSinkConfig:
+    """批量写入配置"""
+    flush_interval: float = 1.0      # 定时刷新间隔（秒）
+    flush_threshold: int = 500       # 缓存记录数达到该值时立即刷新
+    max_pending: int = 20000         # 内存中最多缓存的记录数
+    block_timeout: float = 5.0       # 不可丢弃的日志在队列满时的最长等待时间（秒）
+
+
+class LogWriteBehindSink:
+    """
+    日志批量写入队列
+
+    队列满时的背压策略：
+    - droppable_tables 中的高频日志（默认mqtt_messages）直接丢弃并计数
+    - 其他日志等待刷新腾出空间，超过 block_timeout 仍无空间则丢弃并计数
+    """
+
+    def __init__(self, db_manager, config: Optional[LogSinkConfig] = None,
+                 droppable_tables: Optional[Set[str]] = None):
+        self.db_manager = db_manager
+        self.config = config or LogSinkConfig()
+        self.droppable_tables = droppable_tables if droppable_tables is not None else {"mqtt_messages"}
+
+        # 每张表的INSERT语句和待写入参数
+        self._statements: Dict[str, str] = {}
+        self._buffers: Dict[str, List[Tuple]] = {}
+        self._pending = 0
+
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._space_available: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.is_running = False
+
+        # 统计信息
+        self.stats: Dict[str, Any] = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "blocked": 0,
+            "flushes": 0,
+            "last_flush_ms": 0.0,
+            "last_flush_records": 0,
+            "dropped_by_table": {},
+        }
+
+    async def start(self):
+        """启动后台刷新任务"""
+        if self.is_running:
+            return
+        self._flush_requested = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.is_running = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        logger.info(f"日志批量写入已启动 (间隔: {self.config.flush_interval}s, 阈值: {self.config.flush_threshold})")
+
+    async def stop(self):
+        """停止后台任务并刷新全部剩余日志"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        if self._flush_task:
+            # 唤醒刷新循环让它自行退出，不取消任务：取消可能打断进行中的刷新，
+            # 已取出的日志随事务回滚丢失且不计入统计
+            self._flush_requested.set()
+            await self._flush_task
+            self._flush_task = None
+
+        await self.flush()
+        logger.info(f"日志批量写入已停止，累计写入 {self.stats['written']} 条，丢弃 {self.stats['dropped']} 条")
+
+    async def submit(self, table: str, sql: str, params: Tuple) -> bool:
+        """
+        提交一条日志记录
+
+        Returns:
+            bool: 是否已加入缓存（False表示因队列满被丢弃）
+        """
+        if self._pending >= self.config.max_pending:
+            if not await self._wait_for_space(table):
+                self._record_drop(table)
+                return False
+
+        self._statements[table] = sql
+        self._buffers.setdefault(table, []).append(params)
+        self._pending += 1
+        self.stats["enqueued"] += 1
+
+        if self._pending >= self.config.flush_threshold:
+            self._flush_requested.set()
+        return True
+
+    async def _wait_for_space(self, table: str) -> bool:
+        """队列满时的背压：可丢弃日志直接放弃，其他日志等待刷新"""
+        self._flush_requested.set()
+        if table in self.droppable_tables:
+            return False
+
+        self.stats["blocked"] += 1
+        deadline = time.monotonic() + self.config.block_timeout
+        while self._pending >= self.config.max_pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._space_available.clear()
+            try:
+                await asyncio.wait_for(self._space_available.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def _record_drop(self, table: str):
+        self.stats["dropped"] += 1
+        by_table = self.stats["dropped_by_table"]
+        by_table[table] = by_table.get(table, 0) + 1
+        if self.stats["dropped"] % 1000 == 1:
+            logger.warning(f"日志队列已满，丢弃记录 ({table})，累计丢弃 {self.stats['dropped']} 条")
+
+    async def _flush_loop(self):
+        """定时或达到阈值时刷新"""
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.config.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"日志批量写入失败: {e}")
+
+    async def flush(self):
+        """将缓存的日志写入数据库：每张表一次executemany，整体一个事务"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            buffers, self._buffers = self._buffers, {}
+            self._pending = 0
+            if self._space_available:
+                self._space_available.set()
+
+            started = time.perf_counter()
+            written = 0
+            try:
+                async with self.db_manager.get_connection() as conn:
+                    for table, rows in buffers.items():
+                        # 单表失败（如表不存在）不影响其他表的写入
+                        try:
+                            await conn.executemany(self._statements[table], rows)
+                            written += len(rows)
+                        except Exception as e:
+                            self.stats["failed"] += len(rows)
+                            logger.error(f"日志批量写入失败 {table}，丢弃 {len(rows)} 条记录: {e}")
+            except Exception as e:
+                self.stats["failed"] += written
+                logger.error(f"日志批量提交失败，丢弃 {written} 条记录: {e}")
+                return
+
+            self.stats["written"] += written
+            self.stats["flushes"] += 1
+            self.stats["last_flush_records"] = written
+            self.stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            **self.stats,
+            "dropped_by_table": dict(self.stats["dropped_by_table"]),
+            "pending": self._pending,
+            "pending_by_table": {table: len(rows) for table, rows in self._buffers.items()},
+            "is_running": self.is_running,
+        }
+
+
+__all__ = ['LogSinkConfig', 'LogWriteBehindSink']
@@ -0,0 +1,215 @@
+"""
+MQTT消息编解码
+MQTT Payload Codecs
+
+按主题选择编码方式：
+- json:            默认，兼容前端和现有订阅者（安装了 orjson 时自动使用 orjson 加速，输出同为 UTF-8 JSON）
+- msgpack:         需要安装 msgpack
+- detector_sample: 检测器 [A, B] 双通道采样的定长二进制格式（每个采样 16 字节，小端 float64）
+
+MQTT 3.1.1 没有 content-type 属性，二进制编码的消息以 4 字节头部自描述：
+    b"CS" + 编码ID(1字节) + 格式版本(1字节) + 数据
+不带头部的消息按 JSON / UTF-8 文本解析，因此旧的 JSON 消息无需改动即可解码。
+"""
+
+import json
+import logging
+import struct
+from typing import Any, Dict, Optional
+
+from core.topic_router import TopicRouter
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # orjson为可选依赖
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:  # msgpack为可选依赖
+    MSGPACK_AVAILABLE = False
+
+# 二进制消息头部
+HEADER_MAGIC = b"CS"
+_HEADER = struct.Struct("<2sBB")
+
+
+class PayloadCodec:
+    """编解码器基类"""
+    name = ""
+    content_type = ""
+    codec_id = 0        # 二进制编码的头部ID，0表示不带头部（文本格式）
+    version = 1
+
+    def encode(self, data: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, body: bytes, version: int = 1) -> Any:
+        raise NotImplementedError
+
+    def _frame(self, body: bytes) -> bytes:
+        return _HEADER.pack(HEADER_MAGIC, self.codec_id, self.version) + body
+
+
+class JsonCodec(PayloadCodec):
+    """JSON（有 orjson 时使用 orjson）"""
+    name = "json"
+    content_type = "application/json"
+
+    def encode(self, data: Any) -> bytes:
+        if ORJSON_AVAILABLE:
+            try:
+                return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                pass  # orjson不支持的类型交给标准库（default=str）处理
+        return json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+
+    def decode(self, body: bytes, version: int = 1) -> Any:
+        if ORJSON_AVAILABLE:
+            return orjson.loads(body)
+        return json.loads(body.decode("utf-8"))
+
+
+class MsgpackCodec(PayloadCodec):
+    """MessagePack"""
+    name = "msgpack"
+    content_type = "application/msgpack"
+    codec_id = 1
+
+    def encode(self, data: Any) -> bytes:
+        return self._frame(msgpack.packb(data, use_bin_type=True, default=str))
+
+    def decode(self, body: bytes, version: int = 1) -> Any:
+        return msgpack.unpackb(body, raw=False)
+
+
+class DetectorSampleCodec(PayloadCodec):
+    """
+    检测器双通道采样定长格式（版本1）
+
+    数据为 n 个小端 float64 对 (A, B)：
+    - 编码 [a, b] 得到 16 字节数据，解码为 [a, b]
+    - 编码 [[a0, b0], [a1, b1], ...] 得到 n*16 字节数据，解码为同样的嵌套列表
+    """
+    name = "detector_sample"
+    content_type = "application/x-detector-sample"
+    codec_id = 2
+    _SAMPLE = struct.Struct("<dd")
+
+    def encode(self, data: Any) -> bytes:
+        if len(data) == 2 and not isinstance(data[0], (list, tuple)):
+            return self._frame(self._SAMPLE.pack(float(data[0]), float(data[1])))
+        body = b"".join(self._SAMPLE.pack(float(a), float(b)) for a, b in data)
+        return self._frame(b"\x01" + body)
+
+    def decode(self, body: bytes, version: int = 1) -> Any:
+        if version != 1:
+            raise ValueError(f"不支持的检测器采样格式版本: {version}")
+        if len(body) == self._SAMPLE.size:
+            return list(self._SAMPLE.unpack(body))
+        if body[:1] != b"\x01" or (len(body) - 1) % self._SAMPLE.size:
+            raise ValueError(f"检测器采样数据长度无效: {len(body)}")
+        return [list(sample) for sample in self._SAMPLE.iter_unpack(body[1:])]
+
+
+class CodecRegistry:
+    """
+    编解码器注册表
+
+    - register(codec): 注册编解码器
+    - set_topic_codec(filter, name): 为主题过滤器（支持 +/# 通配符）指定编码，精确主题优先
+    - encode(topic, data) / decode(payload): 编码按主题选择，解码按消息头部自动识别
+    """
+
+    def __init__(self, default: str = "json"):
+        self._codecs: Dict[str, PayloadCodec] = {}
+        self._by_id: Dict[int, PayloadCodec] = {}
+        self._topic_codecs: Dict[str, str] = {}
+        self._router = TopicRouter()
+        self.default = default
+
+        self.register(JsonCodec())
+        self.register(DetectorSampleCodec())
+        if MSGPACK_AVAILABLE:
+            self.register(MsgpackCodec())
+
+    def register(self, codec: PayloadCodec):
+        self._codecs[codec.name] = codec
+        if codec.codec_id:
+            self._by_id[codec.codec_id] = codec
+
+    def available(self) -> Dict[str, str]:
+        """已注册的编码及其content type"""
+        return {name: codec.content_type for name, codec in self._codecs.items()}
+
+    def set_topic_codec(self, topic_filter: str, codec_name: str):
+        """为主题过滤器指定编码"""
+        if codec_name not in self._codecs:
+            raise ValueError(f"未注册的编码: {codec_name}（可用: {', '.join(self._codecs)}）")
+        previous = self._topic_codecs.get(topic_filter)
+        if previous is not None:
+            self._router.remove(topic_filter)
+        self._topic_codecs[topic_filter] = codec_name
+        self._router.add(topic_filter, self._codecs[codec_name])
+
+    def codec_for(self, topic: str) -> PayloadCodec:
+        """主题对应的编码器：精确匹配优先，其次通配符匹配，最后为默认编码"""
+        name = self._topic_codecs.get(topic)
+        if name is not None:
+            return self._codecs[name]
+        matched = self._router.match(topic)
+        if matched:
+            return matched[0]
+        return self._codecs[self.default]
+
+    def encode(self, topic: str, data: Any) -> bytes:
+        return self.codec_for(topic).encode(data)
+
+    def decode(self, payload: bytes) -> Any:
+        """按头部识别编码；无头部时依次尝试 JSON、UTF-8 文本，最后返回原始字节"""
+        if len(payload) >= _HEADER.size and payload[:2] == HEADER_MAGIC:
+            _, codec_id, version = _HEADER.unpack_from(payload)
+            codec = self._by_id.get(codec_id)
+            if codec is not None:
+                return codec.decode(payload[_HEADER.size:], version)
+            logger.warning(f"未知的消息编码ID: {codec_id}")
+
+        try:
+            return self._codecs["json"].decode(payload)
+        except (ValueError, UnicodeDecodeError):
+            pass
+        try:
+            return payload.decode("utf-8")
+        except UnicodeDecodeError:
+            return payload
+
+    def get_topic_codecs(self) -> Dict[str, str]:
+        return dict(self._topic_codecs)
+
+
+# 默认注册表（供独立脚本使用）
+_default_registry: Optional[CodecRegistry] = None
+
+
+def decode_payload(payload: bytes) -> Any:
+    """使用默认注册表解码消息"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = CodecRegistry()
+    return _default_registry.decode(payload)
+
+
+__all__ = [
+    'PayloadCodec',
+    'JsonCodec',
+    'MsgpackCodec',
+    'DetectorSampleCodec',
+    'CodecRegistry',
+    'decode_payload',
+    'ORJSON_AVAILABLE',
+    'MSGPACK_AVAILABLE',
+]
@@ -0,0 +1,136 @@
+"""
+MQTT连接状态与重连策略
+MQTT Connection State and Reconnect Policy
+
+- ConnectionState: 连接状态机
+    IDLE -> CONNECTING -> CONNECTED -> BACKOFF -> CONNECTING -> ...
+    达到最大重连次数进入 FAILED，主动断开进入 CLOSED
+- ReconnectBackoff: 指数退避 + 随机抖动，避免多个客户端在broker恢复时同时重连
+- ConnectionMetrics: 状态变化、断线时长、重连次数等可观测指标
+"""
+
+import random
+import threading
+import time
+from enum import Enum
+from typing import Any, Dict, Optional
+
+
+class ConnectionState(str, Enum):
+    IDLE = "idle"                # 尚未连接
+    CONNECTING = "connecting"    # 正在建立连接（等待CONNACK）
+    CONNECTED = "connected"
+    BACKOFF = "backoff"          # 连接断开/失败，等待下一次重连
+    FAILED = "failed"            # 达到最大重连次数，停止自动重连
+    CLOSED = "closed"            # 主动断开
+
+
+class ReconnectBackoff:
+    """
+    指数退避：第 n 次重连前等待 min(max_delay, min_delay * 2^(n-1))，
+    再按 jitter 比例随机缩短（jitter=0.5 时在 [50%, 100%] 区间内取值）
+    """
+
+    def __init__(self, min_delay: float = 1.0, max_delay: float = 60.0, jitter: float = 0.5):
+        if min_delay <= 0 or max_delay < min_delay:
+            raise ValueError(f"无效的退避区间: {min_delay} ~ {max_delay}")
+        if not 0 <= jitter <= 1:
+            raise ValueError(f"jitter 必须在 0~1 之间: {jitter}")
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        """第 attempt 次（从1开始）重连前的等待时间"""
+        exponent = min(max(attempt - 1, 0), 32)
+        base = min(self.max_delay, self.min_delay * (2 ** exponent))
+        return base * (1 - self.jitter * random.random())
+
+
+class ConnectionMetrics:
+    """连接状态及统计（网络线程和事件循环都会更新，内部加锁）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = ConnectionState.IDLE
+        self.state_since = time.time()
+
+        self.connect_attempts = 0         # 累计连接尝试次数
+        self.consecutive_failures = 0     # 当前连续失败次数（连接成功后清零）
+        self.connections = 0              # 成功建立连接的次数
+        self.disconnects = 0              # 连接断开的次数
+        self.last_error: Optional[str] = None
+        self.last_connected_at: Optional[float] = None
+        self.last_disconnected_at: Optional[float] = None
+        self.next_retry_at: Optional[float] = None
+
+        self._disconnected_total = 0.0    # 已结束的断线时长累计（秒）
+        self._disconnected_since: Optional[float] = None
+
+    def set_state(self, state: ConnectionState):
+        with self._lock:
+            if state == self.state:
+                return
+            now = time.time()
+            if state == ConnectionState.CONNECTED:
+                if self._disconnected_since is not None:
+                    self._disconnected_total += now - self._disconnected_since
+                    self._disconnected_since = None
+                self.connections += 1
+                self.consecutive_failures = 0
+                self.last_connected_at = now
+                self.next_retry_at = None
+            elif self.state == ConnectionState.CONNECTED:
+                self.disconnects += 1
+                self.last_disconnected_at = now
+                self._disconnected_since = now
+            elif self._disconnected_since is None and state != ConnectionState.CLOSED:
+                self._disconnected_since = now
+            if state == ConnectionState.CLOSED and self._disconnected_since is not None:
+                self._disconnected_total += now - self._disconnected_since
+                self._disconnected_since = None
+            self.state = state
+            self.state_since = now
+
+    def record_attempt(self):
+        with self._lock:
+            self.connect_attempts += 1
+
+    def record_failure(self, error: str):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = error
+
+    def disconnected_seconds(self) -> float:
+        """累计断线时长（包括当前这次断线）"""
+        with self._lock:
+            total = self._disconnected_total
+            if self._disconnected_since is not None:
+                total += time.time() - self._disconnected_since
+            return total
+
+    def current_outage_seconds(self) -> float:
+        """当前这次断线已持续的时长，已连接时为0"""
+        with self._lock:
+            if self._disconnected_since is None:
+                return 0.0
+            return time.time() - self._disconnected_since
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "state_since": self.state_since,
+            "connect_attempts": self.connect_attempts,
+            "consecutive_failures": self.consecutive_failures,
+            "connections": self.connections,
+            "disconnects": self.disconnects,
+            "disconnected_seconds": round(self.disconnected_seconds(), 3),
+            "current_outage_seconds": round(self.current_outage_seconds(), 3),
+            "last_error": self.last_error,
+            "last_connected_at": self.last_connected_at,
+            "last_disconnected_at": self.last_disconnected_at,
+            "next_retry_at": self.next_retry_at,
+        }
+
+
+__all__ = ['ConnectionState', 'ReconnectBackoff', 'ConnectionMetrics']
@@ -0,0 +1,238 @@
+"""
+进程内回环MQTT
+In-process Loopback MQTT
+
+不依赖外部broker：LoopbackBroker 在进程内按订阅过滤器（+/# 通配符、$ 系统主题规则与 TopicRouter 一致）
+把消息转发给已连接的客户端，并支持 retained 消息。LoopbackMQTTManager 继承 MQTTManager，
+只替换网络传输，编解码、订阅队列、QoS选择、发布确认等逻辑与真实连接完全相同。
+
+用于离线运行、测试和确定性的压力测试；通过配置 MQTT_MODE=loopback（或配置文件 "mode": "loopback"）启用。
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
+
+from core.mqtt_manager import MQTTManager
+from core.mqtt_connection import ConnectionState
+from core.topic_router import TopicRouter, topic_matches
+from config.mqtt_config import MQTTConfig
+
+logger = logging.getLogger(__name__)
+
+
+class LoopbackMessage:
+    """与 paho MQTTMessage 相同的属性"""
+    __slots__ = ("topic", "payload", "qos", "retain", "mid")
+
+    def __init__(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False, mid: int = 0):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.mid = mid
+
+
+class LoopbackPublishInfo:
+    """与 paho MQTTMessageInfo 相同的接口；回环发布同步完成，总是已确认"""
+    __slots__ = ("rc", "mid")
+
+    def __init__(self, rc: int, mid: int):
+        self.rc = rc
+        self.mid = mid
+
+    def is_published(self) -> bool:
+        return self.rc == mqtt.MQTT_ERR_SUCCESS
+
+    def wait_for_publish(self, timeout: Optional[float] = None):
+        return None
+
+
+class LoopbackBroker:
+    """进程内broker：保存订阅和retained消息，同步转发发布的消息"""
+
+    def __init__(self):
+        self._router = TopicRouter()
+        self._retained: Dict[str, Tuple[bytes, int]] = {}
+        self._lock = threading.RLock()
+
+        # 统计信息
+        self.messages_in = 0
+        self.messages_out = 0
+
+    def subscribe(self, client: "LoopbackClient", topic_filter: str, qos: int) -> List[LoopbackMessage]:
+        """登记订阅，返回该过滤器匹配的retained消息（由客户端在订阅完成后投递）"""
+        with self._lock:
+            self._router.add(topic_filter, client.deliver)
+            return [LoopbackMessage(topic, payload, min(qos, message_qos), retain=True)
+                    for topic, (payload, message_qos) in self._retained.items()
+                    if topic_matches(topic_filter, topic)]
+
+    def unsubscribe(self, client: "LoopbackClient", topic_filter: str):
+        with self._lock:
+            self._router.remove(topic_filter, client.deliver)
+
+    def detach(self, client: "LoopbackClient"):
+        """客户端断开：移除它的全部订阅"""
+        with self._lock:
+            for topic_filter in client.filters:
+                self._router.remove(topic_filter, client.deliver)
+
+    def publish(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False):
+        with self._lock:
+            self.messages_in += 1
+            if retain:
+                # 空消息清除retained
+                if payload:
+                    self._retained[topic] = (payload, qos)
+                else:
+                    self._retained.pop(topic, None)
+            handlers = self._router.match(topic)
+        for deliver in handlers:
+            deliver(LoopbackMessage(topic, payload, qos))
+            self.messages_out += 1
+
+    def retained_topics(self) -> List[str]:
+        with self._lock:
+            return list(self._retained)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "filters": len(self._router),
+            "retained": len(self._retained),
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+        }
+
+
+# 默认共享broker：同一进程内的多个管理器互相可见
+_default_broker = LoopbackBroker()
+
+
+def get_default_broker() -> LoopbackBroker:
+    return _default_broker
+
+
+class LoopbackClient:
+    """实现 MQTTManager 用到的 paho Client 接口"""
+
+    def __init__(self, broker: LoopbackBroker, client_id: str = ""):
+        self.broker = broker
+        self.client_id = client_id
+        self.filters: Dict[str, int] = {}
+        self.connected = False
+        self._mid = 0
+
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_publish = None
+        self.on_message = None
+
+    def _next_mid(self) -> int:
+        self._mid = self._mid % 65535 + 1
+        return self._mid
+
+    def connect(self):
+        self.connected = True
+        if self.on_connect:
+            self.on_connect(self, None, {"session present": 0}, 0)
+
+    def deliver(self, message: LoopbackMessage):
+        if self.connected and self.on_message:
+            self.on_message(self, None, message)
+
+    def publish(self, topic: str, payload: bytes = b"", qos: int = 0, retain: bool = False) -> LoopbackPublishInfo:
+        if not self.connected:
+            return LoopbackPublishInfo(mqtt.MQTT_ERR_NO_CONN, 0)
+        mid = self._next_mid()
+        self.broker.publish(topic, payload, qos, retain)
+        if self.on_publish:
+            self.on_publish(self, None, mid)
+        return LoopbackPublishInfo(mqtt.MQTT_ERR_SUCCESS, mid)
+
+    def subscribe(self, topic: str, qos: int = 0) -> Tuple[int, int]:
+        if not self.connected:
+            return mqtt.MQTT_ERR_NO_CONN, 0
+        self.filters[topic] = qos
+        retained = self.broker.subscribe(self, topic, qos)
+        if retained:
+            # 与真实broker一样在SUBACK之后到达：订阅者完成注册后再投递
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            for message in retained:
+                if loop is not None:
+                    loop.call_soon(self.deliver, message)
+                else:
+                    self.deliver(message)
+        return mqtt.MQTT_ERR_SUCCESS, self._next_mid()
+
+    def unsubscribe(self, topic: str) -> Tuple[int, int]:
+        if not self.connected:
+            return mqtt.MQTT_ERR_NO_CONN, 0
+        self.filters.pop(topic, None)
+        self.broker.unsubscribe(self, topic)
+        return mqtt.MQTT_ERR_SUCCESS, self._next_mid()
+
+    def disconnect(self):
+        if not self.connected:
+            return mqtt.MQTT_ERR_NO_CONN
+        self.broker.detach(self)
+        self.filters.clear()
+        self.connected = False
+        if self.on_disconnect:
+            self.on_disconnect(self, None, 0)
+        return mqtt.MQTT_ERR_SUCCESS
+
+
+class LoopbackMQTTManager(MQTTManager):
+    """使用进程内回环broker的MQTT管理器（接口与 MQTTManager 相同）"""
+
+    def __init__(self, config: Optional[MQTTConfig] = None, broker: Optional[LoopbackBroker] = None):
+        super().__init__(config or MQTTConfig(host="loopback", mode="loopback"))
+        self.broker = broker or get_default_broker()
+        self.broker_host = "loopback"
+        self.broker_port = 0
+
+    def _create_client(self) -> LoopbackClient:
+        client = LoopbackClient(self.broker, self.client_id)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        client.on_message = self._on_message
+        return client
+
+    async def connect(self):
+        """连接到进程内broker（立即完成）"""
+        self._loop = asyncio.get_running_loop()
+        self._closing = False
+        if self.client is None:
+            self.client = self._create_client()
+        self.metrics.set_state(ConnectionState.CONNECTING)
+        self.metrics.record_attempt()
+        self.client.connect()
+        logger.info("MQTT回环连接成功（进程内broker）")
+        return self.is_connected
+
+    async def reconnect_mqtt(self):
+        if self.is_connected:
+            return True
+        return await self.connect()
+
+    def get_connection_status(self):
+        status = super().get_connection_status()
+        status["mode"] = "loopback"
+        status["loopback_broker"] = self.broker.get_stats()
+        return status
+
+
+__all__ = [
+    'LoopbackBroker',
+    'LoopbackClient',
+    'LoopbackMQTTManager',
+    'get_default_broker',
+]
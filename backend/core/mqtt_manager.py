@@ -1,11 +1,19 @@
 import paho.mqtt.client as mqtt
-import json
 import asyncio
+import inspect
 from datetime import datetime
 import threading
 import time
 import logging
-from typing import Dict, Callable, Any
+from collections import OrderedDict
+from typing import Dict, Callable, Any, Optional, List, Tuple
+
+from core.topic_router import TopicRouter
+from core.mqtt_subscription import MQTTSubscription
+from core.mqtt_codecs import CodecRegistry
+from core.mqtt_offline_buffer import OfflinePublishBuffer
+from core.mqtt_connection import ConnectionState, ConnectionMetrics, ReconnectBackoff
+from config.mqtt_config import MQTTConfig, load_mqtt_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,11 +21,12 @@ logger = logging.getLogger(__name__)
 class MQTTManager:
     """MQTT管理器 - 实现开发文档要求的MQTT功能"""
 
-    def __init__(self):
-        # MQTT配置 - 与开发文档保持一致
-        self.broker_host = "broker.emqx.io"
-        self.broker_port = 1883
-        self.client_id = "chromatography_system_" + str(int(time.time()))
+    def __init__(self, config: Optional[MQTTConfig] = None):
+        # MQTT配置 - 默认与开发文档一致，可通过环境变量 MQTT_* 或配置文件覆盖（见 config/mqtt_config.py）
+        self.config = config or load_mqtt_config()
+        self.broker_host = self.config.host
+        self.broker_port = self.config.port
+        self.client_id = self.config.client_id
 
         # 主题定义 - 基于开发文档要求
         self.topics = {
@@ -33,30 +42,64 @@ class MQTTManager:
         self.is_connected = False
         self._loop = None
         self._thread = None
-        self.message_handlers: Dict[str, Callable] = {}
-
-        # 重连配置
-        self.reconnect_enabled = True
-        self.reconnect_delay = 5  # 重连延迟（秒）
-        self.max_reconnect_attempts = 10
-        self.reconnect_count = 0
+        # 订阅过滤器 -> 订阅队列的投递函数（支持 +/# 通配符，同一过滤器可有多个订阅）
+        self.router = TopicRouter()
+        # 所有订阅队列，以及回调式处理器对应的 (订阅队列, 消费任务)
+        self._subscriptions: List[MQTTSubscription] = []
+        self._handler_subscriptions: Dict[Tuple[str, Callable], Tuple[MQTTSubscription, asyncio.Task]] = {}
+        self.default_queue_size = 1000
+
+        # 消息编解码：按主题选择编码（默认JSON），接收时按消息头部自动识别
+        # 例: self.codecs.set_topic_codec("chromatography/detector/+/signal", "detector_sample")
+        self.codecs = CodecRegistry()
+
+        # 按主题过滤器的QoS（发布和订阅未显式指定QoS时使用）
+        self._qos_router = TopicRouter()
+        for topic_filter, qos in self.config.topic_qos.items():
+            self.set_topic_qos(topic_filter, qos)
+        # 已向broker订阅的过滤器及其QoS（非持久会话重连后据此恢复订阅）
+        self._subscription_qos: Dict[str, int] = {}
+
+        # 离线发布缓冲：断线期间的消息按顺序缓存，重连后补发
+        self.offline_buffer = OfflinePublishBuffer(
+            self.config.offline_buffer_max_messages if self.config.offline_buffer_enabled else 0,
+            self.config.offline_buffer_max_bytes
+        )
+        # 保证补发和新消息的发布顺序
+        self._publish_lock = threading.Lock()
+
+        # 等待broker确认的发布：mid -> Future（on_publish回调在网络线程中完成）
+        self._ack_lock = threading.Lock()
+        self._ack_waiters: Dict[int, asyncio.Future] = {}
+        # 尚无等待者时已确认的mid（等待者注册前确认到达的情况）
+        self._unclaimed_acks: "OrderedDict[int, None]" = OrderedDict()
+
+        # 重连配置：由唯一的连接监督任务负责连接和重连（指数退避 + 抖动）
+        self.reconnect_enabled = self.config.reconnect_enabled
+        self.max_reconnect_attempts = self.config.reconnect_max_attempts  # 0 表示不限次数
+        self.reconnect_count = 0  # 当前连续重连次数
+        self._backoff = ReconnectBackoff(
+            self.config.reconnect_min_delay,
+            self.config.reconnect_max_delay,
+            self.config.reconnect_jitter
+        )
+        self.metrics = ConnectionMetrics()
+        self._supervisor_task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._closing = False
 
     async def connect(self):
-        """连接到MQTT服务器"""
+        """连接到MQTT服务器：启动连接监督任务并等待首次连接建立（超时后监督任务继续在后台重连）"""
         try:
             logger.info(f"连接MQTT服务器: {self.broker_host}:{self.broker_port}")
 
-            # 在新线程中运行MQTT客户端
-            self._thread = threading.Thread(target=self._run_mqtt_client, daemon=True)
-            self._thread.start()
+            # 记录应用事件循环，网络线程收到的消息通过它转交给订阅者
+            self._loop = asyncio.get_running_loop()
+            self._closing = False
+            self._ensure_supervisor()
 
             # 等待连接建立
-            timeout = 10
-            while not self.is_connected and timeout > 0:
-                await asyncio.sleep(0.1)
-                timeout -= 0.1
-
-            if self.is_connected:
+            if await self._wait_connected(self.config.connect_timeout):
                 logger.info("MQTT连接成功")
                 return True
             else:
@@ -67,113 +110,273 @@ class MQTTManager:
             logger.error(f"MQTT连接错误: {e}")
             return False
 
-    def _run_mqtt_client(self):
-        """在单独线程中运行MQTT客户端"""
-        self.client = mqtt.Client(client_id=self.client_id)
+    def _create_client(self) -> mqtt.Client:
+        """创建MQTT客户端（关闭paho内置重连，由监督任务统一重连）"""
+        client = mqtt.Client(client_id=self.client_id, clean_session=self.config.clean_session,
+                             reconnect_on_failure=False)
+
+        if self.config.username:
+            client.username_pw_set(self.config.username, self.config.password)
+        if self.config.tls_enabled:
+            client.tls_set(
+                ca_certs=self.config.tls_ca_certs,
+                certfile=self.config.tls_certfile,
+                keyfile=self.config.tls_keyfile
+            )
+            if self.config.tls_insecure:
+                client.tls_insecure_set(True)
 
         # 设置回调函数
-        self.client.on_connect = self._on_connect
-        self.client.on_disconnect = self._on_disconnect
-        self.client.on_publish = self._on_publish
-        self.client.on_message = self._on_message
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        client.on_message = self._on_message
+        return client
+
+    def _ensure_supervisor(self):
+        """确保连接监督任务在运行（只会存在一个）"""
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        if self._supervisor_task is None or self._supervisor_task.done():
+            self._supervisor_task = self._loop.create_task(self._connection_supervisor())
+
+    async def _wait_connected(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not self.is_connected and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        return self.is_connected
+
+    async def _connection_supervisor(self):
+        """
+        连接监督任务：建立连接 -> 网络线程运行直到断开 -> 退避等待 -> 重连
+
+        每次连接在独立的网络线程中运行 client.connect() + loop_forever()，
+        连接断开后线程结束，监督任务按指数退避（带抖动）等待后发起下一次连接。
+        """
+        if self.client is None:
+            self.client = self._create_client()
+
+        while not self._closing:
+            self._wake.clear()
+            self.metrics.set_state(ConnectionState.CONNECTING)
+            self.metrics.record_attempt()
+            connections_before = self.metrics.connections
+
+            error = await self._run_network_thread()
+            if self._closing:
+                break
+
+            if self.metrics.connections > connections_before:
+                # 本次连接曾经建立，断线后从最短退避重新计数
+                self.reconnect_count = 0
+            else:
+                self.metrics.record_failure(error or "连接失败")
+                logger.warning(f"MQTT连接失败: {error}")
+
+            if not self.reconnect_enabled:
+                self.metrics.set_state(ConnectionState.FAILED)
+                logger.error("MQTT连接断开，自动重连已禁用")
+                return
+
+            self.reconnect_count += 1
+            if self.max_reconnect_attempts and self.reconnect_count > self.max_reconnect_attempts:
+                self.metrics.set_state(ConnectionState.FAILED)
+                logger.error(f"达到最大重连次数 {self.max_reconnect_attempts}，停止重连")
+                return
+
+            delay = self._backoff.delay(self.reconnect_count)
+            self.metrics.next_retry_at = time.time() + delay
+            self.metrics.set_state(ConnectionState.BACKOFF)
+            limit = self.max_reconnect_attempts or "∞"
+            logger.info(f"{delay:.1f}秒后重连 MQTT ({self.reconnect_count}/{limit})...")
+            try:
+                # reconnect_mqtt() 可提前唤醒
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+        self.metrics.set_state(ConnectionState.CLOSED)
+
+    async def _run_network_thread(self) -> Optional[str]:
+        """在网络线程中运行一次连接，连接结束后返回失败原因（正常断开返回None）"""
+        future = self._loop.create_future()
+
+        def finish(result: Optional[str]):
+            if not future.done():
+                future.set_result(result)
+
+        def run():
+            result = self._run_mqtt_client()
+            try:
+                self._loop.call_soon_threadsafe(finish, result)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+        self._thread = threading.Thread(target=run, daemon=True, name="mqtt-network")
+        self._thread.start()
+        return await future
 
+    def _run_mqtt_client(self) -> Optional[str]:
+        """网络线程：连接broker并运行网络循环直到连接断开"""
         try:
             # 连接到broker
-            self.client.connect(self.broker_host, self.broker_port, 60)
+            self.client.connect(self.broker_host, self.broker_port, self.config.keepalive)
 
-            # 开始循环
-            self.client.loop_forever()
+            # 开始循环（paho内置重连已关闭，连接断开后返回）
+            rc = self.client.loop_forever()
+            return None if rc in (mqtt.MQTT_ERR_SUCCESS, 1) else mqtt.error_string(rc)
 
         except Exception as e:
-            logger.error(f"MQTT客户端错误: {e}")
+            return str(e) or e.__class__.__name__
 
     def _on_connect(self, client, userdata, flags, rc):
         """连接回调函数"""
         if rc == 0:
-            self.is_connected = True
             self.reconnect_count = 0  # 重置重连计数
-            logger.info("MQTT连接建立成功")
+            session_present = bool(flags.get("session present")) if isinstance(flags, dict) else False
+            logger.info(f"MQTT连接建立成功 (session_present={session_present})")
+
+            # broker没有保留会话时重新订阅
+            if not session_present:
+                for topic, qos in list(self._subscription_qos.items()):
+                    client.subscribe(topic, qos)
+
+            # 先按顺序补发离线消息，再接受新的发布
+            with self._publish_lock:
+                self._replay_offline_buffer()
+                self.is_connected = True
+            self.metrics.set_state(ConnectionState.CONNECTED)
         else:
-            logger.error(f"MQTT连接失败，错误码: {rc}")
+            self.metrics.last_error = mqtt.connack_string(rc)
+            logger.error(f"MQTT连接失败，错误码: {rc} ({mqtt.connack_string(rc)})")
 
     def _on_disconnect(self, client, userdata, rc):
         """断开连接回调函数"""
         self.is_connected = False
-        logger.warning("MQTT连接断开")
-
-        # 如果是意外断开（rc != 0）且启用了重连，则尝试重连
-        if rc != 0 and self.reconnect_enabled:
-            self._attempt_reconnect()
+        if self._closing:
+            return
+        if rc != 0:
+            self.metrics.last_error = mqtt.error_string(rc)
+        self.metrics.set_state(ConnectionState.BACKOFF)
+        # 网络线程随后结束，由连接监督任务负责重连
+        logger.warning(f"MQTT连接断开 (rc={rc})")
 
     def _on_publish(self, client, userdata, mid):
-        """消息发布回调函数"""
-        pass  # 不记录每次发布，避免日志过多
+        """消息发布回调函数：QoS0写入socket、QoS1收到PUBACK、QoS2完成握手后触发（不记录日志，避免日志过多）"""
+        with self._ack_lock:
+            future = self._ack_waiters.pop(mid, None)
+            if future is None:
+                self._unclaimed_acks[mid] = None
+                if len(self._unclaimed_acks) > 1024:
+                    self._unclaimed_acks.popitem(last=False)
+                return
+        try:
+            future.get_loop().call_soon_threadsafe(self._resolve_ack, future)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+
+    @staticmethod
+    def _resolve_ack(future: asyncio.Future):
+        if not future.done():
+            future.set_result(True)
+
+    async def _wait_for_ack(self, info: mqtt.MQTTMessageInfo, timeout: float) -> bool:
+        """等待broker确认一条已发出的消息"""
+        future = asyncio.get_running_loop().create_future()
+        with self._ack_lock:
+            if info.is_published() or self._unclaimed_acks.pop(info.mid, False) is None:
+                return True
+            self._ack_waiters[info.mid] = future
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"等待broker确认超时 (mid={info.mid}, {timeout}秒)")
+            return False
+        finally:
+            with self._ack_lock:
+                if self._ack_waiters.get(info.mid) is future:
+                    del self._ack_waiters[info.mid]
 
     def _on_message(self, client, userdata, message):
         """消息接收回调函数"""
         try:
             topic = message.topic
-            payload = message.payload.decode('utf-8')
 
-            # 处理JSON消息
-            try:
-                data = json.loads(payload)
-            except:
-                data = payload
+            # 按消息头部识别编码（无头部时按JSON/文本解析）
+            data = self.codecs.decode(message.payload)
 
-            # 调用注册的消息处理器
-            if topic in self.message_handlers:
+            # 投递到所有匹配的订阅队列（处理器在事件循环中执行）
+            for deliver in self.router.match(topic):
                 try:
-                    self.message_handlers[topic](topic, data)
+                    deliver(topic, data)
                 except Exception as e:
-                    logger.error(f"消息处理错误 {topic}: {e}")
+                    logger.error(f"消息投递错误 {topic}: {e}")
 
-            logger.debug(f"收到消息 {topic}: {payload[:100]}...")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"收到消息 {topic}: {str(data)[:100]}...")
 
         except Exception as e:
             logger.error(f"处理MQTT消息时出错: {e}")
 
-    def _attempt_reconnect(self):
-        """尝试重新连接"""
-        if self.reconnect_count >= self.max_reconnect_attempts:
-            logger.error(f"达到最大重连次数 {self.max_reconnect_attempts}，停止重连")
+    def qos_for(self, topic: str) -> int:
+        """主题对应的QoS：精确过滤器优先，其次通配符过滤器中的最大值，最后为默认QoS"""
+        qos = self.config.topic_qos.get(topic)
+        if qos is not None:
+            return qos
+        matched = self._qos_router.match(topic)
+        if matched:
+            return max(self.config.topic_qos[topic_filter] for topic_filter in matched)
+        return self.config.default_qos
+
+    def set_topic_qos(self, topic_filter: str, qos: int):
+        """为主题过滤器（支持 +/# 通配符）指定QoS"""
+        if qos not in (0, 1, 2):
+            raise ValueError(f"无效的QoS: {qos}")
+        self._qos_router.add(topic_filter, topic_filter)
+        self.config.topic_qos[topic_filter] = qos
+
+    def _replay_offline_buffer(self):
+        """按顺序补发离线缓冲中的消息（调用方持有 _publish_lock）"""
+        if not len(self.offline_buffer):
             return
+        count = 0
+        while len(self.offline_buffer):
+            message = self.offline_buffer.pop()
+            result = self.client.publish(message.topic, message.payload, qos=message.qos, retain=message.retain)
+            if result.rc != mqtt.MQTT_ERR_SUCCESS:
+                self.offline_buffer.push_front(message)
+                logger.error(f"补发离线消息失败 {message.topic}，错误码: {result.rc}，剩余 {len(self.offline_buffer)} 条")
+                break
+            count += 1
+        self.offline_buffer.replayed += count
+        logger.info(f"已补发离线消息 {count} 条")
+
+    def _buffer_offline(self, topic: str, payload: bytes, qos: int, retain: bool):
+        """缓存断线期间的消息"""
+        first = len(self.offline_buffer) == 0
+        if self.offline_buffer.append(topic, payload, qos, retain):
+            if first:
+                logger.warning(f"MQTT未连接，消息将缓存至重连后补发（首条: {topic}）")
+        else:
+            logger.warning(f"MQTT未连接，消息未缓存: {topic}")
 
-        self.reconnect_count += 1
-        logger.info(f"尝试重连 MQTT ({self.reconnect_count}/{self.max_reconnect_attempts})...")
-
-        # 使用定时器延迟重连
-        def delayed_reconnect():
-            time.sleep(self.reconnect_delay)
-            if self.client and not self.is_connected:
-                try:
-                    self.client.reconnect()
-                    logger.info("MQTT重连命令已发送")
-                except Exception as e:
-                    logger.error(f"MQTT重连失败: {e}")
-                    # 如果重连失败，继续尝试
-                    if self.reconnect_count < self.max_reconnect_attempts:
-                        self._attempt_reconnect()
-
-        # 在新线程中延迟重连
-        reconnect_thread = threading.Thread(target=delayed_reconnect, daemon=True)
-        reconnect_thread.start()
-
-    async def publish_data(self, topic: str, data: Any, qos: int = 0):
-        """发布数据到MQTT - 实现开发文档要求的数据格式"""
-        if not self.is_connected or not self.client:
-            logger.warning(f"MQTT未连接，无法发布数据到 {topic}")
-
-            # 如果启用了重连且当前未在重连过程中，则尝试重连
-            if self.reconnect_enabled and self.reconnect_count < self.max_reconnect_attempts:
-                self._attempt_reconnect()
+    async def publish_data(self, topic: str, data: Any, qos: Optional[int] = None, retain: bool = False,
+                           ack_timeout: Optional[float] = None):
+        """
+        发布数据到MQTT - 实现开发文档要求的数据格式
 
-            return False
+        qos为None时按主题配置选择；retain=True时broker保留最后一条消息。
+        ack_timeout不为None时等待broker确认（QoS0为写入socket），超时返回False。
+        未连接时消息进入离线缓冲，重连后按顺序补发（此时返回False）。
+        """
+        if qos is None:
+            qos = self.qos_for(topic)
 
         try:
             # 如果data是列表或基本类型，直接发送
             if isinstance(data, (list, int, float, str, bool)):
-                json_message = json.dumps(data, ensure_ascii=False)
+                message = data
             # 如果是字典，按照原有逻辑处理
             elif isinstance(data, dict):
                 # 确保数据格式符合开发文档要求
@@ -190,72 +393,200 @@ class MQTTManager:
                         "device_id": data.get("device_id", "unknown"),
                         "data": data
                     }
-                json_message = json.dumps(message, ensure_ascii=False)
             else:
                 # 其他类型，尝试直接序列化
-                json_message = json.dumps(data, ensure_ascii=False)
+                message = data
 
-            # 发布消息
-            result = self.client.publish(topic, json_message, qos=qos)
+            # 按主题对应的编码序列化
+            payload = self.codecs.encode(topic, message)
+        except Exception as e:
+            logger.error(f"编码数据时出错 {topic}: {e}")
+            return False
 
-            if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                logger.debug(f"成功发布到 {topic}: {json_message[:100]}...")
-                return True
-            else:
-                logger.error(f"发布失败到 {topic}，错误码: {result.rc}")
+        with self._publish_lock:
+            if not self.is_connected or not self.client:
+                # 断线期间只缓存，重连由连接监督任务负责
+                self._buffer_offline(topic, payload, qos, retain)
+                return False
+            try:
+                result = self.client.publish(topic, payload, qos=qos, retain=retain)
+            except Exception as e:
+                logger.error(f"发布数据时出错: {e}")
                 return False
 
-        except Exception as e:
-            logger.error(f"发布数据时出错: {e}")
+        if result.rc == mqtt.MQTT_ERR_SUCCESS:
+            logger.debug(f"成功发布到 {topic}: {payload[:100]!r}...")
+            if ack_timeout is not None:
+                return await self._wait_for_ack(result, ack_timeout)
+            return True
+        if result.rc == mqtt.MQTT_ERR_NO_CONN:
+            # 连接刚断开，回调尚未更新状态
+            self._buffer_offline(topic, payload, qos, retain)
             return False
+        logger.error(f"发布失败到 {topic}，错误码: {result.rc}")
+        return False
+
+    async def _broker_subscribe(self, topic: str, qos: int) -> bool:
+        """向broker订阅（同一过滤器只订阅一次）"""
+        if self.router.has_filter(topic):
+            return True
+
+        result = self.client.subscribe(topic, qos)
+        if result[0] == mqtt.MQTT_ERR_SUCCESS:
+            logger.info(f"成功订阅主题: {topic} (QoS {qos})")
+            self.router.add(topic)
+            self._subscription_qos[topic] = qos
+            return True
+
+        logger.error(f"订阅主题失败 {topic}，错误码: {result[0]}")
+        return False
+
+    def _broker_unsubscribe(self, topic: str) -> bool:
+        """向broker取消订阅"""
+        self._subscription_qos.pop(topic, None)
+        result = self.client.unsubscribe(topic)
+        if result[0] == mqtt.MQTT_ERR_SUCCESS:
+            logger.info(f"成功取消订阅主题: {topic}")
+            return True
+
+        logger.error(f"取消订阅失败 {topic}，错误码: {result[0]}")
+        return False
+
+    async def subscribe(self, topic: str, qos: Optional[int] = None, maxsize: Optional[int] = None,
+                        name: Optional[str] = None) -> Optional[MQTTSubscription]:
+        """
+        订阅主题并返回有界消息队列（异步迭代器）
+
+        Args:
+            topic: 订阅过滤器，支持 +/# 通配符
+            qos: 为None时按主题配置选择
+            maxsize: 队列容量，满时丢弃最旧的消息
 
-    async def subscribe_topic(self, topic: str, handler: Callable = None, qos: int = 0):
-        """订阅主题"""
+        Returns:
+            MQTTSubscription: 在事件循环上 `async for topic, data in subscription` 消费；失败返回None
+        """
         if not self.client or not self.is_connected:
             logger.error("MQTT未连接，无法订阅主题")
-            return False
+            return None
 
-        try:
-            result = self.client.subscribe(topic, qos)
-            if result[0] == mqtt.MQTT_ERR_SUCCESS:
-                logger.info(f"成功订阅主题: {topic}")
+        if qos is None:
+            qos = self.qos_for(topic)
 
-                # 注册消息处理器
-                if handler:
-                    self.message_handlers[topic] = handler
+        try:
+            if not await self._broker_subscribe(topic, qos):
+                return None
 
-                return True
-            else:
-                logger.error(f"订阅主题失败 {topic}，错误码: {result[0]}")
-                return False
+            loop = self._loop or asyncio.get_running_loop()
+            subscription = MQTTSubscription(topic, loop, maxsize or self.default_queue_size, name)
+            self.router.add(topic, subscription.deliver_threadsafe)
+            self._subscriptions.append(subscription)
+            return subscription
 
         except Exception as e:
             logger.error(f"订阅主题时出错: {e}")
-            return False
+            return None
+
+    async def unsubscribe(self, subscription: MQTTSubscription) -> bool:
+        """关闭订阅队列，主题上没有其他订阅时向broker取消订阅"""
+        subscription.close()
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
 
-    async def unsubscribe_topic(self, topic: str):
-        """取消订阅主题"""
+        if not self.router.remove(subscription.topic_filter, subscription.deliver_threadsafe):
+            return True
         if not self.client:
             return False
-
         try:
-            result = self.client.unsubscribe(topic)
-            if result[0] == mqtt.MQTT_ERR_SUCCESS:
-                logger.info(f"成功取消订阅主题: {topic}")
+            return self._broker_unsubscribe(subscription.topic_filter)
+        except Exception as e:
+            logger.error(f"取消订阅时出错: {e}")
+            return False
 
-                # 移除消息处理器
-                if topic in self.message_handlers:
-                    del self.message_handlers[topic]
+    async def _run_handler(self, subscription: MQTTSubscription, handler: Callable):
+        """在事件循环上依次把消息交给回调处理器（支持普通函数和协程函数）"""
+        async for topic, data in subscription:
+            try:
+                result = handler(topic, data)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"消息处理错误 {topic}: {e}")
+
+    async def subscribe_topic(self, topic: str, handler: Callable = None, qos: Optional[int] = None,
+                              maxsize: Optional[int] = None):
+        """
+        订阅主题（支持 +/# 通配符；同一主题的多个处理器共用一次broker订阅）
+
+        处理器在应用事件循环中执行，可以直接创建任务或访问共享状态。
+        """
+        if not self.client or not self.is_connected:
+            logger.error("MQTT未连接，无法订阅主题")
+            return False
 
-                return True
-            else:
-                logger.error(f"取消订阅失败 {topic}，错误码: {result[0]}")
+        if handler is None:
+            try:
+                return await self._broker_subscribe(topic, self.qos_for(topic) if qos is None else qos)
+            except Exception as e:
+                logger.error(f"订阅主题时出错: {e}")
                 return False
 
+        if (topic, handler) in self._handler_subscriptions:
+            return True
+
+        name = f"{topic} -> {getattr(handler, '__qualname__', repr(handler))}"
+        subscription = await self.subscribe(topic, qos, maxsize, name=name)
+        if subscription is None:
+            return False
+
+        task = asyncio.create_task(self._run_handler(subscription, handler))
+        self._handler_subscriptions[(topic, handler)] = (subscription, task)
+        return True
+
+    async def unsubscribe_topic(self, topic: str, handler: Optional[Callable] = None):
+        """
+        取消订阅主题
+
+        指定handler时只移除该处理器，主题上没有其他订阅时才向broker取消订阅；
+        未指定handler时移除该主题的全部订阅。
+        """
+        if not self.client:
+            return False
+
+        if not self.router.has_filter(topic):
+            logger.warning(f"主题未订阅: {topic}")
+            return False
+
+        keys = [key for key in self._handler_subscriptions
+                if key[0] == topic and (handler is None or key[1] == handler)]
+        for key in keys:
+            subscription, task = self._handler_subscriptions.pop(key)
+            subscription.close()
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            self.router.remove(topic, subscription.deliver_threadsafe)
+            task.cancel()
+
+        if handler is None:
+            for subscription in [sub for sub in self._subscriptions if sub.topic_filter == topic]:
+                subscription.close()
+                self._subscriptions.remove(subscription)
+            self.router.remove(topic)
+        elif self.router.handler_counts().get(topic):
+            logger.info(f"移除主题处理器: {topic}")
+            return True
+        else:
+            self.router.remove(topic)
+
+        try:
+            return self._broker_unsubscribe(topic)
         except Exception as e:
             logger.error(f"取消订阅时出错: {e}")
             return False
 
+    def get_subscription_stats(self) -> List[Dict[str, Any]]:
+        """获取各订阅队列的投递、丢弃和积压统计"""
+        return [subscription.get_stats() for subscription in self._subscriptions]
+
     async def publish_random_data(self, value: float):
         """发布随机数据 - 开发文档要求的核心功能"""
         data = {
@@ -285,50 +616,91 @@ class MQTTManager:
         return await self.publish_data(topic, data)
 
     # 为了兼容性，添加publish别名
-    async def publish(self, topic: str, data: Any, qos: int = 0):
+    async def publish(self, topic: str, data: Any, qos: Optional[int] = None, retain: bool = False):
         """发布数据到MQTT (别名)"""
-        return await self.publish_data(topic, data, qos)
+        return await self.publish_data(topic, data, qos, retain)
 
     async def reconnect_mqtt(self):
-        """手动重连MQTT"""
+        """手动重连MQTT：唤醒处于退避等待的监督任务，或在放弃重连后重新启动"""
         if self.is_connected:
             logger.info("MQTT已连接，无需重连")
             return True
 
         logger.info("手动触发MQTT重连...")
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        self._closing = False
         self.reconnect_count = 0  # 重置重连计数
-        self._attempt_reconnect()
+        self._ensure_supervisor()
+        self._wake.set()
 
         # 等待连接建立
-        timeout = 10
-        while not self.is_connected and timeout > 0:
-            await asyncio.sleep(0.1)
-            timeout -= 0.1
-
-        return self.is_connected
+        return await self._wait_connected(self.config.connect_timeout)
 
     async def disconnect(self):
         """断开MQTT连接"""
-        self.reconnect_enabled = False  # 禁用自动重连
+        self._closing = True  # 停止连接监督任务
+
+        # 结束所有订阅队列和处理器任务
+        for subscription, task in self._handler_subscriptions.values():
+            task.cancel()
+        self._handler_subscriptions.clear()
+        for subscription in self._subscriptions:
+            subscription.close()
+        self._subscriptions.clear()
 
         if self.client:
             self.is_connected = False
-            self.client.loop_stop()
             self.client.disconnect()
 
+        if self._supervisor_task and not self._supervisor_task.done():
+            self._supervisor_task.cancel()
+            try:
+                await self._supervisor_task
+            except asyncio.CancelledError:
+                pass
+        self.metrics.set_state(ConnectionState.CLOSED)
+
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=2)
 
         logger.info("MQTT连接已断开")
 
+    def get_connection_metrics(self) -> Dict[str, Any]:
+        """连接状态机、断线时长、重连次数以及断线期间缓存/丢弃的消息数"""
+        buffer_stats = self.offline_buffer.get_stats()
+        metrics = self.metrics.to_dict()
+        metrics.update({
+            "reconnect_count": self.reconnect_count,
+            "messages_buffered": buffer_stats["buffered"],
+            "messages_dropped": buffer_stats["dropped"],
+            "messages_pending": buffer_stats["pending"],
+            "messages_replayed": buffer_stats["replayed"],
+        })
+        return metrics
+
     def get_connection_status(self):
         """获取连接状态"""
         return {
             "connected": self.is_connected,
             "broker": f"{self.broker_host}:{self.broker_port}",
             "client_id": self.client_id,
-            "subscribed_topics": list(self.message_handlers.keys()),
+            "config": self.config.to_dict(),
+            "offline_buffer": self.offline_buffer.get_stats(),
+            "subscribed_topics": self.router.filters(),
+            "subscriptions": self.get_subscription_stats(),
+            "topic_codecs": self.codecs.get_topic_codecs(),
+            "connection": self.get_connection_metrics(),
             "reconnect_enabled": self.reconnect_enabled,
             "reconnect_count": self.reconnect_count,
             "max_reconnect_attempts": self.max_reconnect_attempts
-        }
\ No newline at end of file
+        }
+
+
+def create_mqtt_manager(config: Optional[MQTTConfig] = None) -> MQTTManager:
+    """按配置创建MQTT管理器：mode=loopback 时返回进程内回环实现"""
+    config = config or load_mqtt_config()
+    if config.mode == "loopback":
+        from core.mqtt_loopback import LoopbackMQTTManager
+        return LoopbackMQTTManager(config)
+    return MQTTManager(config)
@@ -0,0 +1,109 @@
+"""
+MQTT离线发布缓冲
+MQTT Offline Publish Buffer
+
+断线期间发布的消息（已编码）按顺序缓存，重连后按原顺序补发。
+缓冲按消息条数和字节数双重限制，超出时丢弃最旧的消息。
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple
+
+
+class BufferedMessage(NamedTuple):
+    topic: str
+    payload: bytes
+    qos: int
+    retain: bool
+    buffered_at: float
+
+
+class OfflinePublishBuffer:
+    """有界离线发布缓冲（线程安全：事件循环写入，paho网络线程在重连时取出）"""
+
+    def __init__(self, max_messages: int = 1000, max_bytes: int = 1024 * 1024):
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self._messages: Deque[BufferedMessage] = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.buffered = 0       # 累计缓存的消息数
+        self.dropped = 0        # 超出上限被丢弃的消息数
+        self.replayed = 0       # 重连后补发的消息数
+
+    def append(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False) -> bool:
+        """
+        缓存一条消息
+
+        Returns:
+            bool: 是否已缓存（单条消息超过字节上限或上限为0时返回False）
+        """
+        size = len(payload)
+        with self._lock:
+            if self.max_messages == 0 or size > self.max_bytes:
+                self.dropped += 1
+                return False
+            while self._messages and (len(self._messages) >= self.max_messages
+                                      or self._bytes + size > self.max_bytes):
+                oldest = self._messages.popleft()
+                self._bytes -= len(oldest.payload)
+                self.dropped += 1
+            self._messages.append(BufferedMessage(topic, payload, qos, retain, time.time()))
+            self._bytes += size
+            self.buffered += 1
+            return True
+
+    def pop(self) -> BufferedMessage:
+        """取出最旧的消息（缓冲为空时抛出 IndexError）"""
+        with self._lock:
+            message = self._messages.popleft()
+            self._bytes -= len(message.payload)
+            return message
+
+    def push_front(self, message: BufferedMessage):
+        """补发失败时把消息放回队首，保持顺序"""
+        with self._lock:
+            self._messages.appendleft(message)
+            self._bytes += len(message.payload)
+
+    def drain(self) -> List[BufferedMessage]:
+        """取出全部消息"""
+        with self._lock:
+            messages = list(self._messages)
+            self._messages.clear()
+            self._bytes = 0
+            return messages
+
+    def clear(self):
+        with self._lock:
+            self.dropped += len(self._messages)
+            self._messages.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            oldest = self._messages[0].buffered_at if self._messages else None
+        return {
+            "pending": len(self._messages),
+            "pending_bytes": self._bytes,
+            "max_messages": self.max_messages,
+            "max_bytes": self.max_bytes,
+            "buffered": self.buffered,
+            "dropped": self.dropped,
+            "replayed": self.replayed,
+            "oldest_pending_at": oldest,
+        }
+
+
+__all__ = ['OfflinePublishBuffer', 'BufferedMessage']
@@ -0,0 +1,128 @@
+"""
+MQTT订阅队列
+MQTT Subscription Queue
+
+paho 的回调在其网络线程中执行。每个订阅持有一个有界 asyncio.Queue，
+网络线程通过 loop.call_soon_threadsafe 把消息投递到事件循环中入队，
+消费者在事件循环上以异步迭代器读取，不会跨线程访问共享状态。
+队列满时丢弃最旧的消息（保留最新数据），并记录丢弃数和积压情况。
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 关闭订阅时放入队列的结束标记
+_CLOSED = object()
+
+
+class MQTTSubscription:
+    """
+    单个订阅的有界消息队列
+
+    用法：
+        subscription = await mqtt_manager.subscribe("chromatography/detector/+/signal")
+        async for topic, data in subscription:
+            ...
+    """
+
+    def __init__(self, topic_filter: str, loop: asyncio.AbstractEventLoop, maxsize: int = 1000,
+                 name: Optional[str] = None):
+        self.topic_filter = topic_filter
+        self.name = name or topic_filter
+        self.maxsize = maxsize
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._closed = False
+
+        # 统计信息
+        self.received = 0        # 网络线程收到的消息数
+        self.delivered = 0       # 被消费者取走的消息数
+        self.dropped = 0         # 队列满被丢弃的消息数
+        self.max_lag = 0         # 队列最大积压
+        self.last_received_at: Optional[float] = None
+
+    # ============= 网络线程侧 =============
+
+    def deliver_threadsafe(self, topic: str, data: Any):
+        """在paho网络线程中调用：把消息转交到事件循环"""
+        if self._closed:
+            return
+        self.received += 1
+        self.last_received_at = time.time()
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, topic, data)
+        except RuntimeError:
+            # 事件循环已关闭
+            self.dropped += 1
+
+    # ============= 事件循环侧 =============
+
+    def _enqueue(self, topic: str, data: Any):
+        if self._closed:
+            return
+        if self._queue.full():
+            # 丢弃最旧的消息，保留最新数据
+            try:
+                self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"订阅队列已满，丢弃旧消息 ({self.name})，累计丢弃 {self.dropped} 条")
+        self._queue.put_nowait((topic, data))
+        self.max_lag = max(self.max_lag, self._queue.qsize())
+
+    async def get(self) -> Tuple[str, Any]:
+        """等待下一条消息，订阅关闭后抛出 StopAsyncIteration"""
+        item = await self._queue.get()
+        if item is _CLOSED:
+            # 让其他等待者也能收到结束标记
+            self._queue.put_nowait(_CLOSED)
+            raise StopAsyncIteration
+        self.delivered += 1
+        return item
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Tuple[str, Any]:
+        return await self.get()
+
+    def close(self):
+        """关闭订阅：丢弃未消费的消息并结束迭代（须在事件循环线程中调用）"""
+        if self._closed:
+            return
+        self._closed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(_CLOSED)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def lag(self) -> int:
+        """当前积压的消息数"""
+        return 0 if self._closed else self._queue.qsize()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "topic_filter": self.topic_filter,
+            "maxsize": self.maxsize,
+            "received": self.received,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "lag": self.lag,
+            "max_lag": self.max_lag,
+            "last_received_at": self.last_received_at,
+            "closed": self._closed,
+        }
+
+
+__all__ = ['MQTTSubscription']
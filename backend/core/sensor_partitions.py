@@ -0,0 +1,511 @@
+"""
+传感器数据时间分区与降采样汇总
+Time-partitioned Sensor Data with Rollups
+
+原始数据按天写入 sensor_data_YYYYMMDD 分区表（索引 device_id, ts），
+写入时同步更新 10秒 / 1分钟 / 10分钟 三级汇总表（min/max/sum/count）。
+长时间范围查询根据点数预算自动选择满足要求的最粗分辨率。
+旧版单表 sensor_data 中的历史数据在启动时一次性（可断点续传）迁移到分区和汇总表。
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Any, Optional, Iterable, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 汇总级别：名称 -> 桶宽（秒），从细到粗
+ROLLUP_LEVELS: "OrderedDict[str, int]" = OrderedDict([
+    ("10s", 10),
+    ("1m", 60),
+    ("10m", 600),
+])
+
+PARTITION_PREFIX = "sensor_data_"
+PARTITION_REGISTRY = "sensor_partitions"
+LEGACY_TABLE = "sensor_data"
+LEGACY_MIGRATION = "sensor_legacy_migration"
+
+TimeLike = Union[str, float, int, datetime, None]
+
+
+def to_epoch(value: TimeLike) -> Optional[float]:
+    """将ISO字符串、datetime或数值时间戳统一转换为epoch秒"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+
+
+def legacy_epoch(value: TimeLike) -> Optional[float]:
+    """
+    旧版 sensor_data.timestamp 转换为epoch秒
+
+    旧表的时间戳来自 SQLite CURRENT_TIMESTAMP（"YYYY-MM-DD HH:MM:SS"，UTC）；
+    带 "T" 的ISO字符串为应用写入的本地时间，按 to_epoch 处理；无法解析时返回None。
+    """
+    if isinstance(value, str) and "T" not in value and "+" not in value:
+        try:
+            return datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            pass
+    try:
+        return to_epoch(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def rollup_table(level: str) -> str:
+    """汇总表名"""
+    return f"sensor_rollup_{level}"
+
+
+class SensorPartitionStore:
+    """
+    传感器数据分区存储
+
+    所有方法都接收调用方提供的aiosqlite连接，读写连接的选择和事务由DatabaseManager负责。
+    """
+
+    def __init__(self):
+        # 已确认存在的分区：表名 -> (起始ts, 结束ts)
+        self._partitions: Dict[str, Tuple[float, float]] = {}
+        self._schema_ready = False
+        # 加载分区登记时的 schema_version；其他连接/实例建表或删表后会变化
+        self._schema_version: Optional[int] = None
+
+    # ============= 结构管理 =============
+
+    async def ensure_schema(self, conn):
+        """创建分区登记表和汇总表"""
+        if self._schema_ready:
+            return
+
+        await conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {PARTITION_REGISTRY} (
+                table_name VARCHAR(50) PRIMARY KEY,
+                partition_day VARCHAR(8) NOT NULL,
+                start_ts REAL NOT NULL,
+                end_ts REAL NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        for level in ROLLUP_LEVELS:
+            await conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS {rollup_table(level)} (
+                    device_id VARCHAR(50) NOT NULL,
+                    bucket_ts REAL NOT NULL,
+                    min_value REAL NOT NULL,
+                    max_value REAL NOT NULL,
+                    sum_value REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (device_id, bucket_ts)
+                ) WITHOUT ROWID
+            ''')
+
+        await conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {LEGACY_MIGRATION} (
+                table_name VARCHAR(50) PRIMARY KEY,
+                last_id INTEGER NOT NULL,
+                migrated_rows INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        self._schema_ready = True
+        await self._sync_partitions(conn)
+
+    async def _sync_partitions(self, conn):
+        """
+        数据库结构变化后重新加载分区登记
+
+        同一数据库可能被多个实例/连接写入，任何一方创建或删除分区都会使 schema_version 变化；
+        未变化时只有一次 PRAGMA 查询的开销。
+        """
+        async with conn.execute("PRAGMA schema_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        if version == self._schema_version:
+            return
+
+        async with conn.execute(
+            f"SELECT table_name, start_ts, end_ts FROM {PARTITION_REGISTRY}"
+        ) as cursor:
+            self._partitions = {row[0]: (row[1], row[2]) for row in await cursor.fetchall()}
+        self._schema_version = version
+
+    @staticmethod
+    def _day_bounds(ts: float) -> Tuple[str, float, float]:
+        """时间戳所在的本地自然日：(YYYYMMDD, 起始ts, 结束ts)"""
+        day_start = datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start + timedelta(days=1)
+        return day_start.strftime("%Y%m%d"), day_start.timestamp(), day_end.timestamp()
+
+    async def _ensure_partition(self, conn, ts: float) -> str:
+        """获取（必要时创建）时间戳所在的日分区表"""
+        day, start_ts, end_ts = self._day_bounds(ts)
+        table = f"{PARTITION_PREFIX}{day}"
+        if table in self._partitions:
+            return table
+
+        await conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                device_id VARCHAR(50) NOT NULL,
+                ts REAL NOT NULL,
+                timestamp TIMESTAMP NOT NULL,
+                data_type VARCHAR(50),
+                value REAL NOT NULL,
+                unit VARCHAR(20),
+                raw_data TEXT,
+                quality_flag INTEGER DEFAULT 1
+            )
+        ''')
+        await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_device_ts ON {table}(device_id, ts)")
+        await conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table}(ts)")
+        await conn.execute(
+            f"INSERT OR IGNORE INTO {PARTITION_REGISTRY} (table_name, partition_day, start_ts, end_ts) "
+            f"VALUES (?, ?, ?, ?)",
+            (table, day, start_ts, end_ts)
+        )
+        self._partitions[table] = (start_ts, end_ts)
+        logger.info(f"创建传感器数据分区: {table}")
+        return table
+
+    def _partitions_in_range(self, start_ts: Optional[float], end_ts: Optional[float],
+                             newest_first: bool = False) -> List[str]:
+        """与时间范围有交集的分区表"""
+        tables = [
+            (bounds[0], table) for table, bounds in self._partitions.items()
+            if (start_ts is None or bounds[1] > start_ts) and (end_ts is None or bounds[0] <= end_ts)
+        ]
+        tables.sort(reverse=newest_first)
+        return [table for _, table in tables]
+
+    # ============= 写入 =============
+
+    async def insert(self, conn, rows: Iterable[Dict[str, Any]]) -> int:
+        """
+        批量写入原始数据并更新汇总表
+
+        Args:
+            rows: 字典列表，键: device_id, value, data_type, unit, raw_data, ts(可选，默认当前时间)
+
+        Returns:
+            int: 最后一条记录的rowid
+        """
+        await self.ensure_schema(conn)
+        # 其他实例可能已删除缓存中的分区，写入前同步，否则会写入不存在的表
+        await self._sync_partitions(conn)
+
+        by_table: Dict[str, List[Tuple]] = {}
+        buckets: Dict[str, Dict[Tuple[str, float], List[float]]] = {level: {} for level in ROLLUP_LEVELS}
+
+        for row in rows:
+            ts = to_epoch(row.get("ts")) or time.time()
+            value = float(row["value"])
+            device_id = row["device_id"]
+            table = await self._ensure_partition(conn, ts)
+            by_table.setdefault(table, []).append((
+                device_id, ts, datetime.fromtimestamp(ts).isoformat(),
+                row.get("data_type"), value, row.get("unit"), row.get("raw_data"),
+                row.get("quality_flag", 1)
+            ))
+
+            # 预聚合到各级汇总桶：[min, max, sum, count]
+            for level, width in ROLLUP_LEVELS.items():
+                key = (device_id, ts - ts % width)
+                bucket = buckets[level].get(key)
+                if bucket is None:
+                    buckets[level][key] = [value, value, value, 1]
+                else:
+                    bucket[0] = min(bucket[0], value)
+                    bucket[1] = max(bucket[1], value)
+                    bucket[2] += value
+                    bucket[3] += 1
+
+        last_rowid = 0
+        for table, values in by_table.items():
+            await conn.executemany(f'''
+                INSERT INTO {table} (device_id, ts, timestamp, data_type, value, unit, raw_data, quality_flag)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', values)
+            async with conn.execute("SELECT last_insert_rowid()") as cursor:
+                last_rowid = (await cursor.fetchone())[0]
+
+        for level, level_buckets in buckets.items():
+            if not level_buckets:
+                continue
+            await conn.executemany(f'''
+                INSERT INTO {rollup_table(level)} (device_id, bucket_ts, min_value, max_value, sum_value, count)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(device_id, bucket_ts) DO UPDATE SET
+                    min_value = MIN(min_value, excluded.min_value),
+                    max_value = MAX(max_value, excluded.max_value),
+                    sum_value = sum_value + excluded.sum_value,
+                    count = count + excluded.count
+            ''', [(key[0], key[1], *bucket) for key, bucket in level_buckets.items()])
+
+        return last_rowid
+
+    # ============= 查询 =============
+
+    async def query_raw(self, conn, device_id: Optional[str] = None, limit: int = 100,
+                        start_time: TimeLike = None, end_time: TimeLike = None) -> List[Dict]:
+        """
+        按时间倒序查询原始数据
+
+        从最新分区开始逐个扫描（分区内走 device_id, ts 索引），满足limit后停止。
+        """
+        await self.ensure_schema(conn)
+        await self._sync_partitions(conn)
+        start_ts, end_ts = to_epoch(start_time), to_epoch(end_time)
+
+        conditions, params = [], []
+        if device_id:
+            conditions.append("device_id = ?")
+            params.append(device_id)
+        if start_ts is not None:
+            conditions.append("ts >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            conditions.append("ts <= ?")
+            params.append(end_ts)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        results: List[Dict] = []
+        for table in self._partitions_in_range(start_ts, end_ts, newest_first=True):
+            remaining = limit - len(results)
+            if remaining <= 0:
+                break
+            async with conn.execute(
+                f"SELECT * FROM {table} {where} ORDER BY ts DESC LIMIT ?", (*params, remaining)
+            ) as cursor:
+                results.extend(dict(row) for row in await cursor.fetchall())
+        return results
+
+    async def _estimate_count(self, conn, device_id: str, start_ts: float, end_ts: float) -> int:
+        """用最粗汇总表估算范围内的原始点数"""
+        level, width = next(reversed(ROLLUP_LEVELS.items()))
+        async with conn.execute(
+            f"SELECT COALESCE(SUM(count), 0) FROM {rollup_table(level)} "
+            f"WHERE device_id = ? AND bucket_ts >= ? AND bucket_ts <= ?",
+            (device_id, start_ts - start_ts % width, end_ts)
+        ) as cursor:
+            return (await cursor.fetchone())[0]
+
+    def choose_resolution(self, span_seconds: float, raw_count: int, max_points: int) -> str:
+        """选择满足点数预算的最细分辨率（预算内无法满足时返回最粗级别）"""
+        if raw_count <= max_points:
+            return "raw"
+        for level, width in ROLLUP_LEVELS.items():
+            if span_seconds / width <= max_points:
+                return level
+        return next(reversed(ROLLUP_LEVELS))
+
+    async def query_series(self, conn, device_id: str, start_time: TimeLike = None,
+                           end_time: TimeLike = None, max_points: int = 1000) -> Dict[str, Any]:
+        """
+        按点数预算查询时间序列（按时间正序）
+
+        Returns:
+            {"resolution": "raw"|"10s"|"1m"|"10m", "points": [...]}
+            原始点: {"timestamp", "ts", "value"}；汇总点: {"timestamp", "ts", "min", "max", "avg", "count"}
+        """
+        await self.ensure_schema(conn)
+        await self._sync_partitions(conn)
+        end_ts = to_epoch(end_time) or time.time()
+        start_ts = to_epoch(start_time)
+        if start_ts is None:
+            start_ts = min((bounds[0] for bounds in self._partitions.values()), default=end_ts)
+
+        raw_count = await self._estimate_count(conn, device_id, start_ts, end_ts)
+        resolution = self.choose_resolution(end_ts - start_ts, raw_count, max_points)
+
+        points: List[Dict[str, Any]] = []
+        if resolution == "raw":
+            for table in self._partitions_in_range(start_ts, end_ts):
+                async with conn.execute(
+                    f"SELECT ts, timestamp, value FROM {table} "
+                    f"WHERE device_id = ? AND ts >= ? AND ts <= ? ORDER BY ts ASC",
+                    (device_id, start_ts, end_ts)
+                ) as cursor:
+                    for row in await cursor.fetchall():
+                        points.append({"ts": row[0], "timestamp": row[1], "value": row[2]})
+        else:
+            width = ROLLUP_LEVELS[resolution]
+            async with conn.execute(
+                f"SELECT bucket_ts, min_value, max_value, sum_value, count FROM {rollup_table(resolution)} "
+                f"WHERE device_id = ? AND bucket_ts >= ? AND bucket_ts <= ? ORDER BY bucket_ts ASC",
+                (device_id, start_ts - start_ts % width, end_ts)
+            ) as cursor:
+                for row in await cursor.fetchall():
+                    points.append({
+                        "ts": row[0],
+                        "timestamp": datetime.fromtimestamp(row[0]).isoformat(),
+                        "min": row[1],
+                        "max": row[2],
+                        "avg": row[3] / row[4] if row[4] else None,
+                        "count": row[4],
+                    })
+
+        return {
+            "device_id": device_id,
+            "resolution": resolution,
+            "start_ts": start_ts,
+            "end_ts": end_ts,
+            "estimated_raw_points": raw_count,
+            "points": points,
+        }
+
+    def level_for_bucket(self, bucket_seconds: float) -> Optional[str]:
+        """不超过目标桶宽的最粗汇总级别（无则返回None，表示需读原始数据）"""
+        chosen = None
+        for level, width in ROLLUP_LEVELS.items():
+            if width <= bucket_seconds:
+                chosen = level
+        return chosen
+
+    async def read_page(self, conn, device_id: str, start_ts: float, end_ts: float,
+                        level: Optional[str] = None, after: Optional[Tuple] = None,
+                        limit: int = 1000) -> Tuple[List[Tuple], Optional[Tuple]]:
+        """
+        按时间正序分页读取范围数据（键集分页）
+
+        每页只在一次查询内使用连接，调用方可以每页重新借用连接，流式输出期间不占用连接。
+
+        Args:
+            level: None读原始分区，否则读对应汇总表
+            after: 上一页返回的续读位置，None表示从start_ts开始
+            limit: 每页最多行数
+
+        Returns:
+            (rows, after): rows为 (ts, min_value, max_value, count) 列表，原始点的 min=max=value, count=1；
+            after为下一页的续读位置，None表示已读完
+        """
+        await self.ensure_schema(conn)
+        await self._sync_partitions(conn)
+
+        if level is None:
+            # 续读位置为 (ts, id)：同一时刻的多条记录按id区分，翻页时不重复不遗漏
+            last_ts, last_id = after if after is not None else (start_ts, None)
+            rows: List[Tuple] = []
+            for table in self._partitions_in_range(last_ts, end_ts):
+                async with conn.execute(
+                    f"SELECT ts, value, value, 1, id FROM {table} "
+                    f"WHERE device_id = ? AND ts >= ? AND ts <= ? AND (? IS NULL OR ts > ? OR id > ?) "
+                    f"ORDER BY ts ASC, id ASC LIMIT ?",
+                    (device_id, last_ts, end_ts, last_id, last_ts, last_id, limit - len(rows))
+                ) as cursor:
+                    rows.extend(await cursor.fetchall())
+                if len(rows) >= limit:
+                    break
+            next_after = (rows[-1][0], rows[-1][4]) if len(rows) >= limit else None
+            return [tuple(row[:4]) for row in rows], next_after
+
+        # 汇总表以 (device_id, bucket_ts) 为主键，续读位置为上一页最后一个桶
+        width = ROLLUP_LEVELS[level]
+        if after is None:
+            condition, lower = "bucket_ts >= ?", start_ts - start_ts % width
+        else:
+            condition, lower = "bucket_ts > ?", after[0]
+        async with conn.execute(
+            f"SELECT bucket_ts, min_value, max_value, count FROM {rollup_table(level)} "
+            f"WHERE device_id = ? AND {condition} AND bucket_ts <= ? ORDER BY bucket_ts ASC LIMIT ?",
+            (device_id, lower, end_ts, limit)
+        ) as cursor:
+            rows = [tuple(row) for row in await cursor.fetchall()]
+        next_after = (rows[-1][0],) if len(rows) >= limit else None
+        return rows, next_after
+
+    # ============= 旧版数据迁移 =============
+
+    async def migrate_legacy_batch(self, conn, batch_size: int = 5000) -> int:
+        """
+        把旧版单表 sensor_data 中尚未迁移的一批记录写入分区和汇总表
+
+        按 id 递增迁移并记录进度，可多次调用、中断后续传；旧表保持不变。
+        旧表结构没有 device_id 列时以 data_type 作为设备ID。
+
+        Returns:
+            int: 本批迁移的记录数，0 表示已全部迁移
+        """
+        await self.ensure_schema(conn)
+
+        async with conn.execute(f"PRAGMA table_info({LEGACY_TABLE})") as cursor:
+            columns = {row[1] for row in await cursor.fetchall()}
+        if not columns:
+            return 0
+
+        async with conn.execute(
+            f"SELECT last_id FROM {LEGACY_MIGRATION} WHERE table_name = ?", (LEGACY_TABLE,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        last_id = row[0] if row else 0
+
+        device_column = "COALESCE(device_id, data_type, 'legacy')" if "device_id" in columns \
+            else "COALESCE(data_type, 'legacy')"
+        raw_column = "raw_data" if "raw_data" in columns else "NULL"
+        async with conn.execute(
+            f"SELECT id, {device_column}, timestamp, data_type, value, unit, {raw_column}, quality_flag "
+            f"FROM {LEGACY_TABLE} WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, batch_size)
+        ) as cursor:
+            legacy_rows = await cursor.fetchall()
+        if not legacy_rows:
+            return 0
+
+        records = []
+        for legacy_id, device_id, timestamp, data_type, value, unit, raw_data, quality_flag in legacy_rows:
+            ts = legacy_epoch(timestamp)
+            if ts is None or value is None:
+                continue
+            records.append({
+                "device_id": device_id, "ts": ts, "value": value, "data_type": data_type,
+                "unit": unit, "raw_data": raw_data,
+                "quality_flag": 1 if quality_flag is None else quality_flag,
+            })
+        if records:
+            await self.insert(conn, records)
+
+        await conn.execute(f'''
+            INSERT INTO {LEGACY_MIGRATION} (table_name, last_id, migrated_rows, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(table_name) DO UPDATE SET
+                last_id = excluded.last_id,
+                migrated_rows = migrated_rows + excluded.migrated_rows,
+                updated_at = excluded.updated_at
+        ''', (LEGACY_TABLE, legacy_rows[-1][0], len(records)))
+        return len(legacy_rows)
+
+    # ============= 维护 =============
+
+    async def drop_partitions_before(self, conn, before: TimeLike) -> List[str]:
+        """删除结束时间早于指定时间的原始数据分区（汇总表保留）"""
+        await self.ensure_schema(conn)
+        await self._sync_partitions(conn)
+        before_ts = to_epoch(before)
+        dropped = [table for table, bounds in self._partitions.items() if bounds[1] <= before_ts]
+        for table in dropped:
+            await conn.execute(f"DROP TABLE IF EXISTS {table}")
+            await conn.execute(f"DELETE FROM {PARTITION_REGISTRY} WHERE table_name = ?", (table,))
+            self._partitions.pop(table, None)
+            logger.info(f"删除传感器数据分区: {table}")
+        return dropped
+
+    def get_partition_stats(self) -> Dict[str, Any]:
+        """分区统计信息"""
+        tables = sorted(self._partitions)
+        return {
+            "partition_count": len(tables),
+            "oldest_partition": tables[0] if tables else None,
+            "newest_partition": tables[-1] if tables else None,
+            "rollup_levels": list(ROLLUP_LEVELS),
+        }
+
+
+__all__ = ['SensorPartitionStore', 'ROLLUP_LEVELS', 'to_epoch', 'legacy_epoch', 'rollup_table']
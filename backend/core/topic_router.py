@@ -0,0 +1,186 @@
+"""
+MQTT主题路由
+MQTT Topic Router
+
+按主题层级构建前缀树，支持 `+`（单层）和 `#`（多层）通配符，同一个订阅过滤器可注册多个处理器。
+匹配一条消息只沿主题层级向下查找，复杂度为 O(主题层数)（每层最多额外检查 `+`/`#` 两个分支）。
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+
+class _TopicNode:
+    __slots__ = ("children", "handlers", "is_filter")
+
+    def __init__(self):
+        self.children: Dict[str, "_TopicNode"] = {}
+        self.handlers: List[Callable] = []
+        self.is_filter = False  # 该节点是否对应一个已注册的订阅过滤器
+
+
+def validate_topic_filter(topic_filter: str):
+    """校验订阅过滤器：`+`/`#` 必须独占一层，`#` 只能在最后一层"""
+    if not topic_filter:
+        raise ValueError("主题过滤器不能为空")
+    levels = topic_filter.split("/")
+    for index, level in enumerate(levels):
+        if "#" in level and (level != "#" or index != len(levels) - 1):
+            raise ValueError(f"无效的主题过滤器，'#' 必须单独位于最后一层: {topic_filter}")
+        if "+" in level and level != "+":
+            raise ValueError(f"无效的主题过滤器，'+' 必须单独占一层: {topic_filter}")
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """判断单个主题是否匹配订阅过滤器（规则与 TopicRouter.match 相同）"""
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    if topic.startswith("$") and filter_levels[0] in ("+", "#"):
+        return False
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class TopicRouter:
+    """
+    主题前缀树路由
+
+    - add(filter, handler): 注册处理器（handler为None时只登记过滤器）
+    - remove(filter, handler=None): 移除一个处理器或该过滤器的全部处理器
+    - match(topic): 返回所有匹配过滤器的处理器（按注册顺序，不重复）
+    """
+
+    def __init__(self):
+        self._root = _TopicNode()
+        self._lock = threading.RLock()
+        self._filters: Dict[str, _TopicNode] = {}
+
+    def add(self, topic_filter: str, handler: Optional[Callable] = None) -> bool:
+        """
+        注册订阅过滤器和处理器
+
+        Returns:
+            bool: 该过滤器是否为新登记（True表示需要向broker发起订阅）
+        """
+        validate_topic_filter(topic_filter)
+        with self._lock:
+            node = self._filters.get(topic_filter)
+            is_new = node is None
+            if is_new:
+                node = self._root
+                for level in topic_filter.split("/"):
+                    node = node.children.setdefault(level, _TopicNode())
+                node.is_filter = True
+                self._filters[topic_filter] = node
+            if handler is not None and handler not in node.handlers:
+                node.handlers.append(handler)
+            return is_new
+
+    def remove(self, topic_filter: str, handler: Optional[Callable] = None) -> bool:
+        """
+        移除处理器
+
+        Returns:
+            bool: 该过滤器是否已被完全移除（True表示可以向broker取消订阅）
+        """
+        with self._lock:
+            node = self._filters.get(topic_filter)
+            if node is None:
+                return False
+
+            if handler is not None:
+                if handler in node.handlers:
+                    node.handlers.remove(handler)
+                if node.handlers:
+                    return False
+
+            node.handlers = []
+            node.is_filter = False
+            del self._filters[topic_filter]
+            self._prune(topic_filter.split("/"))
+            return True
+
+    def _prune(self, levels: List[str]):
+        """删除不再使用的空节点"""
+        path = [self._root]
+        for level in levels:
+            child = path[-1].children.get(level)
+            if child is None:
+                return
+            path.append(child)
+        for depth in range(len(levels), 0, -1):
+            node = path[depth]
+            if node.children or node.is_filter:
+                break
+            del path[depth - 1].children[levels[depth - 1]]
+
+    def match(self, topic: str) -> List[Callable]:
+        """查找匹配主题的全部处理器"""
+        levels = topic.split("/")
+        # 以 $ 开头的系统主题不匹配首层通配符
+        system_topic = topic.startswith("$")
+        matched: List[Callable] = []
+
+        with self._lock:
+            frontier = [self._root]
+            for depth, level in enumerate(levels):
+                next_frontier = []
+                for node in frontier:
+                    wildcard_allowed = not (system_topic and depth == 0)
+                    if wildcard_allowed:
+                        multi = node.children.get("#")
+                        if multi is not None:
+                            matched.extend(multi.handlers)
+                    child = node.children.get(level)
+                    if child is not None:
+                        next_frontier.append(child)
+                    if wildcard_allowed:
+                        single = node.children.get("+")
+                        if single is not None:
+                            next_frontier.append(single)
+                frontier = next_frontier
+                if not frontier:
+                    break
+
+            for node in frontier:
+                matched.extend(node.handlers)
+                # "a/#" 同时匹配 "a"
+                multi = node.children.get("#")
+                if multi is not None:
+                    matched.extend(multi.handlers)
+
+        # 同一处理器注册在多个过滤器上时只调用一次
+        unique: List[Callable] = []
+        seen = set()
+        for handler in matched:
+            if id(handler) not in seen:
+                seen.add(id(handler))
+                unique.append(handler)
+        return unique
+
+    def has_filter(self, topic_filter: str) -> bool:
+        with self._lock:
+            return topic_filter in self._filters
+
+    def filters(self) -> List[str]:
+        """已登记的订阅过滤器"""
+        with self._lock:
+            return list(self._filters)
+
+    def handler_counts(self) -> Dict[str, int]:
+        """每个过滤器的处理器数量"""
+        with self._lock:
+            return {topic_filter: len(node.handlers) for topic_filter, node in self._filters.items()}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._filters)
+
+
+__all__ = ['TopicRouter', 'validate_topic_filter', 'topic_matches']
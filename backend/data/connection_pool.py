@@ -0,0 +1,230 @@
+"""
+SQLite连接池
+SQLite Connection Pool
+
+为同一个数据库文件维护一组长连接，连接在创建时一次性配置 WAL、
+synchronous=NORMAL、mmap_size、cache_size 等参数，之后在各次查询间复用，
+避免每次操作都重复建立连接、加载schema和fsync。
+"""
+
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Any, Optional, Union
+
+logger = logging.getLogger("ConnectionPool")
+
+
+@dataclass
+class PoolConfig:
+    """连接池配置"""
+    max_connections: int = 5          # 最大连接数
+    acquire_timeout: float = 10.0     # 获取连接超时（秒）
+    busy_timeout_ms: int = 5000       # SQLite忙等待超时（毫秒）
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024   # 256MB
+    cache_size_kb: int = 16 * 1024       # 16MB页缓存
+
+
+class SQLiteConnectionPool:
+    """
+    SQLite连接池
+
+    有界队列保存空闲连接，按需创建直到 max_connections；连接创建时统一配置PRAGMA。
+    """
+
+    def __init__(self, db_path: Union[str, Path], config: Optional[PoolConfig] = None):
+        self.db_path = Path(db_path)
+        self.config = config or PoolConfig()
+
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue(maxsize=self.config.max_connections)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+        # 统计信息
+        self._stats = {
+            "acquired": 0,
+            "released": 0,
+            "discarded": 0,
+            "waits": 0,
+            "wait_time_ms": 0.0,
+            "timeouts": 0,
+        }
+
+    def _create_connection(self) -> sqlite3.Connection:
+        """创建并配置一个新连接"""
+        connection = sqlite3.connect(
+            str(self.db_path),
+            check_same_thread=False,
+            timeout=self.config.busy_timeout_ms / 1000
+        )
+        connection.row_factory = sqlite3.Row  # 启用字典式访问
+        connection.execute(f"PRAGMA journal_mode = {self.config.journal_mode}")
+        connection.execute(f"PRAGMA synchronous = {self.config.synchronous}")
+        connection.execute(f"PRAGMA mmap_size = {self.config.mmap_size}")
+        connection.execute(f"PRAGMA cache_size = -{self.config.cache_size_kb}")
+        connection.execute(f"PRAGMA busy_timeout = {self.config.busy_timeout_ms}")
+        logger.debug(f"创建数据库连接: {self.db_path}")
+        return connection
+
+    def acquire(self) -> sqlite3.Connection:
+        """获取连接：优先复用空闲连接，未达上限时新建，否则等待归还"""
+        if self._closed:
+            raise RuntimeError(f"连接池已关闭: {self.db_path}")
+
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = None
+            with self._lock:
+                if self._created < self.config.max_connections:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+
+            if create:
+                try:
+                    connection = self._create_connection()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                with self._lock:
+                    self._stats["waits"] += 1
+                try:
+                    connection = self._idle.get(timeout=self.config.acquire_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise TimeoutError(f"获取数据库连接超时: {self.db_path}")
+                finally:
+                    with self._lock:
+                        self._stats["wait_time_ms"] += (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            self._stats["acquired"] += 1
+        return connection
+
+    def release(self, connection: sqlite3.Connection, discard: bool = False):
+        """归还连接；discard为True或连接池已关闭时直接关闭该连接"""
+        if discard or self._closed:
+            self._close_connection(connection)
+            with self._lock:
+                self._stats["discarded" if discard else "released"] += 1
+            return
+
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            self._close_connection(connection)
+        with self._lock:
+            self._stats["released"] += 1
+
+    def _close_connection(self, connection: sqlite3.Connection):
+        try:
+            connection.close()
+        except Exception as e:
+            logger.warning(f"关闭数据库连接失败: {e}")
+        with self._lock:
+            self._created -= 1
+
+    @contextmanager
+    def connection(self):
+        """
+        借用一个连接的上下文管理器
+
+        正常退出时提交，异常时回滚；连接损坏（无法回滚）时丢弃而不放回池中。
+        """
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except Exception:
+            try:
+                connection.rollback()
+            except sqlite3.Error:
+                discard = True
+            raise
+        else:
+            connection.commit()
+        finally:
+            self.release(connection, discard=discard)
+
+    def close(self):
+        """关闭所有空闲连接，借出中的连接在归还时关闭"""
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_connection(connection)
+        logger.info(f"数据库连接池已关闭: {self.db_path}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["wait_time_ms"] = round(stats["wait_time_ms"], 3)
+            stats.update({
+                "database_path": str(self.db_path),
+                "max_connections": self.config.max_connections,
+                "open_connections": self._created,
+                "idle_connections": self._idle.qsize(),
+                "in_use_connections": self._created - self._idle.qsize(),
+                "closed": self._closed,
+            })
+        return stats
+
+
+# ============= 全局连接池注册表 =============
+
+_pools: Dict[str, SQLiteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: Union[str, Path],
+                        config: Optional[PoolConfig] = None) -> SQLiteConnectionPool:
+    """获取数据库文件对应的共享连接池（同一文件的所有ChromatographyDB实例共用）"""
+    key = str(Path(db_path).resolve())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = SQLiteConnectionPool(key, config)
+            _pools[key] = pool
+        return pool
+
+
+def get_all_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有连接池的统计信息"""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {path: pool.get_stats() for path, pool in pools}
+
+
+def close_all_pools():
+    """关闭所有连接池（应用关闭时调用）"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+__all__ = [
+    'PoolConfig',
+    'SQLiteConnectionPool',
+    'get_connection_pool',
+    'get_all_pool_stats',
+    'close_all_pools',
+]
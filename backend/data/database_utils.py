@@ -15,6 +15,11 @@ from typing import Optional, List, Dict, Any, Union, Tuple
 from datetime import datetime
 from pathlib import Path
 
+try:
+    from data.connection_pool import PoolConfig, get_connection_pool
+except ImportError:  # 以脚本方式在data目录下运行时
+    from connection_pool import PoolConfig, get_connection_pool
+
 logger = logging.getLogger("DatabaseUtils")
 
 
@@ -24,12 +29,13 @@ class ChromatographyDB:
     Universal Database Operations for Chromatography System
     """
 
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, pool_config: Optional[PoolConfig] = None):
         """
         初始化数据库连接
 
         Args:
             db_path: 数据库文件路径，如果为None则使用默认路径
+            pool_config: 连接池配置（仅在该数据库文件的连接池首次创建时生效）
         """
         if db_path is None:
             # 使用默认数据库路径
@@ -41,6 +47,9 @@ class ChromatographyDB:
         # 确保数据库目录存在
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
 
+        # 同一数据库文件的所有实例共享一个长连接池
+        self.pool = get_connection_pool(self.db_path, pool_config)
+
         # 数据库表名常量
         self.TABLES = {
             'device_config': 'device_config',
@@ -54,7 +63,8 @@ class ChromatographyDB:
             'column_info': 'column_info',
             'tube_operations': 'tube_operations',
             'smiles_management': 'smiles_management',
-            'methods': 'methods'
+            'methods': 'methods',
+            'elution_curve_chunks': 'elution_curve_chunks'
         }
 
         logger.info(f"数据库初始化: {self.db_path}")
@@ -62,25 +72,24 @@ class ChromatographyDB:
     @contextmanager
     def get_connection(self):
         """
-        获取数据库连接上下文管理器
+        获取数据库连接上下文管理器（从连接池借用长连接）
 
         Yields:
             sqlite3.Cursor: 数据库游标对象
         """
-        connection = sqlite3.connect(str(self.db_path), check_same_thread=False)
-        connection.row_factory = sqlite3.Row  # 启用字典式访问
-        cursor = connection.cursor()
-        try:
-            yield cursor
-        except Exception as e:
-            connection.rollback()
-            logger.error(f"数据库操作失败: {e}")
-            raise
-        else:
-            connection.commit()
-        finally:
-            cursor.close()
-            connection.close()
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                yield cursor
+            except Exception as e:
+                logger.error(f"数据库操作失败: {e}")
+                raise
+            finally:
+                cursor.close()
+
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """获取连接池统计信息"""
+        return self.pool.get_stats()
 
     # ============= 基础CRUD操作 =============
 
@@ -669,6 +678,7 @@ class ChromatographyDB:
         stats = {
             "database_path": str(self.db_path),
             "database_size_mb": round(self.db_path.stat().st_size / 1024 / 1024, 2),
+            "connection_pool": self.get_pool_stats(),
             "tables": {}
         }
 
@@ -685,8 +695,13 @@ class ChromatographyDB:
             backup_path = f"{self.db_path}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
 
         try:
-            import shutil
-            shutil.copy2(self.db_path, backup_path)
+            # WAL模式下直接复制文件可能遗漏未检查点的数据，使用SQLite在线备份API
+            with self.pool.connection() as connection:
+                target = sqlite3.connect(str(backup_path))
+                try:
+                    connection.backup(target)
+                finally:
+                    target.close()
             logger.info(f"数据库备份成功: {backup_path}")
             return True
         except Exception as e:
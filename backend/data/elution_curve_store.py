@@ -0,0 +1,246 @@
+"""
+洗脱曲线分块存储
+Append-only Chunked Elution Curve Store
+
+将检测器双通道信号按固定点数切分为二进制块，以 (history_id, chunk_index)
+为主键追加写入 elution_curve_chunks 表。每次备份只写入上次备份之后新增的点，
+读取时按块惰性拼装，备份成本与实验时长无关。
+"""
+
+import logging
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from data.database_utils import ChromatographyDB
+
+logger = logging.getLogger("ElutionCurveStore")
+
+# 每个数据点的通道数（A/B 双通道）
+CHANNELS = 2
+# 每块的数据点数，块大小 = CHUNK_POINTS * CHANNELS * 8 字节
+CHUNK_POINTS = 1024
+
+
+def _pack(values: array) -> bytes:
+    """将 array('d') 序列化为小端字节序的块数据"""
+    if sys.byteorder != "little":
+        values = array("d", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack(blob: bytes) -> array:
+    """将块数据反序列化为 array('d')"""
+    values = array("d")
+    values.frombytes(blob)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class ElutionCurveChunkStore:
+    """
+    洗脱曲线分块存储
+
+    每个 history_id 的信号被切分为固定大小的块（CHUNK_POINTS 个点），
+    只有最后一个未写满的块会在后续备份中被覆盖重写，其余块写入后不再变化。
+    """
+
+    TABLE = "elution_curve_chunks"
+
+    def __init__(self, db: Optional[ChromatographyDB] = None, chunk_points: int = CHUNK_POINTS):
+        """
+        初始化分块存储
+
+        Args:
+            db: 数据库实例，为None时使用默认数据库
+            chunk_points: 每块的数据点数
+        """
+        self.db = db or ChromatographyDB()
+        self.chunk_points = chunk_points
+
+        # 每个history_id已持久化的点数，以及尾块中尚未写满的数据
+        self._persisted_points: Dict[str, int] = {}
+        self._tail_chunks: Dict[str, array] = {}
+
+        self._ensure_table()
+
+    def _ensure_table(self):
+        """创建分块表（如不存在）"""
+        with self.db.get_connection() as cursor:
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                    history_id VARCHAR(100) NOT NULL,
+                    chunk_index INTEGER NOT NULL,
+                    point_offset INTEGER NOT NULL,
+                    point_count INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (history_id, chunk_index)
+                )
+            ''')
+
+    def _load_tail_state(self, history_id: str):
+        """从数据库恢复某个history_id的写入位置（进程重启后继续追加）"""
+        with self.db.get_connection() as cursor:
+            cursor.execute(
+                f"SELECT chunk_index, point_offset, point_count, data FROM {self.TABLE} "
+                f"WHERE history_id = ? ORDER BY chunk_index DESC LIMIT 1",
+                (history_id,)
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            self._persisted_points[history_id] = 0
+            self._tail_chunks[history_id] = array("d")
+            return
+
+        persisted = row["point_offset"] + row["point_count"]
+        self._persisted_points[history_id] = persisted
+        if row["point_count"] < self.chunk_points:
+            self._tail_chunks[history_id] = _unpack(row["data"])
+        else:
+            self._tail_chunks[history_id] = array("d")
+
+    def persisted_points(self, history_id: str) -> int:
+        """获取已持久化的数据点数"""
+        if history_id not in self._persisted_points:
+            self._load_tail_state(history_id)
+        return self._persisted_points[history_id]
+
+    def append(self, history_id: str, points: Sequence[Sequence[float]]) -> int:
+        """
+        追加新数据点
+
+        Args:
+            history_id: 实验历史ID
+            points: 新增数据点，格式 [[signal_a, signal_b], ...]
+
+        Returns:
+            int: 写入后已持久化的总点数
+        """
+        values = array("d")
+        for point in points:
+            values.append(float(point[0]))
+            values.append(float(point[1]))
+        return self.append_values(history_id, values)
+
+    def append_values(self, history_id: str, values, cursor=None) -> int:
+        """
+        追加交错存储的新数据
+
+        只写入本次新增的点：先补满尾块，再写入完整新块，最后写入新的尾块。
+        写入量只与新增点数成正比。
+
+        Args:
+            history_id: 实验历史ID
+            values: 支持缓冲区协议的 float64 数据 [a0, b0, a1, b1, ...]，
+                    如 DetectorSignalBuffer.view() 返回的零拷贝视图
+            cursor: 调用方事务中的游标，数据块与调用方的其他写入一起提交；
+                    事务回滚时调用方需调用 release() 丢弃内存中的写入位置
+
+        Returns:
+            int: 写入后已持久化的总点数
+        """
+        persisted = self.persisted_points(history_id)
+
+        tail = array("d", self._tail_chunks[history_id])
+        tail.frombytes(memoryview(values).cast("B"))
+        new_points = len(tail) // CHANNELS - (persisted % self.chunk_points)
+        if new_points <= 0:
+            return persisted
+
+        chunk_values = self.chunk_points * CHANNELS
+        rows: List[Tuple] = []
+        now = datetime.now().isoformat()
+
+        chunk_index = persisted // self.chunk_points
+        for begin in range(0, len(tail), chunk_values):
+            chunk = tail[begin:begin + chunk_values]
+            rows.append((history_id, chunk_index, chunk_index * self.chunk_points,
+                         len(chunk) // CHANNELS, _pack(chunk), now))
+            chunk_index += 1
+
+        sql = (f"INSERT OR REPLACE INTO {self.TABLE} "
+               f"(history_id, chunk_index, point_offset, point_count, data, updated_at) "
+               f"VALUES (?, ?, ?, ?, ?, ?)")
+        if cursor is not None:
+            cursor.executemany(sql, rows)
+        else:
+            with self.db.get_connection() as cursor:
+                cursor.executemany(sql, rows)
+
+        remainder = len(tail) % chunk_values
+        self._tail_chunks[history_id] = tail[len(tail) - remainder:] if remainder else array("d")
+        self._persisted_points[history_id] = persisted + new_points
+        logger.debug(f"追加洗脱曲线数据: {history_id}, 新增 {new_points} 点, 写入 {len(rows)} 块")
+        return self._persisted_points[history_id]
+
+    def iter_chunks(self, history_id: str, start: int = 0,
+                    end: Optional[int] = None) -> Iterator[Tuple[int, array]]:
+        """
+        按块惰性读取数据
+
+        Args:
+            history_id: 实验历史ID
+            start: 起始点下标（含）
+            end: 结束点下标（不含），为None时读到末尾
+
+        Yields:
+            (point_offset, array('d')): 块起始点下标和交错存储的 [a0, b0, a1, b1, ...] 数据
+        """
+        sql = (f"SELECT chunk_index, point_offset, data FROM {self.TABLE} "
+               f"WHERE history_id = ? AND point_offset + point_count > ?")
+        params: List = [history_id, start]
+        if end is not None:
+            sql += " AND point_offset < ?"
+            params.append(end)
+        sql += " AND chunk_index > ? ORDER BY chunk_index ASC LIMIT 1"
+
+        # 每块单独借用一次连接，调用方处理数据（如流式响应）期间不占用连接池
+        last_index = -1
+        while True:
+            with self.db.get_connection() as cursor:
+                cursor.execute(sql, (*params, last_index))
+                row = cursor.fetchone()
+            if row is None:
+                break
+            last_index = row["chunk_index"]
+            yield row["point_offset"], _unpack(row["data"])
+
+    def iter_points(self, history_id: str, start: int = 0,
+                    end: Optional[int] = None) -> Iterator[List[float]]:
+        """
+        逐点惰性读取数据
+
+        Yields:
+            [signal_a, signal_b]
+        """
+        for offset, values in self.iter_chunks(history_id, start, end):
+            first = max(start - offset, 0)
+            last = len(values) // CHANNELS
+            if end is not None:
+                last = min(last, end - offset)
+            for i in range(first, last):
+                yield [values[i * CHANNELS], values[i * CHANNELS + 1]]
+
+    def load_points(self, history_id: str, start: int = 0,
+                    end: Optional[int] = None) -> List[List[float]]:
+        """读取指定范围的数据点，格式 [[signal_a, signal_b], ...]"""
+        return list(self.iter_points(history_id, start, end))
+
+    def delete(self, history_id: str) -> int:
+        """删除某个history_id的全部数据块"""
+        self._persisted_points.pop(history_id, None)
+        self._tail_chunks.pop(history_id, None)
+        return self.db.delete_data(self.TABLE, "history_id = ?", (history_id,))
+
+    def release(self, history_id: str):
+        """释放某个history_id的内存写入状态（数据保留在数据库中）"""
+        self._persisted_points.pop(history_id, None)
+        self._tail_chunks.pop(history_id, None)
+
+
+__all__ = ['ElutionCurveChunkStore', 'CHUNK_POINTS', 'CHANNELS']
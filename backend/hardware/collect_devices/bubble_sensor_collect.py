@@ -5,8 +5,8 @@
 
 from typing import Dict, Any, List, Optional
 import asyncio
-import requests
 from ..hardware_config import MockDataGenerator, is_mock_mode
+from ..drivers.http_driver import get_http_client
 
 
 class BubbleSensorCollect:
@@ -16,6 +16,8 @@ class BubbleSensorCollect:
         self.device_id = 'bubble_sensor_collect'
         self.base_url = base_url
         self.mock = mock if mock is not None else is_mock_mode(self.device_id)
+        # 周期性轮询：失败时只重试一次，由下一次轮询补上
+        self.http = get_http_client(self.device_id, base_url, timeout=5, retry_count=1)
         self.sensors = {
             '气5': {'location': '收集管路1', 'status': False, 'bubble_detected': False},
             '气6': {'location': '收集管路2', 'status': False, 'bubble_detected': False},
@@ -28,11 +30,10 @@ class BubbleSensorCollect:
             '气7': 0b11110001   # 241
         }
 
-    def _get_bubble_status_from_hardware(self) -> int:
+    async def _get_bubble_status_from_hardware(self) -> int:
         """从硬件获取气泡状态数据"""
         try:
-            url = f"{self.base_url}/device/data"
-            response = requests.get(url, timeout=5)
+            response = await self.http.get("/device/data", idempotent=True)
             if response.status_code == 200:
                 return response.json().get('data', -1)
             return -1
@@ -71,7 +72,7 @@ class BubbleSensorCollect:
                 return {}
 
             # 从硬件获取数据
-            raw_data = self._get_bubble_status_from_hardware()
+            raw_data = await self._get_bubble_status_from_hardware()
             bubble_detected = self._parse_sensor_data(raw_data, sensor_id)
 
             sensor = self.sensors[sensor_id].copy()
@@ -91,7 +92,7 @@ class BubbleSensorCollect:
             return all_status
         else:
             # 从硬件获取一次数据，然后解析所有传感器状态
-            raw_data = self._get_bubble_status_from_hardware()
+            raw_data = await self._get_bubble_status_from_hardware()
             all_status = {}
 
             for sensor_id in self.sensors:
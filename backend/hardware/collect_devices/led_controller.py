@@ -5,9 +5,8 @@ LED灯控制器
 
 from typing import Dict, Any, Optional, List, Union
 import asyncio
-import requests
-import json
 from ..hardware_config import MockDataGenerator, is_mock_mode
+from ..drivers.http_driver import get_http_client
 
 
 class LEDController:
@@ -17,6 +16,7 @@ class LEDController:
         self.device_id = 'led_controller'
         self.base_url = base_url
         self.mock = mock if mock is not None else is_mock_mode(self.device_id)
+        self.http = get_http_client(self.device_id, base_url, timeout=5)
         self.led_status = False
         self.brightness = 100  # 0-100
 
@@ -151,9 +151,6 @@ class LEDController:
             return True
         else:
             try:
-                url = f"{self.base_url}/led/batch"
-                headers = {'Content-Type': 'application/json'}
-
                 # 标准化颜色格式
                 normalized_config = {}
                 for group_name, leds in led_config.items():
@@ -166,12 +163,8 @@ class LEDController:
                         normalized_config[group_name].append(normalized_led)
 
                 # 发送POST请求
-                response = await asyncio.to_thread(
-                    requests.post,
-                    url,
-                    data=json.dumps(normalized_config),
-                    headers=headers
-                )
+                # 批量设置为绝对状态，重发没有副作用
+                response = await self.http.post("/led/batch", normalized_config, idempotent=True)
 
                 if response.status_code == 200:
                     # 更新状态缓存
@@ -5,8 +5,9 @@
 
 from typing import Dict, Any, List, Optional
 import asyncio
-import requests
 from ..hardware_config import MockDataGenerator, is_mock_mode
+from ..drivers.http_driver import get_http_client
+from .valve_batch import ValveAction, BatchReport, run_valve_batch
 
 
 class MultiValveController:
@@ -16,6 +17,7 @@ class MultiValveController:
         self.device_id = 'multi_valve_controller'
         self.base_url = base_url
         self.mock = mock if mock is not None else is_mock_mode(self.device_id)
+        self.http = get_http_client(self.device_id, base_url, timeout=5)
 
         # 阀站配置映射：多向阀ID -> 阀站号
         self.valve_station_mapping = {
@@ -42,7 +44,7 @@ class MultiValveController:
                 'station_num': self.valve_station_mapping[f'多{i}']
             }
 
-    def _switch_valve_hardware(self, station_num: int, valve_position: str) -> bool:
+    async def _switch_valve_hardware(self, station_num: int, valve_position: str) -> bool:
         """
         调用硬件接口切换阀门位置
         :param station_num: 阀站号
@@ -50,9 +52,8 @@ class MultiValveController:
         :return: 切换结果
         """
         try:
-            url = f"{self.base_url}/valve/switch"
             params = {'num': station_num, 'valve_num': valve_position}
-            response = requests.get(url, params=params, timeout=5)
+            response = await self.http.get("/valve/switch", params=params)
             return response.status_code == 200
         except Exception as e:
             print(f"硬件调用失败: {e}")
@@ -93,7 +94,7 @@ class MultiValveController:
             valve_position = self._position_to_valve_num(position)
 
             self.valves[valve_id]['status'] = 'moving'
-            success = self._switch_valve_hardware(station_num, valve_position)
+            success = await self._switch_valve_hardware(station_num, valve_position)
 
             if success:
                 self.valves[valve_id]['current_position'] = position
@@ -118,34 +119,46 @@ class MultiValveController:
             return self.valves[valve_id]['current_position']
         return 0
     
-    async def batch_set_positions(self, positions: Dict[str, int]) -> bool:
+    def _position_action(self, valve_id: str, position: int,
+                         after: Optional[List[str]] = None) -> ValveAction:
+        """构造单个阀门的切换动作；同一阀站上的动作串行"""
+        return ValveAction(
+            valve_id=valve_id,
+            run=lambda: self.set_position(valve_id, position),
+            description=f"position_{position}",
+            after=after or (),
+            channel=self.valve_station_mapping.get(valve_id),
+        )
+
+    async def batch_set_positions(self, positions: Dict[str, int],
+                                  order: Optional[Dict[str, List[str]]] = None) -> BatchReport:
         """
-        批量设置位置
+        批量设置位置，互不依赖的阀门同时切换
         :param positions: {valve_id: position, ...}
-        :return: 设置结果
+        :param order: 先后约束 {valve_id: [必须先完成的valve_id, ...]}，未声明的阀门并发执行
+        :return: BatchReport，布尔值为全部成功，to_dict() 给出每个阀门的结果和耗时
         """
-        results = []
-        for valve_id, position in positions.items():
-            result = await self.set_position(valve_id, position)
-            results.append(result)
-        return all(results)
-    
-    async def reset_all_valves(self) -> bool:
+        order = order or {}
+        actions = [self._position_action(valve_id, position, order.get(valve_id))
+                   for valve_id, position in positions.items()]
+        return await run_valve_batch(actions, self.http.session.max_connections)
+
+    async def reset_all_valves(self) -> BatchReport:
         """重置所有阀门到初始位置"""
         if self.mock:
             for valve_id in self.valves:
                 self.valves[valve_id]['current_position'] = 1
                 self.valves[valve_id]['status'] = 'idle'
             await asyncio.sleep(0.5)
-            return True
+            return BatchReport(results=[
+                {'valve_id': valve_id, 'action': 'position_1', 'success': True}
+                for valve_id in self.valves
+            ], elapsed_ms=500.0)
         else:
-            # 实际硬件模式：将所有阀门重置到位置1(A)
-            results = []
-            for valve_id in self.valves:
-                result = await self.set_position(valve_id, 1)
-                results.append(result)
-            return all(results)
-    
+            # 实际硬件模式：将所有阀门并发重置到位置1(A)
+            return await run_valve_batch([self._position_action(valve_id, 1) for valve_id in self.valves],
+                                         self.http.session.max_connections)
+
     async def get_all_status(self) -> Dict[str, Dict[str, Any]]:
         """获取所有阀门状态"""
         return {
@@ -191,9 +204,8 @@ class MultiValveController:
         else:
             # 测试连接：尝试获取一个简单的阀门状态
             try:
-                url = f"{self.base_url}/valve/switch"
                 params = {'num': 1, 'valve_num': 'A'}  # 测试请求
-                response = requests.get(url, params=params, timeout=3)
+                response = await self.http.get("/valve/switch", params=params, timeout=3, retry_count=0)
                 return response.status_code == 200
             except Exception:
                 return False
\ No newline at end of file
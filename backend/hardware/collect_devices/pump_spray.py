@@ -5,8 +5,8 @@
 
 from typing import Dict, Any, Optional
 import asyncio
-import requests
 from ..hardware_config import MockDataGenerator, is_mock_mode
+from ..drivers.http_driver import get_http_client
 
 
 class SprayPumpController:
@@ -17,6 +17,7 @@ class SprayPumpController:
         self.device_name = '泵4'  # 设备名称
         self.base_url = base_url
         self.mock = mock if mock is not None else is_mock_mode(self.device_id)
+        self.http = get_http_client(self.device_id, base_url, timeout=5)
 
         # 硬件控制参数
         self.freq = 1000  # 频率
@@ -46,15 +47,13 @@ class SprayPumpController:
             return True
         else:
             try:
-                url = f"{self.base_url}/pump/switch"
                 params = {
                     'ifon': 1,  # 1代表开启
                     'freq': self.freq,
                     'duty': self.duty
                 }
 
-                # 使用asyncio.to_thread将同步请求转为异步
-                response = await asyncio.to_thread(requests.get, url, params=params)
+                response = await self.http.get("/pump/switch", params=params)
 
                 if response.status_code == 200:
                     self.pump_status['status'] = 'running'
@@ -76,15 +75,13 @@ class SprayPumpController:
             return True
         else:
             try:
-                url = f"{self.base_url}/pump/switch"
                 params = {
                     'ifon': 0,  # 0代表关闭
                     'freq': self.freq,
                     'duty': self.duty
                 }
 
-                # 使用asyncio.to_thread将同步请求转为异步
-                response = await asyncio.to_thread(requests.get, url, params=params)
+                response = await self.http.get("/pump/switch", params=params)
 
                 if response.status_code == 200:
                     self.pump_status['status'] = 'stopped'
@@ -202,14 +199,13 @@ class SprayPumpController:
             return True
         else:
             try:
-                url = f"{self.base_url}/pump/switch"
                 params = {
                     'ifon': ifon,
                     'freq': self.freq,
                     'duty': self.duty
                 }
 
-                response = await asyncio.to_thread(requests.get, url, params=params)
+                response = await self.http.get("/pump/switch", params=params)
 
                 if response.status_code == 200:
                     if ifon == 1:
@@ -0,0 +1,151 @@
+"""
+阀门批量动作执行器
+Concurrent Valve Batch Executor
+
+把一批阀门动作按依赖关系并发执行：
+- 只遵守显式声明的先后约束（after），没有约束的动作同时发出，同时执行的数量受 max_concurrency 限制
+  （调用方传入设备连接池的连接数，避免请求在连接池中排队）；
+- 同一阀门、同一物理通道（引脚/阀站）上的动作按提交顺序串行，全部执行（如 open→close 脉冲）；
+- 显式声明的前置动作失败时，依赖它的动作不再执行；仅因串行而排在后面的动作照常执行。
+结果 BatchReport 按提交顺序给出每个动作的成功与否和耗时；布尔值为"全部成功"，兼容原来返回 bool 的接口。
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+@dataclass
+class ValveAction:
+    """一个阀门动作"""
+    valve_id: str
+    run: Callable[[], Awaitable[bool]]
+    description: str = ""
+    after: Sequence[str] = ()           # 必须在这些阀门的全部动作成功后执行
+    channel: Optional[Hashable] = None  # 物理通道（引脚号/阀站号），同一通道串行
+
+
+@dataclass
+class BatchReport:
+    """批量动作结果（results 按提交顺序）"""
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return all(result["success"] for result in self.results)
+
+    def __bool__(self) -> bool:
+        return self.success
+
+    def to_dict(self) -> Dict[str, Any]:
+        executed = [r for r in self.results if r.get("duration_ms") is not None]
+        return {
+            "success": self.success,
+            "total": len(self.results),
+            "failed": [r["valve_id"] for r in self.results if not r["success"]],
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            # 逐个顺序执行时的耗时（各动作耗时之和），用于对比并发收益
+            "sequential_ms": round(sum(r["duration_ms"] for r in executed), 1),
+            "results": self.results,
+        }
+
+
+def _check_acyclic(prerequisites: List[List[Tuple[int, bool]]], actions: Sequence[ValveAction]):
+    """检查依赖关系中没有环"""
+    state: Dict[int, int] = {}  # 1: 访问中, 2: 已完成
+
+    def visit(index: int, path: List[int]):
+        if state.get(index) == 2:
+            return
+        if state.get(index) == 1:
+            cycle = path[path.index(index):] + [index]
+            raise ValueError(f"阀门动作的先后约束存在循环: {' -> '.join(actions[i].valve_id for i in cycle)}")
+        state[index] = 1
+        for prerequisite, _ in prerequisites[index]:
+            visit(prerequisite, path + [index])
+        state[index] = 2
+
+    for index in range(len(actions)):
+        visit(index, [])
+
+
+async def run_valve_batch(actions: Sequence[ValveAction],
+                          max_concurrency: Optional[int] = None) -> BatchReport:
+    """
+    并发执行一批阀门动作
+
+    Args:
+        actions: 动作列表（提交顺序决定同一阀门/同一通道上的先后）
+        max_concurrency: 同时执行的动作上限，默认不限制
+
+    Raises:
+        ValueError: 先后约束存在循环
+    """
+    batch_started = time.perf_counter()
+
+    # 每个动作的前置动作 (下标, 是否要求成功)：
+    # 同一阀门/通道的上一个动作只要求先完成；after 声明的阀门的全部动作要求成功
+    by_valve: Dict[str, List[int]] = {}
+    for index, action in enumerate(actions):
+        by_valve.setdefault(action.valve_id, []).append(index)
+
+    prerequisites: List[List[Tuple[int, bool]]] = []
+    last_on_valve: Dict[str, int] = {}
+    last_on_channel: Dict[Hashable, int] = {}
+    for index, action in enumerate(actions):
+        deps: Dict[int, bool] = {}
+        for valve_id in action.after:
+            for other in by_valve.get(valve_id, ()):
+                if other != index:
+                    deps[other] = True
+        for previous in (last_on_valve.get(action.valve_id),
+                         last_on_channel.get(action.channel) if action.channel is not None else None):
+            if previous is not None:
+                deps.setdefault(previous, False)
+        last_on_valve[action.valve_id] = index
+        if action.channel is not None:
+            last_on_channel[action.channel] = index
+        prerequisites.append(list(deps.items()))
+    _check_acyclic(prerequisites, actions)
+
+    loop = asyncio.get_running_loop()
+    finished = [loop.create_future() for _ in actions]
+    results: List[Dict[str, Any]] = [{} for _ in actions]
+    limiter = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def execute(index: int, action: ValveAction):
+        result: Dict[str, Any] = {"valve_id": action.valve_id, "action": action.description,
+                                  "after": list(action.after), "success": False}
+        try:
+            if prerequisites[index]:
+                outcomes = await asyncio.gather(*(finished[i] for i, _ in prerequisites[index]))
+                failed = sorted({actions[i].valve_id for (i, required), ok in zip(prerequisites[index], outcomes)
+                                 if required and not ok})
+                if failed:
+                    result["error"] = f"前置动作失败: {', '.join(failed)}"
+                    result["skipped"] = True
+                    return
+
+            if limiter:
+                await limiter.acquire()
+            started = time.perf_counter()
+            result["start_ms"] = round((started - batch_started) * 1000, 1)
+            try:
+                result["success"] = bool(await action.run())
+            except Exception as e:
+                result["error"] = str(e)
+            finally:
+                result["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                if limiter:
+                    limiter.release()
+        finally:
+            results[index] = result
+            finished[index].set_result(result["success"])
+
+    await asyncio.gather(*(execute(index, action) for index, action in enumerate(actions)))
+    return BatchReport(results=results, elapsed_ms=(time.perf_counter() - batch_started) * 1000)
+
+
+__all__ = ['ValveAction', 'BatchReport', 'run_valve_batch']
@@ -5,8 +5,9 @@
 
 from typing import Dict, Any, List, Optional
 import asyncio
-import requests
 from ..hardware_config import MockDataGenerator, is_mock_mode
+from ..drivers.http_driver import get_http_client
+from .valve_batch import ValveAction, BatchReport, run_valve_batch
 
 
 class ValveController:
@@ -16,6 +17,7 @@ class ValveController:
         self.device_id = 'valve_controller'
         self.base_url = base_url
         self.mock = mock if mock is not None else is_mock_mode(self.device_id)
+        self.http = get_http_client(self.device_id, base_url, timeout=5)
         self.valves = {
             '电1': {'name': '进样阀', 'status': 'closed', 'type': '电磁阀', 'pin_num': 13},
             '电2': {'name': '冲洗阀', 'status': 'closed', 'type': '电磁阀', 'pin_num': 10},
@@ -27,12 +29,11 @@ class ValveController:
             '双3': {'name': '双向阀', 'status': 'position_1', 'type': '电磁阀', 'pin_num': 15}
         }
 
-    def _single_valve_control(self, pin_num: int, value: int) -> bool:
+    async def _single_valve_control(self, pin_num: int, value: int) -> bool:
         """调用硬件单向阀控制接口"""
         try:
-            url = f"{self.base_url}/device/on"
             params = {'pin_num': pin_num, 'value': value}
-            response = requests.get(url, params=params, timeout=5)
+            response = await self.http.get("/device/on", params=params)
             return response.status_code == 200
         except:
             return False
@@ -86,7 +87,7 @@ class ValveController:
                 return False
 
             # 调用硬件接口
-            success = self._single_valve_control(pin_num, value)
+            success = await self._single_valve_control(pin_num, value)
 
             # 如果硬件操作失败，恢复状态
             if not success:
@@ -96,28 +97,40 @@ class ValveController:
             await asyncio.sleep(0.1)
             return success
     
-    async def batch_control(self, valve_actions: List[Dict[str, str]]) -> bool:
+    def _valve_action(self, valve_id: str, action: str, after: Optional[List[str]] = None) -> ValveAction:
+        """构造单个阀门的控制动作；同一引脚上的动作串行"""
+        return ValveAction(
+            valve_id=valve_id,
+            run=lambda: self.control_valve(valve_id, action),
+            description=action,
+            after=after or (),
+            channel=self.valves.get(valve_id, {}).get('pin_num'),
+        )
+
+    async def batch_control(self, valve_actions: List[Dict[str, Any]]) -> BatchReport:
         """
-        批量控制阀门
-        :param valve_actions: [{'valve_id': 'valve_id', 'action': 'action'}, ...]
-        :return: 操作结果
+        批量控制阀门，互不依赖的阀门同时动作
+        :param valve_actions: [{'valve_id': 'valve_id', 'action': 'action', 'after': ['valve_id', ...]}, ...]
+                              after 可选，列出必须先成功完成的阀门；同一阀门出现多次时按顺序依次执行
+        :return: BatchReport，布尔值为全部成功，to_dict() 给出每个阀门的结果和耗时
         """
-        if not valve_actions:
-            return True
-
-        success_count = 0
-        for valve_action in valve_actions:
+        actions = []
+        invalid = []
+        for index, valve_action in enumerate(valve_actions):
             valve_id = valve_action.get('valve_id')
             action = valve_action.get('action')
-
             if valve_id and action:
-                success = await self.control_valve(valve_id, action)
-                if success:
-                    success_count += 1
+                actions.append(self._valve_action(valve_id, action, valve_action.get('after')))
+            else:
+                invalid.append((index, {'valve_id': valve_id, 'action': action,
+                                        'success': False, 'error': '缺少 valve_id 或 action'}))
+
+        report = await run_valve_batch(actions, self.http.session.max_connections)
+        # 无效条目按原位置放回结果中
+        for index, result in invalid:
+            report.results.insert(index, result)
+        return report
 
-        # 如果所有操作都成功，返回True
-        return success_count == len(valve_actions)
-    
     async def get_status(self, valve_id: str = None) -> Dict[str, Any]:
         """获取阀门状态"""
         if self.mock:
@@ -166,25 +179,18 @@ class ValveController:
             await asyncio.sleep(0.2)
             return True
         else:
-            success_count = 0
-            total_valves = len(self.valves)
-
+            actions = []
             for valve_id in self.valves:
-                try:
-                    if valve_id == '泵3':
-                        success = await self.control_valve(valve_id, 'stop')
-                    elif valve_id == '双3':
-                        success = await self.control_valve(valve_id, 'position_1')
-                    else:
-                        success = await self.control_valve(valve_id, 'close')
-
-                    if success:
-                        success_count += 1
-                except Exception:
-                    continue
+                if valve_id == '泵3':
+                    actions.append(self._valve_action(valve_id, 'stop'))
+                elif valve_id == '双3':
+                    actions.append(self._valve_action(valve_id, 'position_1'))
+                else:
+                    actions.append(self._valve_action(valve_id, 'close'))
 
+            report = await run_valve_batch(actions, self.http.session.max_connections)
             await asyncio.sleep(0.2)
-            return success_count == total_valves
+            return report.success
 
     def set_mock_mode(self, mock: bool):
         """设置mock模式"""
@@ -1,14 +1,33 @@
 """底层驱动"""
 
-from .serial_driver import SerialPort, SerialProtocol
-from .http_driver import HTTPClient, NetworkManager
+from .serial_driver import (
+    SerialConfig, SerialPort, SerialProtocol, CommandPriority,
+    DetectorProtocol, ModbusRTUProtocol, PumpProtocol,
+    get_serial_port, get_serial_metrics
+)
+from .http_driver import (
+    HTTPConfig, HTTPClient, HTTPResponse, HTTPRequestError,
+    NetworkManager, network_manager, get_http_client
+)
 from .protocol_converter import DataConverter, CommandTranslator
 
 __all__ = [
+    'SerialConfig',
     'SerialPort',
     'SerialProtocol',
+    'CommandPriority',
+    'DetectorProtocol',
+    'ModbusRTUProtocol',
+    'PumpProtocol',
+    'get_serial_port',
+    'get_serial_metrics',
+    'HTTPConfig',
     'HTTPClient',
+    'HTTPResponse',
+    'HTTPRequestError',
     'NetworkManager',
+    'network_manager',
+    'get_http_client',
     'DataConverter',
     'CommandTranslator'
 ]
\ No newline at end of file
@@ -1,79 +1,488 @@
 """
 HTTP通信驱动
 支持192.168.1.129的各种接口
+
+基于 asyncio 的 HTTP/1.1 客户端：同一地址（scheme://host:port）的所有设备共用一个
+keep-alive 连接池，请求全程不阻塞事件循环。每个设备有自己的超时和重试配置；
+超时从取得连接池名额后开始计算，排队时间不计入。请求发出前的连接失败总是按配置重试；
+请求已经发出后的失败、超时和 5xx 响应只对调用方标记为幂等（idempotent=True）的请求重试，
+避免带副作用的控制命令（如阀门切换）被重复执行。复用的空闲连接已被对端关闭时直接换新连接重发。
 """
 
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Deque, Tuple, Union
 import asyncio
+import json
+import logging
+import time
+from collections import deque
 from dataclasses import dataclass
+from urllib.parse import urlencode, urlsplit
+
+from utils.latency_histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "chromatography-backend"
+# 响应头（及分块长度行）最大长度，也是连接读缓冲的上限
+MAX_HEADER_BYTES = 64 * 1024
 
 
 @dataclass
 class HTTPConfig:
     """网络配置"""
     base_url: str
-    timeout: int = 30
-    retry_count: int = 3
+    timeout: float = 30                 # 单次请求超时（秒，含建立连接，不含排队等待连接池名额）
+    retry_count: int = 3                # 失败后的重试次数
     headers: Optional[Dict[str, str]] = None
+    retry_backoff: float = 0.2          # 第n次重试前等待 retry_backoff * 2^(n-1) 秒
+    max_connections: int = 4            # 连接池上限（同一地址共享，取首次创建时的配置）
+    idle_timeout: float = 30.0          # 空闲连接保留时间（秒）
+
+
+class HTTPRequestError(Exception):
+    """请求在重试后仍然失败"""
+
+
+class _StaleConnection(Exception):
+    """复用的空闲连接已被对端关闭"""
+
+
+class HTTPResponse:
+    """HTTP响应（接口与 requests.Response 常用部分一致）"""
+
+    __slots__ = ("status_code", "reason", "headers", "content", "elapsed")
+
+    def __init__(self, status_code: int, reason: str, headers: Dict[str, str], content: bytes, elapsed: float):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def __repr__(self) -> str:
+        return f"<HTTPResponse [{self.status_code}]>"
+
+
+class _Attempt:
+    """单次尝试的状态：开始时间（取得名额后）、请求是否已写出"""
+    __slots__ = ("started", "sent")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sent = False
+
+
+class _Connection:
+    __slots__ = ("reader", "writer", "last_used", "requests")
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+        self.requests = 0
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """同一地址的 keep-alive 连接池"""
+
+    def __init__(self, host: str, port: int, ssl: bool = False,
+                 max_connections: int = 4, idle_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self._idle: Deque[_Connection] = deque()
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # 统计信息
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # 在事件循环中首次使用时创建
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        return self._slots
+
+    async def acquire(self) -> Tuple[_Connection, bool]:
+        """取一个连接，返回 (连接, 是否为复用的空闲连接)"""
+        now = time.monotonic()
+        while self._idle:
+            conn = self._idle.pop()
+            if now - conn.last_used < self.idle_timeout and not conn.reader.at_eof():
+                self.reused += 1
+                return conn, True
+            self.discard(conn)
+
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None,
+                                                       limit=MAX_HEADER_BYTES)
+        self.opened += 1
+        return _Connection(reader, writer), False
+
+    def release(self, conn: _Connection):
+        """请求完成且连接可复用时放回池中"""
+        conn.last_used = time.monotonic()
+        self._idle.append(conn)
+
+    def discard(self, conn: _Connection):
+        conn.close()
+        self.closed += 1
+
+    def close(self):
+        while self._idle:
+            self.discard(self._idle.pop())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "address": f"{self.host}:{self.port}",
+            "max_connections": self.max_connections,
+            "idle": len(self._idle),
+            "opened": self.opened,
+            "reused": self.reused,
+            "closed": self.closed,
+        }
 
 
 class HTTPClient:
-    """HTTP请求封装类"""
-    
-    def __init__(self, config: HTTPConfig):
+    """HTTP请求封装类（每个设备一个实例，同地址的实例共享连接池）"""
+
+    def __init__(self, config: HTTPConfig, pool: Optional[ConnectionPool] = None):
         self.config = config
-        self.session = None
-    
+        parts = urlsplit(config.base_url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.session = pool or ConnectionPool(self.host, self.port, parts.scheme == "https",
+                                              config.max_connections, config.idle_timeout)
+
+        # 统计信息
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.latency = LatencyHistogram()
+
     async def initialize(self) -> bool:
-        """初始化HTTP客户端"""
-        # 引入aiohttp库
-        # import aiohttp
-        pass
-    
-    async def get(self, endpoint: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+        """初始化HTTP客户端（连接在首次请求时建立）"""
+        return True
+
+    async def get(self, endpoint: str, params: Optional[Dict] = None, **kwargs) -> HTTPResponse:
         """发送GET请求"""
-        pass
-    
-    async def post(self, endpoint: str, data: Optional[Dict] = None) -> Dict[str, Any]:
-        """发送POST请求"""
-        pass
-    
-    async def put(self, endpoint: str, data: Optional[Dict] = None) -> Dict[str, Any]:
-        """发送PUT请求"""
-        pass
-    
-    async def delete(self, endpoint: str) -> Dict[str, Any]:
+        return await self.request("GET", endpoint, params=params, **kwargs)
+
+    async def post(self, endpoint: str, data: Optional[Dict] = None, **kwargs) -> HTTPResponse:
+        """发送POST请求（data 为字典时以JSON发送）"""
+        return await self.request("POST", endpoint, json_body=data, **kwargs)
+
+    async def put(self, endpoint: str, data: Optional[Dict] = None, **kwargs) -> HTTPResponse:
+        """发送PUT请求（data 为字典时以JSON发送）"""
+        return await self.request("PUT", endpoint, json_body=data, **kwargs)
+
+    async def delete(self, endpoint: str, **kwargs) -> HTTPResponse:
         """发送DELETE请求"""
-        pass
-    
+        return await self.request("DELETE", endpoint, **kwargs)
+
+    async def request(self, method: str, endpoint: str,
+                      params: Optional[Dict[str, Any]] = None,
+                      json_body: Any = None,
+                      body: Optional[Union[bytes, str]] = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      timeout: Optional[float] = None,
+                      retry_count: Optional[int] = None,
+                      idempotent: bool = False) -> HTTPResponse:
+        """
+        发送请求
+
+        Args:
+            endpoint: 路径，如 "/device/on"
+            params: 查询参数
+            json_body / body: 请求体（二选一）
+            timeout / retry_count: 覆盖设备配置
+            idempotent: 重复执行没有副作用（如状态查询）。为 True 时 5xx 响应按配置重试；
+                        为 False 时请求一旦发出就不再重试，5xx 响应直接返回给调用方
+
+        Returns:
+            HTTPResponse: 最后一次收到的响应（重试用尽后仍为 5xx 时同样返回，由调用方检查状态码）
+
+        Raises:
+            HTTPRequestError: 连接失败、超时、响应无法解析，且不再重试
+        """
+        timeout = self.config.timeout if timeout is None else timeout
+        retries = self.config.retry_count if retry_count is None else retry_count
+
+        path = self.base_path + "/" + endpoint.lstrip("/")
+        if params:
+            path += "?" + urlencode(params)
+        request_headers = dict(self.config.headers or {})
+        request_headers.update(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body)
+            request_headers.setdefault("Content-Type", "application/json")
+        payload = self._build_request(method, path, request_headers, body)
+
+        self.requests += 1
+        last_error: Optional[Exception] = None
+        attempts = 0
+        while attempts <= retries:
+            if attempts:
+                self.retries += 1
+                await asyncio.sleep(self.config.retry_backoff * (2 ** (attempts - 1)))
+            attempts += 1
+            state = _Attempt()
+            try:
+                response = await self._exchange(method, payload, timeout, state)
+            except asyncio.TimeoutError:
+                last_error = TimeoutError(f"{method} {path} 超时 ({timeout}s)")
+            except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                last_error = e
+            else:
+                response.elapsed = time.perf_counter() - state.started
+                self.latency.record(response.elapsed)
+                if response.status_code >= 500 and attempts <= retries and idempotent:
+                    last_error = HTTPRequestError(f"{method} {path} 返回 {response.status_code}")
+                    continue
+                return response
+            if state.sent and not idempotent:
+                # 请求可能已被设备执行，重发会重复动作
+                break
+
+        self.failures += 1
+        self.last_error = str(last_error)
+        raise HTTPRequestError(f"{method} {self.host}{path} 失败（尝试{attempts}次）: {last_error}")
+
+    def _build_request(self, method: str, path: str, headers: Dict[str, str],
+                       body: Optional[Union[bytes, str]]) -> bytes:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        host = self.host if self.port in (80, 443) else f"{self.host}:{self.port}"
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}",
+                 f"User-Agent: {USER_AGENT}", "Accept: */*", "Connection: keep-alive"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if body is not None or method in ("POST", "PUT"):
+            lines.append(f"Content-Length: {len(body or b'')}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (body or b"")
+
+    async def _exchange(self, method: str, payload: bytes, timeout: float, state: _Attempt) -> HTTPResponse:
+        """取得连接池名额后在超时限制内完成一次请求（排队时间不计入超时）"""
+        async with self.session.slots:
+            state.started = time.perf_counter()
+            return await asyncio.wait_for(self._exchange_locked(method, payload, state), timeout)
+
+    async def _exchange_locked(self, method: str, payload: bytes, state: _Attempt) -> HTTPResponse:
+        """在池中的连接上完成一次请求；复用连接已失效时换新连接重发一次"""
+        for _ in range(2):
+            conn, reused = await self.session.acquire()
+            try:
+                response, keep_alive = await self._send(conn, method, payload, reused, state)
+            except _StaleConnection:
+                self.session.discard(conn)
+                continue
+            except BaseException:
+                # 超时取消或读写错误：连接状态未知，不再复用
+                self.session.discard(conn)
+                raise
+            if keep_alive:
+                self.session.release(conn)
+            else:
+                self.session.discard(conn)
+            return response
+        raise ConnectionError("连接被对端关闭")
+
+    async def _send(self, conn: _Connection, method: str, payload: bytes,
+                    reused: bool, state: _Attempt) -> Tuple[HTTPResponse, bool]:
+        state.sent = True
+        conn.writer.write(payload)
+        await conn.writer.drain()
+        conn.requests += 1
+
+        try:
+            head = await conn.reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            if reused and not e.partial:
+                raise _StaleConnection()
+            raise
+        except ConnectionResetError:
+            if reused:
+                raise _StaleConnection()
+            raise
+        except asyncio.LimitOverrunError:
+            raise ValueError(f"HTTP响应头超过 {MAX_HEADER_BYTES} 字节")
+
+        status_line, *header_lines = head.decode('latin-1').split("\r\n")
+        version, status, *reason = status_line.split(" ", 2)
+        headers: Dict[str, str] = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        status_code = int(status)
+        connection = headers.get("connection", "").lower()
+        keep_alive = (connection != "close") if version == "HTTP/1.1" else (connection == "keep-alive")
+
+        if method == "HEAD" or status_code in (204, 304) or 100 <= status_code < 200:
+            content = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            content = await self._read_chunked(conn.reader)
+        elif "content-length" in headers:
+            content = await conn.reader.readexactly(int(headers["content-length"]))
+        else:
+            # 没有长度信息：读到对端关闭为止
+            content = await conn.reader.read()
+            keep_alive = False
+
+        return HTTPResponse(status_code, reason[0] if reason else "", headers, content, 0.0), keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                # 跳过 trailer
+                while (await reader.readuntil(b"\r\n")) != b"\r\n":
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
     async def close(self) -> bool:
-        """关闭HTTP客户端"""
-        pass
+        """关闭HTTP客户端（关闭连接池中的空闲连接）"""
+        self.session.close()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.config.base_url,
+            "timeout": self.config.timeout,
+            "retry_count": self.config.retry_count,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "latency": self.latency.to_dict(),
+        }
 
 
 class NetworkManager:
-    """网络连接管理类"""
-    
+    """网络连接管理类：按设备保存客户端，同地址的设备共享连接池"""
+
     def __init__(self):
         self.clients: Dict[str, HTTPClient] = {}
-        self.connection_pool = []
-    
+        self.connection_pool: Dict[Tuple[str, int, bool], ConnectionPool] = {}
+
+    def _pool_for(self, config: HTTPConfig) -> ConnectionPool:
+        parts = urlsplit(config.base_url)
+        ssl = parts.scheme == "https"
+        key = (parts.hostname or "localhost", parts.port or (443 if ssl else 80), ssl)
+        pool = self.connection_pool.get(key)
+        if pool is None:
+            pool = ConnectionPool(key[0], key[1], ssl, config.max_connections, config.idle_timeout)
+            self.connection_pool[key] = pool
+        return pool
+
+    def register(self, device_id: str, config: HTTPConfig) -> HTTPClient:
+        """注册设备并返回其客户端（同步，可在设备构造函数中调用）"""
+        client = self.clients.get(device_id)
+        if client is None or client.config != config:
+            client = HTTPClient(config, self._pool_for(config))
+            self.clients[device_id] = client
+        return client
+
     async def add_device(self, device_id: str, config: HTTPConfig) -> bool:
         """添加网络设备"""
-        pass
-    
+        self.register(device_id, config)
+        return True
+
     async def remove_device(self, device_id: str) -> bool:
-        """移除网络设备"""
-        pass
-    
+        """移除网络设备（连接池仍由同地址的其他设备使用）"""
+        return self.clients.pop(device_id, None) is not None
+
     async def get_client(self, device_id: str) -> Optional[HTTPClient]:
         """获取设备客户端"""
-        pass
-    
+        return self.clients.get(device_id)
+
     async def check_connectivity(self, device_id: str) -> bool:
-        """检查设备连通性"""
-        pass
-    
+        """检查设备连通性（收到任何HTTP响应即视为连通）"""
+        client = self.clients.get(device_id)
+        if client is None:
+            return False
+        try:
+            await client.get("/", timeout=min(client.config.timeout, 3.0), retry_count=0, idempotent=True)
+            return True
+        except HTTPRequestError:
+            return False
+
     async def broadcast_command(self, command: Dict[str, Any]) -> Dict[str, Any]:
-        """广播命令到所有设备"""
-        pass
\ No newline at end of file
+        """
+        广播命令到所有设备（并发发送）
+        :param command: {"endpoint": "/path", "method": "GET", "params": {...}, "data": {...}}
+        :return: {device_id: {"success", "status_code"/"error"}}
+        """
+        async def send(client: HTTPClient) -> Dict[str, Any]:
+            try:
+                response = await client.request(
+                    command.get("method", "GET"), command["endpoint"],
+                    params=command.get("params"), json_body=command.get("data"))
+                return {"success": response.ok, "status_code": response.status_code}
+            except HTTPRequestError as e:
+                return {"success": False, "error": str(e)}
+
+        device_ids = list(self.clients)
+        results = await asyncio.gather(*(send(self.clients[d]) for d in device_ids))
+        return dict(zip(device_ids, results))
+
+    async def close(self):
+        """关闭所有连接池"""
+        for pool in self.connection_pool.values():
+            pool.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pools": [pool.get_stats() for pool in self.connection_pool.values()],
+            "devices": {device_id: client.get_stats() for device_id, client in self.clients.items()},
+        }
+
+
+# 进程内共享的网络管理器：收集模块设备都从这里取客户端
+network_manager = NetworkManager()
+
+
+def get_http_client(device_id: str, base_url: str, timeout: float = 5.0, retry_count: int = 2,
+                    **kwargs) -> HTTPClient:
+    """获取设备的共享HTTP客户端"""
+    return network_manager.register(
+        device_id, HTTPConfig(base_url=base_url, timeout=timeout, retry_count=retry_count, **kwargs))
+
+
+__all__ = [
+    'HTTPConfig',
+    'HTTPResponse',
+    'HTTPRequestError',
+    'HTTPClient',
+    'ConnectionPool',
+    'NetworkManager',
+    'network_manager',
+    'get_http_client',
+]
@@ -1,11 +1,26 @@
 """
 串口驱动
 支持ttyAMA0(9600), ttyAMA2(115200), ttyAMA3(57600)
+
+每个串口由一个 SerialPort 独占（get_serial_port 按端口共享同一实例），
+由该端口的所有者任务按优先级从命令队列取出命令发送，响应按协议匹配后交回调用方。
+协议允许时（pipeline_depth > 1 且响应可区分）可以不等响应连续发送多条命令。
+SerialProtocol 及其子类负责命令组帧、校验、分帧和响应匹配。
 """
 
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Callable, Deque, Dict, Hashable, Set
 import asyncio
+import itertools
+import logging
+import time
+from collections import deque
 from dataclasses import dataclass
+from enum import IntEnum
+
+from .serial_transport import AsyncSerialTransport, LineFramer, AckLineFramer, ModbusRTUFramer
+from utils.latency_histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -17,62 +32,475 @@ class SerialConfig:
     bytesize: int = 8
     parity: str = 'N'
     stopbits: int = 1
+    pipeline_depth: int = 1     # 同时等待响应的命令数，1表示严格一问一答
 
 
-class SerialPort:
-    """串口连接管理类"""
-    
-    def __init__(self, config: SerialConfig):
-        self.config = config
-        self.connection = None
-        self.is_connected = False
-    
-    async def connect(self) -> bool:
-        """连接串口"""
-        # 引入pyserial库
-        # import serial_asyncio
-        pass
-    
-    async def disconnect(self) -> bool:
-        """断开串口连接"""
-        pass
-    
-    async def write(self, data: bytes) -> bool:
-        """发送数据"""
-        pass
-    
-    async def read(self, size: int = 1024) -> bytes:
-        """读取数据"""
-        pass
-    
-    async def write_read(self, command: bytes, response_size: int = 1024) -> bytes:
-        """发送命令并读取响应"""
-        pass
-    
-    def is_open(self) -> bool:
-        """检查串口是否打开"""
-        return self.is_connected
+class CommandPriority(IntEnum):
+    """串口命令优先级，数值越小越优先"""
+    URGENT = 0      # 停止等安全相关命令
+    CONTROL = 1     # 设置类命令
+    POLL = 2        # 周期性读取
 
 
 class SerialProtocol:
-    """串口协议封装类"""
-    
-    @staticmethod
-    def build_command(cmd_type: str, params: List[Any]) -> bytes:
+    """
+    串口协议封装类（默认：ASCII 行协议）
+
+    子类覆盖组帧、校验和分帧；matches 用于流水线时判断响应属于哪条命令。
+    """
+
+    name = "line"
+    terminator = b"\n"
+
+    @classmethod
+    def build_command(cls, cmd_type: str, params: List[Any] = ()) -> bytes:
         """构建命令帧"""
-        pass
-    
+        body = (cmd_type + "".join(str(p) for p in params)).encode('ascii')
+        return body + cls.calculate_checksum(body) + cls.terminator
+
     @staticmethod
     def parse_response(response: bytes) -> dict:
         """解析响应帧"""
-        pass
-    
+        return {"raw": response, "text": response.decode('ascii', errors='replace').strip()}
+
     @staticmethod
     def calculate_checksum(data: bytes) -> bytes:
-        """计算校验和"""
-        pass
-    
+        """计算校验和（行协议无校验）"""
+        return b""
+
     @staticmethod
     def validate_frame(frame: bytes) -> bool:
         """验证数据帧"""
-        pass
\ No newline at end of file
+        return bool(frame)
+
+    @staticmethod
+    def create_framer():
+        """创建该协议的分帧器"""
+        return LineFramer()
+
+    @staticmethod
+    def matches(command: bytes, frame: bytes) -> bool:
+        """判断帧是否可能是命令的响应；一问一答的协议总是返回True"""
+        return True
+
+
+class DetectorProtocol(SerialProtocol):
+    """检测器协议：#命令\\n\\r，响应按行，读命令的响应带命令回显"""
+
+    name = "detector"
+    terminator = b"\n\r"
+
+    @classmethod
+    def build_command(cls, cmd_type: str, params: List[Any] = ()) -> bytes:
+        return b"#" + super().build_command(cmd_type, params)
+
+
+class ModbusRTUProtocol(SerialProtocol):
+    """Modbus RTU 协议（压力传感器）"""
+
+    name = "modbus_rtu"
+
+    @classmethod
+    def build_command(cls, cmd_type: str, params: List[Any] = ()) -> bytes:
+        """
+        构建命令帧
+        :param cmd_type: 功能码，如 '03'（十六进制字符串）
+        :param params: [从站地址, 起始寄存器, 数量/写入值]
+        """
+        address, register, value = params
+        body = bytes([int(address), int(cmd_type, 16),
+                      (register >> 8) & 0xFF, register & 0xFF,
+                      (value >> 8) & 0xFF, value & 0xFF])
+        return body + cls.calculate_checksum(body)
+
+    @staticmethod
+    def calculate_checksum(data: bytes) -> bytes:
+        """CRC16/MODBUS，低字节在前"""
+        crc = 0xFFFF
+        for byte in data:
+            crc ^= byte
+            for _ in range(8):
+                crc = (crc >> 1) ^ 0xA001 if crc & 1 else crc >> 1
+        return bytes([crc & 0xFF, crc >> 8])
+
+    @staticmethod
+    def validate_frame(frame: bytes) -> bool:
+        return len(frame) >= 4 and ModbusRTUProtocol.calculate_checksum(frame[:-2]) == frame[-2:]
+
+    @staticmethod
+    def parse_response(response: bytes) -> dict:
+        result = {"raw": response, "address": response[0], "function": response[1] & 0x7F,
+                  "error": bool(response[1] & 0x80)}
+        if result["error"]:
+            result["exception_code"] = response[2]
+        elif response[1] in (0x01, 0x02, 0x03, 0x04):
+            data = response[3:3 + response[2]]
+            result["data"] = data
+            result["registers"] = [(data[i] << 8) | data[i + 1] for i in range(0, len(data) - 1, 2)]
+        return result
+
+    @staticmethod
+    def create_framer():
+        return ModbusRTUFramer()
+
+    @staticmethod
+    def matches(command: bytes, frame: bytes) -> bool:
+        # 从站地址相同，功能码相同（或为其异常响应）
+        return len(frame) >= 2 and frame[0] == command[0] and frame[1] & 0x7F == command[1]
+
+
+class PumpProtocol(SerialProtocol):
+    """高压恒流泵协议：命令补齐12字节后加3位十进制和校验，应答 '#' 或以 '!' 开头的数据行"""
+
+    name = "pump"
+
+    @staticmethod
+    def calculate_checksum(data: bytes) -> bytes:
+        """校验和：命令不足12字节时以空格补齐，各字节求和取模256，输出为 补齐的空格 + 3位十进制"""
+        padding = max(12 - len(data), 0)
+        total = sum(data) + 32 * padding
+        return (' ' * padding + f"{total % 256:03}").encode('ascii')
+
+    @staticmethod
+    def create_framer():
+        return AckLineFramer(b"#")
+
+
+class _SerialCommand:
+    __slots__ = ("data", "timeout", "priority", "match", "expect_response",
+                 "future", "enqueued_at", "sent_at", "timer")
+
+    def __init__(self, data: bytes, timeout: float, priority: int,
+                 match: Optional[Callable[[bytes], bool]], expect_response: bool,
+                 future: asyncio.Future):
+        self.data = data
+        self.timeout = timeout
+        self.priority = priority
+        self.match = match
+        self.expect_response = expect_response
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+        self.sent_at = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class SerialPort:
+    """串口连接管理类：一个端口一个所有者任务，命令按优先级排队"""
+
+    def __init__(self, config: SerialConfig, protocol: Optional[SerialProtocol] = None):
+        self.config = config
+        self.protocol = protocol or SerialProtocol()
+        self.connection: Optional[AsyncSerialTransport] = None
+        self.is_connected = False
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._seq = itertools.count()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._in_flight: Deque[_SerialCommand] = deque()
+        self._owner_task: Optional[asyncio.Task] = None
+        self._owners: Set[Hashable] = set()  # 当前使用该端口的设备
+        self._unsolicited: Deque[bytes] = deque(maxlen=100)
+        self._unsolicited_event = asyncio.Event()
+        self._frame_listeners: List[Callable[[bytes, float], None]] = []
+
+        # 统计信息
+        self.commands = 0
+        self.responses = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.unsolicited = 0
+        self.invalid_frames = 0
+        self.max_queue_depth = 0
+        self.last_error: Optional[str] = None
+        self.latency = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+
+    async def connect(self, owner: Hashable = None) -> bool:
+        """
+        连接串口（多个设备共用同一端口时只打开一次）
+
+        Args:
+            owner: 使用端口的设备（通常传入设备对象自身），同一设备重复连接或断线重连只计一次
+        """
+        self._owners.add(owner)
+        if self.is_connected:
+            return True
+
+        # 连接中断后重连：先清理上一次的所有者任务
+        await self._shutdown(ConnectionError(f"串口 {self.config.port} 重新连接"))
+        self.connection = AsyncSerialTransport(
+            self.config.port,
+            self.config.baudrate,
+            bytesize=self.config.bytesize,
+            parity=self.config.parity,
+            stopbits=self.config.stopbits,
+            framer=self.protocol.create_framer(),
+            on_frame=self._on_frame
+        )
+        self.connection.on_lost = self._on_lost
+        if not await self.connection.open():
+            self._owners.discard(owner)
+            self.last_error = f"无法打开串口 {self.config.port}"
+            return False
+
+        self._queue = asyncio.PriorityQueue()
+        self._slots = asyncio.Semaphore(max(1, self.config.pipeline_depth))
+        self._owner_task = asyncio.create_task(self._owner_loop(), name=f"serial-owner-{self.config.port}")
+        self.is_connected = True
+        return True
+
+    async def disconnect(self, owner: Hashable = None) -> bool:
+        """断开串口连接（最后一个使用者断开时才真正关闭）"""
+        self._owners.discard(owner)
+        if self._owners:
+            return True
+        await self._shutdown(ConnectionError(f"串口 {self.config.port} 已关闭"))
+        return True
+
+    async def _shutdown(self, error: Exception):
+        """停止所有者任务，未完成的命令以 error 结束，关闭串口"""
+        self.is_connected = False
+        if self._owner_task:
+            self._owner_task.cancel()
+            try:
+                await self._owner_task
+            except asyncio.CancelledError:
+                pass
+            self._owner_task = None
+
+        self._fail_in_flight(error)
+        while self._queue is not None and not self._queue.empty():
+            _, _, command = self._queue.get_nowait()
+            if not command.future.done():
+                command.future.set_exception(error)
+
+        if self.connection:
+            await self.connection.close()
+            self.connection = None
+
+    # ============= 命令队列 =============
+
+    async def request(self, data: bytes, timeout: Optional[float] = None,
+                      priority: int = CommandPriority.CONTROL,
+                      match: Optional[Callable[[bytes], bool]] = None,
+                      expect_response: bool = True) -> Optional[bytes]:
+        """
+        提交命令并等待响应
+
+        Args:
+            data: 完整命令帧
+            timeout: 发出后等待响应的超时（秒），默认 config.timeout
+            priority: 命令优先级（CommandPriority）
+            match: 额外的响应匹配条件，与协议的 matches 同时满足才算该命令的响应
+            expect_response: False 时发出即完成
+
+        Returns:
+            响应帧；超时返回 None
+        """
+        if not self.is_connected:
+            raise ConnectionError(f"串口 {self.config.port} 未连接")
+
+        future = asyncio.get_running_loop().create_future()
+        command = _SerialCommand(data, self.config.timeout if timeout is None else timeout,
+                                 int(priority), match, expect_response, future)
+        self._queue.put_nowait((command.priority, next(self._seq), command))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        self.commands += 1
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # 调用方取消：未发送的命令在所有者任务中跳过
+            future.cancel()
+            raise
+
+    async def _owner_loop(self):
+        """所有者任务：按优先级取命令、占用流水线槽位、写入串口"""
+        while True:
+            await self._slots.acquire()
+            _, _, command = await self._queue.get()
+            if command.future.done():
+                self._slots.release()
+                continue
+
+            self.queue_wait.record(time.perf_counter() - command.enqueued_at)
+            if not self._in_flight:
+                # 没有等待中的命令，丢弃残留的半帧
+                self.connection.clear_input()
+            try:
+                await self.connection.write(command.data)
+            except Exception as e:
+                self._record_error(e)
+                if not command.future.done():
+                    command.future.set_exception(e)
+                self._slots.release()
+                continue
+
+            command.sent_at = time.perf_counter()
+            if not command.expect_response:
+                command.future.set_result(b"")
+                self._slots.release()
+                continue
+
+            self._in_flight.append(command)
+            command.timer = asyncio.get_running_loop().call_later(
+                command.timeout, self._on_timeout, command)
+
+    def _finish(self, command: _SerialCommand):
+        if command.timer:
+            command.timer.cancel()
+        try:
+            self._in_flight.remove(command)
+        except ValueError:
+            return
+        self._slots.release()
+
+    def add_frame_listener(self, listener: Callable[[bytes, float], None]):
+        """
+        注册帧监听器：每个有效帧到达时以 (帧, 到达时的Unix时间) 调用，
+        在读回调中同步执行（时间戳不受事件循环调度延迟影响），不影响命令的响应匹配
+        """
+        if listener not in self._frame_listeners:
+            self._frame_listeners.append(listener)
+
+    def remove_frame_listener(self, listener: Callable[[bytes, float], None]):
+        if listener in self._frame_listeners:
+            self._frame_listeners.remove(listener)
+
+    def _on_frame(self, frame: bytes):
+        if not self.protocol.validate_frame(frame):
+            self.invalid_frames += 1
+            return
+        if self._frame_listeners:
+            received_at = time.time()
+            for listener in list(self._frame_listeners):
+                try:
+                    listener(frame, received_at)
+                except Exception as e:
+                    logger.error(f"串口 {self.config.port} 帧监听器出错: {e}")
+        for command in self._in_flight:
+            if self.protocol.matches(command.data, frame) and (command.match is None or command.match(frame)):
+                self._finish(command)
+                self.responses += 1
+                self.latency.record(time.perf_counter() - command.sent_at)
+                if not command.future.done():
+                    command.future.set_result(frame)
+                return
+        # 没有等待的命令，或者是超时命令迟到的响应
+        self.unsolicited += 1
+        self._unsolicited.append(frame)
+        self._unsolicited_event.set()
+
+    def _on_timeout(self, command: _SerialCommand):
+        if command not in self._in_flight:
+            return
+        self._finish(command)
+        self.timeouts += 1
+        logger.warning(f"串口 {self.config.port} 命令超时: {command.data!r}")
+        if not command.future.done():
+            command.future.set_result(None)
+
+    def _on_lost(self, exc: Exception):
+        self.is_connected = False
+        # 连接中断后各设备需重新connect，使用者从零开始计
+        self._owners.clear()
+        self._record_error(exc)
+        self._fail_in_flight(ConnectionError(f"串口 {self.config.port} 连接中断: {exc}"))
+
+    def _fail_in_flight(self, error: Exception):
+        while self._in_flight:
+            command = self._in_flight[0]
+            self._finish(command)
+            if not command.future.done():
+                command.future.set_exception(error)
+
+    def _record_error(self, exc: Exception):
+        self.errors += 1
+        self.last_error = str(exc)
+
+    # ============= 兼容接口 =============
+
+    async def write(self, data: bytes) -> bool:
+        """发送数据（不等待响应）"""
+        try:
+            await self.request(data, expect_response=False)
+            return True
+        except Exception as e:
+            logger.error(f"串口 {self.config.port} 发送失败: {e}")
+            return False
+
+    async def read(self, size: int = 1024) -> bytes:
+        """读取未请求的数据帧（最多 size 字节），超时返回空"""
+        if not self._unsolicited:
+            self._unsolicited_event.clear()
+            try:
+                await asyncio.wait_for(self._unsolicited_event.wait(), self.config.timeout)
+            except asyncio.TimeoutError:
+                return b""
+        data = bytearray()
+        while self._unsolicited and len(data) + len(self._unsolicited[0]) <= size:
+            data.extend(self._unsolicited.popleft())
+        return bytes(data)
+
+    async def write_read(self, command: bytes, response_size: int = 1024) -> bytes:
+        """发送命令并读取响应"""
+        response = await self.request(command)
+        return (response or b"")[:response_size]
+
+    def is_open(self) -> bool:
+        """检查串口是否打开"""
+        return self.is_connected
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """端口的队列、延迟和错误统计"""
+        return {
+            "port": self.config.port,
+            "baudrate": self.config.baudrate,
+            "protocol": self.protocol.name,
+            "is_connected": self.is_connected,
+            "users": len(self._owners),
+            "pipeline_depth": self.config.pipeline_depth,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": len(self._in_flight),
+            "commands": self.commands,
+            "responses": self.responses,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "unsolicited": self.unsolicited,
+            "invalid_frames": self.invalid_frames,
+            "last_error": self.last_error,
+            "latency": self.latency.to_dict(),
+            "queue_wait": self.queue_wait.to_dict(),
+            "transport": self.connection.get_stats() if self.connection else None,
+        }
+
+
+# 端口路径 -> SerialPort，同一物理串口只有一个所有者
+_ports: Dict[str, SerialPort] = {}
+
+
+def get_serial_port(config: SerialConfig, protocol: Optional[SerialProtocol] = None) -> SerialPort:
+    """获取（必要时创建）端口共享的 SerialPort"""
+    port = _ports.get(config.port)
+    if port is None:
+        port = SerialPort(config, protocol)
+        _ports[config.port] = port
+    return port
+
+
+def get_serial_metrics() -> Dict[str, Dict[str, Any]]:
+    """所有已创建串口的统计"""
+    return {name: port.get_metrics() for name, port in _ports.items()}
+
+
+__all__ = [
+    'SerialConfig',
+    'CommandPriority',
+    'SerialPort',
+    'SerialProtocol',
+    'DetectorProtocol',
+    'ModbusRTUProtocol',
+    'PumpProtocol',
+    'get_serial_port',
+    'get_serial_metrics',
+]
@@ -0,0 +1,382 @@
+"""
+异步串口传输
+Asyncio Serial Transport
+
+把 pyserial 串口以非阻塞方式接入事件循环：读通过 loop.add_reader 在数据到达时回调，
+写不完的部分通过 loop.add_writer 继续发送，等待响应期间不占用事件循环。
+收到的字节经分帧器（默认按行）切分成完整帧，再按请求/响应匹配交给等待中的请求；
+不属于当前请求的帧交给 on_frame 回调（SerialPort 在此做多命令的响应匹配），没有回调时计为未请求帧。
+
+事件循环不支持 add_reader 时（如 Windows Proactor），退回到后台读线程。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import serial
+
+from utils.latency_histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+
+class LineFramer:
+    """按行分帧：遇到 \\r 或 \\n 结束一帧，空行忽略"""
+
+    def __init__(self, terminators: bytes = b"\r\n", max_length: int = 4096):
+        self.terminators = terminators
+        self.max_length = max_length
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        frames = []
+        for byte in data:
+            if byte in self.terminators:
+                if self._buffer:
+                    frames.append(bytes(self._buffer))
+                    self._buffer.clear()
+            else:
+                self._buffer.append(byte)
+                if len(self._buffer) > self.max_length:
+                    # 超长且没有结束符，丢弃避免无限增长
+                    logger.warning(f"串口帧超过 {self.max_length} 字节仍未结束，已丢弃")
+                    self._buffer.clear()
+        return frames
+
+    def reset(self):
+        self._buffer.clear()
+
+
+class AckLineFramer(LineFramer):
+    """单字节应答 + 按行分帧：帧首为应答字节（如泵的 '#'）时立即成帧，其余按行"""
+
+    def __init__(self, ack: bytes = b"#", terminators: bytes = b"\r\n", max_length: int = 4096):
+        super().__init__(terminators, max_length)
+        self.ack = ack[0]
+
+    def feed(self, data: bytes) -> List[bytes]:
+        frames = []
+        for byte in data:
+            if byte == self.ack and not self._buffer:
+                frames.append(bytes((byte,)))
+            else:
+                frames.extend(super().feed(bytes((byte,))))
+        return frames
+
+
+class ModbusRTUFramer:
+    """
+    Modbus RTU 响应分帧：按功能码确定帧长
+    - 0x01~0x04 读响应: 地址 功能码 字节数 数据 CRC(2)
+    - 0x05/0x06/0x0F/0x10 写响应: 固定8字节
+    - 异常响应（功能码最高位为1）: 固定5字节
+    无法识别的功能码丢弃一个字节重新同步。
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    @staticmethod
+    def _frame_length(buffer: bytearray) -> Optional[int]:
+        if len(buffer) < 2:
+            return None
+        function = buffer[1]
+        if function & 0x80:
+            return 5
+        if function in (0x01, 0x02, 0x03, 0x04):
+            return buffer[2] + 5 if len(buffer) >= 3 else None
+        if function in (0x05, 0x06, 0x0F, 0x10):
+            return 8
+        return 0
+
+    def feed(self, data: bytes) -> List[bytes]:
+        self._buffer.extend(data)
+        frames = []
+        while True:
+            length = self._frame_length(self._buffer)
+            if length is None or len(self._buffer) < length:
+                break
+            if length == 0:
+                del self._buffer[0]
+                continue
+            frames.append(bytes(self._buffer[:length]))
+            del self._buffer[:length]
+        return frames
+
+    def reset(self):
+        self._buffer.clear()
+
+
+class _PendingRequest:
+    __slots__ = ("future", "match")
+
+    def __init__(self, future: asyncio.Future, match: Optional[Callable[[bytes], bool]]):
+        self.future = future
+        self.match = match
+
+
+class AsyncSerialTransport:
+    """事件循环驱动的串口读写，一次一个请求，按帧匹配响应"""
+
+    def __init__(self, port: str, baudrate: int,
+                 bytesize: int = serial.EIGHTBITS,
+                 parity: str = serial.PARITY_NONE,
+                 stopbits: float = serial.STOPBITS_ONE,
+                 framer: Optional[Any] = None,
+                 on_frame: Optional[Callable[[bytes], None]] = None):
+        self.port = port
+        self.baudrate = baudrate
+        self.bytesize = bytesize
+        self.parity = parity
+        self.stopbits = stopbits
+        self.framer = framer or LineFramer()
+        self.on_frame = on_frame
+
+        self._serial: Optional[serial.Serial] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._fd: Optional[int] = None
+        self._reader_thread: Optional[threading.Thread] = None
+        self._write_buffer = bytearray()
+        self._write_waiters: List[asyncio.Future] = []
+        self._request_lock = asyncio.Lock()
+        self._pending: Optional[_PendingRequest] = None
+        self._closed = True
+        self.on_lost: Optional[Callable[[Exception], None]] = None
+        self.last_error: Optional[str] = None
+
+        # 统计信息
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.frames_in = 0
+        self.requests = 0
+        self.timeouts = 0
+        self.unsolicited = 0
+        self.latency = LatencyHistogram()
+        self.recent_unsolicited: Deque[bytes] = deque(maxlen=20)
+
+    @property
+    def is_open(self) -> bool:
+        return not self._closed and self._serial is not None and self._serial.is_open
+
+    async def open(self) -> bool:
+        """打开串口并注册到事件循环"""
+        if self.is_open:
+            return True
+        self._loop = asyncio.get_running_loop()
+        try:
+            # timeout=0/write_timeout=0：读写都不阻塞
+            self._serial = serial.Serial(
+                port=self.port,
+                baudrate=self.baudrate,
+                bytesize=self.bytesize,
+                parity=self.parity,
+                stopbits=self.stopbits,
+                timeout=0,
+                write_timeout=0,
+                xonxoff=False,
+                rtscts=False,
+                dsrdtr=False
+            )
+        except Exception as e:
+            logger.error(f"打开串口 {self.port} 失败: {e}")
+            self._serial = None
+            return False
+
+        self._closed = False
+        self.framer.reset()
+        try:
+            self._fd = self._serial.fileno()
+            self._loop.add_reader(self._fd, self._on_readable)
+        except (AttributeError, NotImplementedError, ValueError):
+            # 不支持 fd 读回调：后台线程阻塞读，结果投递回事件循环
+            self._fd = None
+            self._serial.timeout = 0.1
+            self._serial.write_timeout = None
+            self._reader_thread = threading.Thread(
+                target=self._reader_thread_main, name=f"serial-reader-{self.port}", daemon=True)
+            self._reader_thread.start()
+        logger.info(f"串口 {self.port} 已打开 ({self.baudrate})")
+        return True
+
+    async def close(self):
+        """关闭串口，取消等待中的请求和写入"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._fd is not None and self._loop is not None:
+            self._loop.remove_reader(self._fd)
+            self._loop.remove_writer(self._fd)
+        self._fail_waiters(ConnectionError(f"串口 {self.port} 已关闭"))
+        if self._serial is not None:
+            try:
+                self._serial.close()
+            except Exception as e:
+                logger.debug(f"关闭串口 {self.port} 出错: {e}")
+        if self._reader_thread is not None:
+            await asyncio.to_thread(self._reader_thread.join, 1.0)
+            self._reader_thread = None
+        self._fd = None
+        logger.info(f"串口 {self.port} 已关闭")
+
+    # ============= 读 =============
+
+    def _on_readable(self):
+        try:
+            data = self._serial.read(self._serial.in_waiting or 1)
+        except Exception as e:
+            logger.error(f"读取串口 {self.port} 失败: {e}")
+            self._on_lost(e)
+            return
+        if data:
+            self._on_data(data)
+
+    def _reader_thread_main(self):
+        while not self._closed:
+            try:
+                data = self._serial.read(self._serial.in_waiting or 1)
+            except Exception as e:
+                if not self._closed:
+                    self._loop.call_soon_threadsafe(self._on_lost, e)
+                return
+            if data:
+                self._loop.call_soon_threadsafe(self._on_data, data)
+
+    def _on_data(self, data: bytes):
+        self.bytes_in += len(data)
+        for frame in self.framer.feed(data):
+            self.frames_in += 1
+            self._dispatch(frame)
+
+    def _dispatch(self, frame: bytes):
+        pending = self._pending
+        if pending is not None and not pending.future.done() and (pending.match is None or pending.match(frame)):
+            pending.future.set_result(frame)
+            return
+        if self.on_frame:
+            try:
+                self.on_frame(frame)
+            except Exception as e:
+                logger.error(f"处理串口帧出错: {e}")
+            return
+        # 没有等待的请求，或者是超时请求迟到的响应
+        self.unsolicited += 1
+        self.recent_unsolicited.append(frame)
+
+    def _on_lost(self, exc: Exception):
+        """设备断开等读错误：停止读回调，唤醒等待者"""
+        self.last_error = str(exc)
+        if self._fd is not None and self._loop is not None:
+            self._loop.remove_reader(self._fd)
+            self._loop.remove_writer(self._fd)
+        self._closed = True
+        self._fail_waiters(ConnectionError(f"串口 {self.port} 连接中断: {exc}"))
+        if self.on_lost:
+            self.on_lost(exc)
+
+    def _fail_waiters(self, exc: Exception):
+        if self._pending is not None and not self._pending.future.done():
+            self._pending.future.set_exception(exc)
+        for waiter in self._write_waiters:
+            if not waiter.done():
+                waiter.set_exception(exc)
+        self._write_waiters.clear()
+        self._write_buffer.clear()
+
+    def clear_input(self):
+        """丢弃尚未组成完整帧的输入（相当于 reset_input_buffer）"""
+        self.framer.reset()
+
+    # ============= 写 =============
+
+    async def write(self, data: bytes):
+        """写入数据，等到全部交给驱动为止"""
+        if not self.is_open:
+            raise ConnectionError(f"串口 {self.port} 未打开")
+        self.bytes_out += len(data)
+
+        if self._fd is None:
+            # 读线程模式：写入放到线程池
+            await asyncio.to_thread(self._serial.write, data)
+            return
+
+        if not self._write_buffer:
+            written = self._serial.write(data) or 0
+            if written >= len(data):
+                return
+            data = data[written:]
+            self._loop.add_writer(self._fd, self._on_writable)
+        self._write_buffer.extend(data)
+        waiter = self._loop.create_future()
+        self._write_waiters.append(waiter)
+        await waiter
+
+    def _on_writable(self):
+        try:
+            written = self._serial.write(bytes(self._write_buffer)) or 0
+        except Exception as e:
+            logger.error(f"写入串口 {self.port} 失败: {e}")
+            self._on_lost(e)
+            return
+        del self._write_buffer[:written]
+        if not self._write_buffer:
+            self._loop.remove_writer(self._fd)
+            for waiter in self._write_waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+            self._write_waiters.clear()
+
+    # ============= 请求/响应 =============
+
+    async def request(self, data: bytes, timeout: float = 1.0,
+                      match: Optional[Callable[[bytes], bool]] = None) -> Optional[bytes]:
+        """
+        发送请求并等待匹配的响应帧
+
+        Args:
+            data: 要发送的字节
+            timeout: 等待响应的超时时间（秒）
+            match: 判断帧是否为本请求响应的函数，为空时接受下一帧
+
+        Returns:
+            响应帧；超时返回 None
+        """
+        async with self._request_lock:
+            if not self.is_open:
+                raise ConnectionError(f"串口 {self.port} 未打开")
+            self.requests += 1
+            self.clear_input()
+            future = self._loop.create_future()
+            self._pending = _PendingRequest(future, match)
+            started = time.perf_counter()
+            try:
+                await self.write(data)
+                frame = await asyncio.wait_for(future, timeout)
+                self.latency.record(time.perf_counter() - started)
+                return frame
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                return None
+            finally:
+                self._pending = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "port": self.port,
+            "is_open": self.is_open,
+            "mode": "reader_thread" if self._reader_thread is not None else "event_loop",
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "frames_in": self.frames_in,
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "unsolicited": self.unsolicited,
+            "last_error": self.last_error,
+            "latency": self.latency.to_dict(),
+        }
+
+
+__all__ = ['AsyncSerialTransport', 'LineFramer', 'AckLineFramer', 'ModbusRTUFramer']
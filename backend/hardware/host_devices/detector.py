@@ -1,6 +1,12 @@
 """
 检测器控制器
 ttyAMA3接口，波特率57600
+
+连续采集模式：后台任务按设定频率采样，采样连同到达时间写入环形缓冲区，
+消费者通过 read_samples(cursor) 以任意频率批量取回。
+该检测器固件没有主动连续输出数据的命令（ABs 只开始采集，每个采样仍需一条 ABr 读命令），
+串口为严格一问一答，实际采样率上限取决于 ABr 的往返时间，达不到时按实际到达的采样记录，
+get_acquisition_status() 中的 achieved_rate 为实测采样率。设备若主动上报 ABr 帧，同样写入缓冲区。
 """
 
 from typing import Dict, Any, List, Optional
@@ -8,8 +14,11 @@ import asyncio
 import time
 import math
 import random
-import serial
 from datetime import datetime
+from ..drivers.serial_driver import (
+    SerialConfig, SerialPort, DetectorProtocol, CommandPriority, get_serial_port
+)
+from utils.sample_ring import SampleRingBuffer
 # from ..hardware_config import is_mock_mode
 
 
@@ -21,7 +30,7 @@ class DetectorController:
         self.port = port
         self.baudrate = baudrate
         self.mock = mock
-        self.serial_connection = None
+        self.serial_connection: Optional[SerialPort] = None
         self.detection_mode = 'UV'  # UV/荧光/电化学等
         self.is_connected = False
         self.is_detecting = False
@@ -33,60 +42,58 @@ class DetectorController:
         self.wavelength = 254.0  # 保留兼容性
         self.mock_time = 0  # 用于模拟时间进程
 
-    def _open_serial(self) -> bool:
-        """打开串口连接"""
-        try:
-            self.serial_connection = serial.Serial(
-                port=self.port,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=self.timeout,
-                xonxoff=False,
-                rtscts=False,
-                dsrdtr=False
-            )
+        # 连续采集
+        self.sample_ring = SampleRingBuffer()
+        self.is_streaming = False
+        self.sample_rate = 20.0
+        self.acquisition_started_at: Optional[float] = None  # 开始连续采集时的Unix时间
+        self._acquisition_offset = 0.0  # 开始连续采集时已经过的保留时间（秒）
+        self._acquisition_task: Optional[asyncio.Task] = None
+        self._acquisition_first_seq = 0  # 开始连续采集时缓冲区的序号，用于计算实测采样率
+        self.stream_timeouts = 0
+
+    async def _open_serial(self) -> bool:
+        """打开串口连接（共享串口驱动，读写不阻塞）"""
+        self.serial_connection = get_serial_port(
+            SerialConfig(port=self.port, baudrate=self.baudrate, timeout=self.timeout), DetectorProtocol())
+        if await self.serial_connection.connect(self):
             print(f"Successfully connected to serial port {self.port}")
             return True
-        except Exception as e:
-            print(f"Serial connection failed: {str(e)}")
-            return False
+        print(f"Serial connection failed: {self.port}")
+        return False
 
-    def _close_serial(self):
+    async def _close_serial(self):
         """关闭串口连接"""
-        if self.serial_connection and self.serial_connection.is_open:
-            self.serial_connection.close()
+        if self.serial_connection and self.serial_connection.is_connected:
+            await self.serial_connection.disconnect(self)
             print(f"Serial connection to {self.port} closed")
 
-    def _send_command(self, command: str) -> str:
-        """发送命令并接收响应"""
-        if not self.serial_connection or not self.serial_connection.is_open:
+    async def _send_command(self, command: str, expect: Optional[str] = None,
+                            priority: int = CommandPriority.CONTROL,
+                            timeout: Optional[float] = None) -> str:
+        """
+        发送命令并接收响应
+
+        等待响应时让出事件循环；expect 指定响应前缀时，不以该前缀开头的行（如超时命令迟到的响应）被跳过。
+        timeout 默认为 self.timeout。
+        """
+        if not self.serial_connection or not self.serial_connection.is_connected:
             print("Serial connection is not available")
             return ""
 
-        try:
-            # 清空输入缓冲区
-            self.serial_connection.reset_input_buffer()
-
-            # 发送命令
-            full_command = f"#{command}\n\r".encode('utf-8')
-            self.serial_connection.write(full_command)
-
-            # 等待并接收响应
-            time.sleep(0.1)
-            response = ""
-            start_time = time.time()
+        match = None
+        if expect:
+            prefix = expect.encode('utf-8')
+            match = lambda frame: frame.startswith(prefix)
 
-            while time.time() - start_time < self.timeout:
-                if self.serial_connection.in_waiting > 0:
-                    response += self.serial_connection.read(self.serial_connection.in_waiting).decode('utf-8')
-                    if response.endswith('\n') or response.endswith('\r\n'):
-                        break
-                time.sleep(0.01)
-
-            response = response.strip()
-            return response
+        try:
+            full_command = DetectorProtocol.build_command(command)
+            response = await self.serial_connection.request(
+                full_command, self.timeout if timeout is None else timeout, priority, match)
+            if response is None:
+                print(f"Command {command} timed out")
+                return ""
+            return response.decode('utf-8', errors='replace').strip()
 
         except Exception as e:
             print(f"Command execution failed: {str(e)}")
@@ -136,7 +143,7 @@ class DetectorController:
             return True
         else:
             # 实际硬件连接
-            success = self._open_serial()
+            success = await self._open_serial()
             if success:
                 self.is_connected = True
                 # 开灯并开始采集
@@ -150,10 +157,10 @@ class DetectorController:
             return True
 
         # 读取灯状态
-        response = self._send_command('LPr')
+        response = await self._send_command('LPr')
         if response and "F" in response:
             # 灯未开启，开灯
-            light_response = self._send_command('LPwT')
+            light_response = await self._send_command('LPwT')
             return light_response is not None
         return True
     
@@ -193,7 +200,7 @@ class DetectorController:
                 wavelength_a, wavelength_b = int(wavelength[0]), int(wavelength[1])
                 if 190 <= wavelength_a <= 800 and 190 <= wavelength_b <= 800:
                     command = f"WLwA{wavelength_a}B{wavelength_b}"
-                    response = self._send_command(command)
+                    response = await self._send_command(command)
                     if response is not None:
                         # 验证设置是否成功
                         a_val, b_val = await self._read_wavelength_hardware()
@@ -214,7 +221,7 @@ class DetectorController:
                         command = f"WLwA{int(self.wavelength_a)}B{wavelength_val}"
                         target_a, target_b = int(self.wavelength_a), wavelength_val
 
-                    response = self._send_command(command)
+                    response = await self._send_command(command)
                     if response is not None:
                         # 验证设置是否成功
                         a_val, b_val = await self._read_wavelength_hardware()
@@ -232,7 +239,7 @@ class DetectorController:
         if self.mock:
             return int(self.wavelength_a), int(self.wavelength_b)
 
-        response = self._send_command('WLr')
+        response = await self._send_command('WLr', priority=CommandPriority.POLL)
         if response:
             return self._parse_wavelength_data(response)
         return 0, 0
@@ -251,7 +258,7 @@ class DetectorController:
                 return False
 
             # 发送开始采集命令
-            response = self._send_command('ABs')
+            response = await self._send_command('ABs')
             if response is not None:
                 self.is_detecting = True
                 return True
@@ -259,6 +266,7 @@ class DetectorController:
     
     async def stop_detection(self) -> bool:
         """停止检测"""
+        await self.stop_continuous_acquisition()
         if self.mock:
             self.is_detecting = False
             await asyncio.sleep(0.05)
@@ -282,47 +290,183 @@ class DetectorController:
             if not self.is_detecting:
                 return [0.0, 0.0]
 
+            if self.is_streaming:
+                return self._latest_streamed_signal()
+
             # Each call represents one second passed
             self.mock_time += 1
-            t = self.mock_time
-
-            # Baseline drift (slow)
-            baseline = 1 + 0.0005 * t
-
-            # A通道: 三个高斯峰
-            # At 4 min, height 20, width 1 min
-            peak1_a = 20 * math.exp(-((t - 4 * 60) ** 2) / (2 * (60) ** 2))
-            # At 7 min, height 50, width 2.5 min
-            peak2_a = 50 * math.exp(-((t - 7 * 60) ** 2) / (2 * (150) ** 2))
-            # At 12 min, height 30, width 2 min
-            peak3_a = 30 * math.exp(-((t - 12 * 60) ** 2) / (2 * (120) ** 2))
-
-            # B通道: 不同的响应（模拟280nm的不同吸收）
-            # 蛋白质在280nm有更强吸收
-            peak1_b = 20 * math.exp(-((t - 2 * 60) ** 2) / (2 * (60) ** 2))
-            peak2_b = 50 * math.exp(-((t - 12 * 60) ** 2) / (2 * (150) ** 2))  # 蛋白质峰更高
-            peak3_b = 30 * math.exp(-((t - 30 * 60) ** 2) / (2 * (120) ** 2))
-
-            # Small random noise for each channel
-            noise_a = random.gauss(0, 0.2)
-            noise_b = random.gauss(0, 0.15)
-
-            value_a = baseline + peak1_a + peak2_a + peak3_a + noise_a
-            value_b = baseline + peak1_b + peak2_b + peak3_b + noise_b  # B通道基线稍低
-
-            return [round(value_a, 5), round(value_b, 5)]
+            return self._mock_signal(self.mock_time)
         else:
             # 实际硬件模式：从硬件读取信号数据
             if not self.is_detecting:
                 return [0.0, 0.0]
+            if self.is_streaming:
+                # 连续采集中直接返回最新采样，不再额外占用串口
+                return self._latest_streamed_signal()
 
-            # 发送采集数据命令
-            response = self._send_command('ABr')
+            # 发送采集数据命令（响应以命令回显 ABr 开头）
+            response = await self._send_command('ABr', expect='ABr', priority=CommandPriority.POLL)
             if response:
                 a_val, b_val = self._parse_collect_data(response)
                 return [round(a_val, 5), round(b_val, 5)]
             else:
                 return [0.0, 0.0]
+
+    def _mock_signal(self, t: float) -> List[float]:
+        """模拟信号：t 为保留时间（秒）"""
+        # Baseline drift (slow)
+        baseline = 1 + 0.0005 * t
+
+        # A通道: 三个高斯峰
+        # At 4 min, height 20, width 1 min
+        peak1_a = 20 * math.exp(-((t - 4 * 60) ** 2) / (2 * (60) ** 2))
+        # At 7 min, height 50, width 2.5 min
+        peak2_a = 50 * math.exp(-((t - 7 * 60) ** 2) / (2 * (150) ** 2))
+        # At 12 min, height 30, width 2 min
+        peak3_a = 30 * math.exp(-((t - 12 * 60) ** 2) / (2 * (120) ** 2))
+
+        # B通道: 不同的响应（模拟280nm的不同吸收）
+        # 蛋白质在280nm有更强吸收
+        peak1_b = 20 * math.exp(-((t - 2 * 60) ** 2) / (2 * (60) ** 2))
+        peak2_b = 50 * math.exp(-((t - 12 * 60) ** 2) / (2 * (150) ** 2))  # 蛋白质峰更高
+        peak3_b = 30 * math.exp(-((t - 30 * 60) ** 2) / (2 * (120) ** 2))
+
+        # Small random noise for each channel
+        noise_a = random.gauss(0, 0.2)
+        noise_b = random.gauss(0, 0.15)
+
+        value_a = baseline + peak1_a + peak2_a + peak3_a + noise_a
+        value_b = baseline + peak1_b + peak2_b + peak3_b + noise_b  # B通道基线稍低
+
+        return [round(value_a, 5), round(value_b, 5)]
+
+    def _latest_streamed_signal(self) -> List[float]:
+        latest = self.sample_ring.latest()
+        if latest is None:
+            return [0.0, 0.0]
+        return [round(latest[1], 5), round(latest[2], 5)]
+
+    # ============= 连续采集 =============
+
+    async def start_continuous_acquisition(self, sample_rate: float = 20.0) -> bool:
+        """
+        开始连续采集
+        :param sample_rate: 目标采样频率（Hz，0 < sample_rate <= 100）；实际硬件上受 ABr 往返时间限制
+        :return: 是否已开始
+        """
+        if not 0 < sample_rate <= 100:
+            raise ValueError("sample_rate 必须在 (0, 100] Hz 范围内")
+        if not self.is_connected:
+            return False
+        if not self.is_detecting and not await self.start_detection():
+            return False
+
+        self.sample_rate = float(sample_rate)
+        if self.is_streaming:
+            return True
+
+        self.acquisition_started_at = time.time()
+        self._acquisition_offset = float(self.mock_time)
+        self._acquisition_first_seq = self.sample_ring.next_seq
+        self.is_streaming = True
+        if not self.mock:
+            self.serial_connection.add_frame_listener(self._on_stream_frame)
+        self._acquisition_task = asyncio.create_task(self._acquisition_loop())
+        print(f"Detector {self.device_id} continuous acquisition started at {self.sample_rate} Hz")
+        return True
+
+    async def stop_continuous_acquisition(self) -> bool:
+        """停止连续采集（缓冲区中的采样保留，消费者仍可读取）"""
+        if not self.is_streaming:
+            return True
+        self.is_streaming = False
+        if self._acquisition_task:
+            self._acquisition_task.cancel()
+            try:
+                await self._acquisition_task
+            except asyncio.CancelledError:
+                pass
+            self._acquisition_task = None
+        if not self.mock and self.serial_connection:
+            self.serial_connection.remove_frame_listener(self._on_stream_frame)
+        if self.mock:
+            # 之后的逐次调用从当前保留时间继续
+            self.mock_time = int(self.retention_seconds_at(time.time()))
+        print(f"Detector {self.device_id} continuous acquisition stopped")
+        return True
+
+    async def _acquisition_loop(self):
+        """
+        按固定节拍采样；来不及时跳过错过的节拍，不累积
+
+        实际硬件上每个节拍发送一条 ABr，等待响应的超时为一个采样周期：
+        响应丢失只损失这一个采样，不会让采样停顿整个命令超时；迟到的响应仍由帧监听器按到达时间记录。
+        """
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while self.is_streaming:
+            period = 1.0 / self.sample_rate
+            try:
+                if self.mock:
+                    now = time.time()
+                    signal = self._mock_signal(self.retention_seconds_at(now))
+                    self.sample_ring.append(now, signal[0], signal[1])
+                else:
+                    # 响应由帧监听器按到达时间写入缓冲区
+                    response = await self._send_command('ABr', expect='ABr', priority=CommandPriority.POLL,
+                                                        timeout=period)
+                    if not response:
+                        self.stream_timeouts += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Continuous acquisition error: {e}")
+
+            next_tick += period
+            delay = next_tick - loop.time()
+            if delay < 0:
+                next_tick = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+
+    def _on_stream_frame(self, frame: bytes, received_at: float):
+        """串口帧监听器：ABr 数据帧（含设备主动上报的）写入环形缓冲区"""
+        if not frame.startswith(b'ABr'):
+            return
+        a_val, b_val = self._parse_collect_data(frame.decode('utf-8', errors='replace').strip())
+        self.sample_ring.append(received_at, a_val, b_val)
+
+    def retention_seconds_at(self, timestamp: float) -> float:
+        """连续采集中某一时刻对应的保留时间（秒）"""
+        if self.acquisition_started_at is None:
+            return float(self.mock_time)
+        return self._acquisition_offset + max(timestamp - self.acquisition_started_at, 0.0)
+
+    def read_samples(self, cursor: int = 0, max_samples: Optional[int] = None):
+        """
+        读取连续采集的采样
+        :param cursor: 上次返回的 next_cursor（首次传0读取缓冲区中全部采样）
+        :return: (samples, next_cursor, lost)，samples 为 [(unix_time, A, B), ...]
+        """
+        return self.sample_ring.read_since(cursor, max_samples)
+
+    def get_acquisition_status(self) -> Dict[str, Any]:
+        achieved_rate = None
+        if self.is_streaming and self.acquisition_started_at is not None:
+            elapsed = time.time() - self.acquisition_started_at
+            if elapsed > 0:
+                achieved_rate = round((self.sample_ring.next_seq - self._acquisition_first_seq) / elapsed, 2)
+        return {
+            "device_id": self.device_id,
+            "streaming": self.is_streaming,
+            "sample_rate": self.sample_rate,
+            "achieved_rate": achieved_rate,
+            "started_at": self.acquisition_started_at,
+            "buffered": len(self.sample_ring),
+            "capacity": self.sample_ring.capacity,
+            "next_cursor": self.sample_ring.next_seq,
+            "timeouts": self.stream_timeouts,
+        }
     
     async def get_spectrum(self) -> List[Dict[str, float]]:
         """获取光谱数据"""
@@ -419,6 +563,7 @@ class DetectorController:
     async def disconnect(self) -> bool:
         """断开连接"""
         if self.mock:
+            await self.stop_continuous_acquisition()
             self.is_connected = False
             self.is_detecting = False
             await asyncio.sleep(0.1)
@@ -429,7 +574,7 @@ class DetectorController:
                 if self.is_detecting:
                     await self.stop_detection()
 
-                self._close_serial()
+                await self._close_serial()
                 self.is_connected = False
                 self.is_detecting = False
                 await asyncio.sleep(0.1)
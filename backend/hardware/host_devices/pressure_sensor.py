@@ -6,8 +6,10 @@ ttyAMA0接口，波特率9600
 from typing import Dict, Any, Optional
 import asyncio
 import time
-import serial
 from ..hardware_config import MockDataGenerator, is_mock_mode
+from ..drivers.serial_driver import (
+    SerialConfig, SerialPort, ModbusRTUProtocol, CommandPriority, get_serial_port
+)
 
 
 class PressureSensor:
@@ -18,7 +20,7 @@ class PressureSensor:
         self.port = f'/dev/{port}' if not port.startswith('/dev/') else port
         self.baudrate = baudrate
         self.mock = mock if mock is not None else is_mock_mode(self.device_id)
-        self.connection = None
+        self.connection: Optional[SerialPort] = None
         self.current_pressure = 0.0
         self.is_connected = False
         self.calibration_offset = 0.0
@@ -33,24 +35,11 @@ class PressureSensor:
             self.current_pressure = MockDataGenerator.generate_pressure()
             return True
         else:
-            # 实际串口连接
-            try:
-                self.connection = serial.Serial(
-                    port=self.port,
-                    baudrate=self.baudrate,
-                    bytesize=serial.EIGHTBITS,
-                    parity=serial.PARITY_NONE,
-                    stopbits=serial.STOPBITS_ONE,
-                    timeout=self.timeout,
-                    xonxoff=False,
-                    rtscts=False,
-                    dsrdtr=False
-                )
-                self.is_connected = True
-                return True
-            except Exception:
-                self.is_connected = False
-                return False
+            # 实际串口连接（共享串口驱动）
+            self.connection = get_serial_port(
+                SerialConfig(port=self.port, baudrate=self.baudrate, timeout=self.timeout), ModbusRTUProtocol())
+            self.is_connected = await self.connection.connect(self)
+            return self.is_connected
 
     async def read_pressure(self) -> float:
         """
@@ -67,7 +56,7 @@ class PressureSensor:
             return self.current_pressure + self.calibration_offset
         else:
             # 实际硬件读取
-            if not self.connection or not self.connection.is_open:
+            if not self.connection or not self.connection.is_connected:
                 raise Exception("传感器未连接")
 
             pressure = await self._read_pressure_sync()
@@ -77,28 +66,14 @@ class PressureSensor:
             else:
                 raise Exception("读取压力值失败")
 
-    def _send_command(self, hex_command: str) -> Optional[str]:
-        """发送命令到传感器"""
-        if not self.connection or not self.connection.is_open:
+    async def _send_command(self, hex_command: str) -> Optional[str]:
+        """发送命令到传感器（响应按 Modbus RTU 帧长和CRC分帧）"""
+        if not self.connection or not self.connection.is_connected:
             return None
 
         try:
             cmd_bytes = bytes.fromhex(hex_command.replace(" ", ""))
-            self.connection.reset_input_buffer()
-            self.connection.write(cmd_bytes)
-            self.connection.flush()
-
-            time.sleep(0.1)
-            response = b""
-            start_time = time.time()
-            while time.time() - start_time < self.timeout:
-                if self.connection.in_waiting > 0:
-                    response += self.connection.read(self.connection.in_waiting)
-                    if len(response) >= 3:
-                        if len(response) >= response[2] + 5:
-                            break
-                time.sleep(0.01)
-
+            response = await self.connection.request(cmd_bytes, self.timeout, CommandPriority.POLL)
             if response:
                 return response.hex().upper()
             return None
@@ -106,9 +81,9 @@ class PressureSensor:
             return None
 
     async def _read_pressure_sync(self) -> Optional[float]:
-        """同步读取压力值"""
-        send_cmd = "01 03 00 00 00 01 84 0A"
-        response_hex = self._send_command(send_cmd)
+        """读取压力值"""
+        send_cmd = ModbusRTUProtocol.build_command('03', [0x01, 0x0000, 0x0001]).hex(' ').upper()
+        response_hex = await self._send_command(send_cmd)
         if not response_hex:
             return None
 
@@ -190,8 +165,8 @@ class PressureSensor:
         else:
             # 实际硬件断开
             try:
-                if self.connection and self.connection.is_open:
-                    self.connection.close()
+                if self.connection and self.connection.is_connected:
+                    await self.connection.disconnect(self)
                 self.is_connected = False
                 return True
             except Exception:
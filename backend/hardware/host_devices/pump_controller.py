@@ -6,8 +6,10 @@ ttyAMA2接口，波特率115200
 from typing import Dict, Any, Optional, List
 import asyncio
 import time
-import serial
 from ..hardware_config import MockDataGenerator, is_mock_mode
+from ..drivers.serial_driver import (
+    SerialConfig, SerialPort, PumpProtocol, CommandPriority, get_serial_port
+)
 
 
 class PumpController:
@@ -19,8 +21,9 @@ class PumpController:
         self.baudrate = baudrate
         self.mock = mock if mock is not None else is_mock_mode(self.device_id)
 
-        # 串口连接
-        self.ser = None
+        # 串口连接（共享串口驱动）
+        self.ser: Optional[SerialPort] = None
+        self.timeout = 1.0
         self.is_connected = False
 
         # 泵状态缓存
@@ -180,7 +183,7 @@ class PumpController:
                 command = b'!FA016'
                 crc = self._calculate_crc(list(command))
                 full_command = command + crc.encode() + b'\n'
-                response = await self._send_command(full_command)
+                response = await self._send_command(full_command, CommandPriority.URGENT)
 
                 if response == b'#':
                     if pump_id:
@@ -231,7 +234,7 @@ class PumpController:
         await self.stop_pump()
 
         # 关闭串口连接
-        self._close_serial_port()
+        await self._close_serial_port()
         return True
 
     async def stop_all_pumps(self) -> bool:
@@ -252,40 +255,26 @@ class PumpController:
         :param data: 要计算CRC的字节列表
         :return: CRC校验码的ASCII字符串表示
         """
-        # 记录缺少几个字符
-        space_count = 12 - len(data)
-
-        while len(data) < 12:
-            data.append(32)
-
-        total = sum(data)
-        crc_value = total % 256
-        crc_ascii = f"{crc_value:03}"
-
-        # 添加相应数量的空格
-        result = ' ' * space_count + crc_ascii
-
-        return result
+        return PumpProtocol.calculate_checksum(bytes(data)).decode('ascii')
 
-    async def _send_command(self, command: bytes) -> bytes:
+    async def _send_command(self, command: bytes, priority: int = CommandPriority.CONTROL) -> bytes:
         """
         发送命令并接收响应（异步版本）
         :param command: 要发送的命令
-        :return: 设备的响应
+        :param priority: 命令优先级，停泵使用 CommandPriority.URGENT 插到排队的命令之前
+        :return: 设备的响应（'#' 应答或去掉换行的数据行）
         """
         if self.mock:
             # Mock模式返回成功响应
             await asyncio.sleep(0.01)
             return b'#'
 
-        if not self.ser or not self.ser.is_open:
+        if not self.ser or not self.ser.is_connected:
             raise Exception("串口未连接")
 
         try:
-            # 使用asyncio.to_thread让串口操作异步化
-            await asyncio.to_thread(self.ser.write, command)
-            response = await asyncio.to_thread(self.ser.readline)
-            return response
+            response = await self.ser.request(command, self.timeout, priority)
+            return response or b''
         except Exception as e:
             print(f"串口通信失败: {e}")
             return b''
@@ -299,31 +288,24 @@ class PumpController:
             self.is_connected = True
             return True
 
-        try:
-            self.ser = serial.Serial(
-                self.port,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=1
-            )
+        self.ser = get_serial_port(
+            SerialConfig(port=self.port, baudrate=self.baudrate, timeout=self.timeout), PumpProtocol())
+        if await self.ser.connect(self):
             print(f"成功打开串口 {self.port}")
             self.is_connected = True
             return True
-        except serial.SerialException as e:
-            print(f"无法打开串口 {self.port}: {e}")
-            self.is_connected = False
-            return False
+        print(f"无法打开串口 {self.port}: {self.ser.last_error}")
+        self.is_connected = False
+        return False
 
-    def _close_serial_port(self):
+    async def _close_serial_port(self):
         """关闭串口连接"""
         if self.mock:
             self.is_connected = False
             return
 
-        if self.ser and self.ser.is_open:
-            self.ser.close()
+        if self.ser and self.ser.is_connected:
+            await self.ser.disconnect(self)
             print(f"成功关闭串口 {self.port}")
         self.is_connected = False
 
@@ -216,6 +216,19 @@ async def create_database_schema(db_path: Path):
             )
         ''')
 
+        # 11. 洗脱曲线分块表（检测器双通道信号，按固定点数分块追加写入）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS elution_curve_chunks (
+                history_id VARCHAR(100) NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                point_offset INTEGER NOT NULL,
+                point_count INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (history_id, chunk_index)
+            )
+        ''')
+
         # 创建索引以提高查询性能
         logger.info("创建索引...")
 
@@ -315,6 +328,8 @@ async def main():
     for device in devices:
         logger.info(f"  - {device['device_id']}: {device['device_name']} ({device['device_type']})")
 
+    await db_manager.close()
+
     logger.info("\n" + "=" * 60)
     logger.info("数据库初始化完成!")
     logger.info("数据库路径: " + str(db_path))
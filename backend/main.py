@@ -25,9 +25,11 @@ logging.basicConfig(
     ]
 )
 
-from core.mqtt_manager import MQTTManager
-from core.database import DatabaseManager
+from core.mqtt_manager import create_mqtt_manager
+from core.database import get_db
+from data.connection_pool import close_all_pools
 from services.data_processor.host_devices_processor import HostDevicesProcessor
+from services.data_processor.mqtt_publisher import MQTTPublisher
 from api import device_control,data_collection,system_management,chromatography,hardware_control
 from api import main_router
 
@@ -36,6 +38,7 @@ from hardware.host_devices.detector import DetectorController
 from hardware.host_devices.pressure_sensor import PressureSensor
 from hardware.host_devices.bubble_sensor import BubbleSensorHost
 from hardware.collect_devices.bubble_sensor_collect import BubbleSensorCollect
+from hardware.drivers.http_driver import network_manager
 
 logger = logging.getLogger(__name__)
 
@@ -43,11 +46,12 @@ logger = logging.getLogger(__name__)
 mqtt_manager = None
 db_manager = None
 host_processor = None
+mqtt_publisher = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    global mqtt_manager, db_manager, host_processor
+    global mqtt_manager, db_manager, host_processor, mqtt_publisher
 
     # 启动时初始化服务
     print("=" * 60)
@@ -55,16 +59,21 @@ async def lifespan(app: FastAPI):
     print("=" * 60)
 
     # 初始化数据库
-    db_manager = DatabaseManager()
-    await db_manager.initialize()
+    # 与API依赖注入共用同一个全局实例，关闭时统一释放aiosqlite连接线程
+    db_manager = await get_db()
+    await db_manager.start_log_sink()
 
     # 创建MQTT管理器
-    mqtt_manager = MQTTManager()
+    mqtt_manager = create_mqtt_manager()
     if await mqtt_manager.connect():
         print("✓ MQTT连接成功")
 
+        # 优先级发布队列（告警/控制/状态/遥测），设备数据都经由它发布
+        mqtt_publisher = MQTTPublisher(mqtt_manager)
+        await mqtt_publisher.start()
+
         # 创建HostDevicesProcessor管理设备数据采集
-        host_processor = HostDevicesProcessor(mqtt_manager)
+        host_processor = HostDevicesProcessor(mqtt_manager, publisher=mqtt_publisher)
 
         # 初始化硬件设备（mock模式）
         detector = DetectorController(mock=True)
@@ -101,7 +110,8 @@ async def lifespan(app: FastAPI):
         print("    ├─ chromatography/detector/{device_id}/channel_a")
         print("    ├─ chromatography/detector/{device_id}/channel_b")
         print("    ├─ chromatography/detector/{device_id}/retention_time")
-        print("    └─ chromatography/detector/{device_id}/full_data")
+        print("    ├─ chromatography/detector/{device_id}/full_data")
+        print("    └─ chromatography/detector/{device_id}/frame  (帧合并模式，PUT /api/data/detector-coalescing)")
         print("  📊 传感器相关:")
         print("    ├─ chromatography/pressure/{device_id}/data")
         print("    ├─ chromatography/pressure/{device_id}/value")
@@ -159,10 +169,24 @@ async def lifespan(app: FastAPI):
                 logger.error(f"断开设备 {device_name} 时出错: {e}")
         print("✓ 设备连接已断开")
 
+    await network_manager.close()
+    print("✓ 收集模块HTTP连接池已关闭")
+
+    if mqtt_publisher:
+        await mqtt_publisher.stop()
+
     if mqtt_manager:
         await mqtt_manager.disconnect()
         print("✓ MQTT连接已断开")
 
+    if db_manager:
+        # 刷新批量写入队列中剩余的日志后再关闭连接
+        await db_manager.close()
+        print("✓ 日志已刷新，数据库连接已关闭")
+
+    close_all_pools()
+    print("✓ 数据库连接池已关闭")
+
     print("✅ 系统已安全关闭")
     print("=" * 60)
 
@@ -230,6 +254,7 @@ async def get_publishing_status():
         return {
             "status": "active" if host_processor.is_running else "stopped",
             "processor_stats": stats,
+            "publisher_stats": mqtt_publisher.get_statistics() if mqtt_publisher else None,
             "timestamp": datetime.now().isoformat()
         }
     else:
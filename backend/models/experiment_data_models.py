@@ -184,13 +184,25 @@ class DataQualityMetrics(BaseModel):
 
 class ProcessingParameters(BaseModel):
     """数据处理参数"""
-    baseline_correction_method: str = "automatic"  # "automatic", "manual", "none"
-    noise_filtering_method: str = "moving_average"  # "moving_average", "gaussian", "none"
+    device_id: Optional[str] = None  # 处理的设备，默认第一个检测器设备
+    baseline_correction: bool = True
+    noise_filtering: bool = True
+    peak_detection: bool = True
+    baseline_correction_method: str = "automatic"  # "automatic"(=moving_average), "moving_average", "rolling_min", "als", "none"
+    noise_filtering_method: str = "moving_average"  # "moving_average", "savitzky_golay", "gaussian", "none"
+    baseline_window_size: int = Field(default=50, ge=1)
+    filter_window_size: int = Field(default=5, ge=1)
+    savgol_polyorder: int = Field(default=2, ge=0)
+    als_lambda: float = Field(default=1e9, gt=0)  # 10Hz采样、峰宽约1分钟时的经验值
+    als_asymmetry: float = Field(default=0.01, gt=0, lt=1)
+    als_iterations: int = Field(default=10, ge=1)
     peak_detection_algorithm: str = "threshold"  # "threshold", "derivative", "wavelet"
     peak_detection_threshold: float = Field(default=0.01, gt=0)
     min_peak_width: float = Field(default=0.1, gt=0)
     max_peak_width: float = Field(default=10.0, gt=0)
     smoothing_window_size: int = Field(default=5, ge=1)
+    min_peak_prominence: Optional[float] = Field(default=None, gt=0)  # 默认按噪声水平自动确定
+    integration_method: str = "trapezoid"  # "trapezoid", "simpson"
     calibration_curve: Optional[Dict[str, float]] = None  # e.g., {"slope": 1.0, "intercept": 0.0}
     user_notes: Optional[str] = None
 
@@ -3,11 +3,13 @@
 Experiment function models
 """
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_serializer
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 from enum import Enum
 
+from utils.signal_buffer import DetectorSignalBuffer
+
 
 class ExperimentPhase(str, Enum):
     """实验阶段枚举"""
@@ -59,7 +61,7 @@ class ExperimentProgress(BaseModel):
     experiment_start_timestamp: float = 0.0  # 实验开始的绝对时间戳
 
     # 检测器信号数据收集字段
-    detector_signal_cache: List[List[float]] = Field(default_factory=list)  # [[1.73427, 2.61003], [1.8, 2.5], ...]
+    detector_signal_cache: DetectorSignalBuffer = Field(default_factory=DetectorSignalBuffer)  # [[1.73427, 2.61003], [1.8, 2.5], ...]
     signal_collection_active: bool = False  # 是否正在收集信号数据
 
     # 暂停恢复时间管理字段
@@ -69,6 +71,11 @@ class ExperimentProgress(BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
+    @field_serializer('detector_signal_cache')
+    def serialize_detector_signal_cache(self, cache: DetectorSignalBuffer) -> List[List[float]]:
+        """序列化时保持 [[signal_a, signal_b], ...] 格式"""
+        return cache.tolist()
+
 
 class ExperimentControl(BaseModel):
     """实验控制模型"""
@@ -2,9 +2,10 @@
 监听MQTT双通道检测器数据
 """
 import paho.mqtt.client as mqtt
-import json
 from datetime import datetime
 
+from core.mqtt_codecs import decode_payload
+
 def on_connect(client, userdata, flags, rc):
     print(f"连接MQTT: {'成功' if rc == 0 else f'失败({rc})'}")
     # 订阅所有检测器相关主题
@@ -25,12 +26,8 @@ def on_connect(client, userdata, flags, rc):
 def on_message(client, userdata, msg):
     topic = msg.topic
     try:
-        # 解析消息
-        payload = msg.payload.decode('utf-8')
-        try:
-            data = json.loads(payload)
-        except:
-            data = payload
+        # 解析消息（按消息头部识别二进制编码，否则按JSON/文本解析）
+        data = decode_payload(msg.payload)
 
         timestamp = datetime.now().strftime('%H:%M:%S')
 
@@ -11,6 +11,7 @@ from typing import Optional
 
 from core.mqtt_manager import MQTTManager
 from .mqtt_publisher import MQTTPublisher
+from .priority_publish_queue import PublishPriority, OverflowPolicy, PriorityClassConfig
 from .host_devices_processor import HostDevicesProcessor
 from .collect_devices_processor import CollectDevicesProcessor
 from .device_data_collector import DeviceDataCollector
@@ -412,6 +413,9 @@ class DataProcessor:
 __all__ = [
     'DataProcessor',
     'MQTTPublisher',
+    'PublishPriority',
+    'OverflowPolicy',
+    'PriorityClassConfig',
     'HostDevicesProcessor',
     'CollectDevicesProcessor',
     'DeviceDataCollector',
@@ -0,0 +1,180 @@
+"""
+变化发布（死区）过滤
+Deadband / Report-by-Exception Filter
+
+按主题过滤器配置规则，只有数值变化超过死区（绝对值或相对值）、状态量发生变化，
+或距上次发布超过心跳间隔时才发布。比较对象是上一次实际发布的值，缓慢漂移累计超过死区后也会发布。
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from core.topic_router import TopicRouter
+
+# 不参与比较的字段（每次都会变化）
+DEFAULT_IGNORED_FIELDS = ("timestamp",)
+
+
+@dataclass
+class DeadbandRule:
+    """
+    死区规则
+
+    - absolute: 数值变化超过该绝对值时发布（0表示不按绝对值判断）
+    - relative: 数值变化超过上次发布值的该比例时发布（0表示不按相对值判断）
+      absolute 和 relative 都为0时，数值有任何变化即发布
+    - heartbeat: 最长发布间隔（秒），到期即使没有变化也发布
+    - fields: 参与比较的字段（嵌套字段用 "a.b" 表示），为空时比较全部字段
+    """
+    absolute: float = 0.0
+    relative: float = 0.0
+    heartbeat: float = 10.0
+    fields: Optional[Tuple[str, ...]] = None
+
+
+# 默认规则：压力和泵的数值按 0.01 或 1% 死区；气泡、继电器状态只在变化时发布
+DEFAULT_RULES: Dict[str, DeadbandRule] = {
+    "chromatography/pressure/+/data": DeadbandRule(absolute=0.01, relative=0.01, fields=("pressure",)),
+    "chromatography/pressure/+/value": DeadbandRule(absolute=0.01, relative=0.01, fields=("pressure",)),
+    "chromatography/bubble/+/+": DeadbandRule(fields=("bubble_detected", "status", "location")),
+    "chromatography/pump/+/status": DeadbandRule(absolute=0.01, relative=0.01),
+    "chromatography/relay/+/status": DeadbandRule(),
+}
+
+
+def _flatten(data: Any, prefix: str = "", ignored: Tuple[str, ...] = DEFAULT_IGNORED_FIELDS) -> Dict[str, Any]:
+    """把嵌套字典/列表展开为 {"a.b": 值}"""
+    if isinstance(data, dict):
+        items = data.items()
+    elif isinstance(data, (list, tuple)):
+        items = enumerate(data)
+    else:
+        return {prefix or "value": data}
+
+    flat: Dict[str, Any] = {}
+    for key, value in items:
+        if key in ignored:
+            continue
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, (dict, list, tuple)):
+            flat.update(_flatten(value, name, ignored))
+        else:
+            flat[name] = value
+    return flat
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class DeadbandFilter:
+    """按主题的变化发布过滤器"""
+
+    def __init__(self, rules: Optional[Dict[str, DeadbandRule]] = None, enabled: bool = True):
+        self.enabled = enabled
+        self._router = TopicRouter()
+        self._rules: Dict[str, DeadbandRule] = {}
+        # 主题 -> (上次发布的展开值, 上次发布时间)
+        self._last: Dict[str, Tuple[Dict[str, Any], float]] = {}
+
+        # 统计信息
+        self.published = 0
+        self.suppressed = 0
+        self.heartbeats = 0
+
+        for topic_filter, rule in (DEFAULT_RULES if rules is None else rules).items():
+            self.set_rule(topic_filter, rule)
+
+    def set_rule(self, topic_filter: str, rule: DeadbandRule):
+        """设置主题过滤器（支持 +/# 通配符）的死区规则"""
+        previous = self._rules.get(topic_filter)
+        if previous is not None:
+            self._router.remove(topic_filter, previous)
+        self._rules[topic_filter] = rule
+        self._router.add(topic_filter, rule)
+
+    def remove_rule(self, topic_filter: str):
+        if self._rules.pop(topic_filter, None) is not None:
+            self._router.remove(topic_filter)
+
+    def rule_for(self, topic: str) -> Optional[DeadbandRule]:
+        matched = self._router.match(topic)
+        return matched[0] if matched else None
+
+    def should_publish(self, topic: str, data: Any, now: Optional[float] = None) -> bool:
+        """判断是否需要发布；返回True时记录为该主题最近一次发布的值"""
+        if not self.enabled:
+            return True
+        rule = self.rule_for(topic)
+        if rule is None:
+            return True
+
+        now = time.monotonic() if now is None else now
+        values = _flatten(data)
+        if rule.fields:
+            values = {name: values.get(name) for name in rule.fields}
+
+        last = self._last.get(topic)
+        if last is None:
+            publish = True
+        elif now - last[1] >= rule.heartbeat:
+            publish = True
+            if not self._changed(rule, last[0], values):
+                self.heartbeats += 1
+        else:
+            publish = self._changed(rule, last[0], values)
+
+        if publish:
+            self._last[topic] = (values, now)
+            self.published += 1
+        else:
+            self.suppressed += 1
+        return publish
+
+    @staticmethod
+    def _changed(rule: DeadbandRule, previous: Dict[str, Any], current: Dict[str, Any]) -> bool:
+        if previous.keys() != current.keys():
+            return True
+        for name, value in current.items():
+            old = previous[name]
+            if _is_number(value) and _is_number(old):
+                delta = abs(value - old)
+                if rule.absolute <= 0 and rule.relative <= 0:
+                    if delta > 0:
+                        return True
+                elif ((rule.absolute > 0 and delta > rule.absolute)
+                      or (rule.relative > 0 and delta > rule.relative * abs(old))):
+                    return True
+            elif value != old:
+                # 状态量（布尔、字符串等）变化
+                return True
+        return False
+
+    def reset(self, topic: Optional[str] = None):
+        """清除记录的发布值，下一次必定发布"""
+        if topic:
+            self._last.pop(topic, None)
+        else:
+            self._last.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "rules": {
+                topic_filter: {
+                    "absolute": rule.absolute,
+                    "relative": rule.relative,
+                    "heartbeat": rule.heartbeat,
+                    "fields": list(rule.fields) if rule.fields else None,
+                }
+                for topic_filter, rule in self._rules.items()
+            },
+            "tracked_topics": len(self._last),
+            "published": self.published,
+            "suppressed": self.suppressed,
+            "heartbeats": self.heartbeats,
+        }
+
+
+__all__ = ['DeadbandRule', 'DeadbandFilter', 'DEFAULT_RULES']
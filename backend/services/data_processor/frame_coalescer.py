@@ -0,0 +1,132 @@
+"""
+检测器数据帧合并
+Detector Frame Coalescer
+
+把同一检测器的多个采样合并为一条帧消息发布到单一主题，
+采样数达到上限或时间窗口到期时输出一帧；波长等变化缓慢的字段只在变化时输出。
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class DetectorFrameConfig:
+    """帧合并配置"""
+    enabled: bool = False          # 是否启用帧合并（关闭时逐采样发布 signal/retention_time）
+    max_samples: int = 10          # 每帧最多采样数
+    max_interval: float = 1.0      # 每帧最长时间窗口（秒），到期即使未满也输出
+    retain_static: bool = True     # 波长等静态字段以retained消息发布
+
+
+class _PendingFrame:
+    __slots__ = ("started_at", "timestamps", "signals", "retention_times")
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.timestamps: List[float] = []
+        self.signals: List[List[float]] = []
+        self.retention_times: List[float] = []
+
+
+class DetectorFrameCoalescer:
+    """
+    按检测器合并采样
+
+    - add(): 加入一个采样，返回 (已满的帧, 变化后的波长)
+    - flush_due(): 返回时间窗口已到期的帧
+    - flush(): 立即输出某个（或全部）检测器的未满帧
+    """
+
+    def __init__(self, config: Optional[DetectorFrameConfig] = None):
+        self.config = config or DetectorFrameConfig()
+        self._pending: Dict[str, _PendingFrame] = {}
+        self._sequence: Dict[str, int] = {}
+        self._last_wavelength: Dict[str, List[Any]] = {}
+
+        # 统计信息
+        self.samples_in = 0
+        self.frames_out = 0
+        self.static_updates = 0
+
+    def add(self, device_id: str, signals: List[float], retention_time: float,
+            wavelength: Optional[List[Any]] = None,
+            now: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], Optional[List[Any]]]:
+        """
+        加入一个采样
+
+        Returns:
+            (frame, wavelength): frame 为已满需要发布的帧（否则None）；
+                                 wavelength 为发生变化需要发布的波长（否则None）
+        """
+        now = time.time() if now is None else now
+        self.samples_in += 1
+
+        changed_wavelength = None
+        if wavelength is not None and self._last_wavelength.get(device_id) != list(wavelength):
+            self._last_wavelength[device_id] = list(wavelength)
+            changed_wavelength = list(wavelength)
+            self.static_updates += 1
+
+        pending = self._pending.get(device_id)
+        if pending is None:
+            pending = self._pending[device_id] = _PendingFrame(now)
+        pending.timestamps.append(round(now, 3))
+        pending.signals.append(list(signals) if isinstance(signals, (list, tuple)) else [signals, 0.0])
+        pending.retention_times.append(round(retention_time, 2))
+
+        frame = None
+        if (len(pending.signals) >= self.config.max_samples
+                or now - pending.started_at >= self.config.max_interval):
+            frame = self._take(device_id)
+        return frame, changed_wavelength
+
+    def flush_due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """输出时间窗口已到期的帧"""
+        now = time.time() if now is None else now
+        due = [device_id for device_id, pending in self._pending.items()
+               if now - pending.started_at >= self.config.max_interval]
+        return [self._take(device_id) for device_id in due]
+
+    def flush(self, device_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """立即输出未满的帧"""
+        device_ids = [device_id] if device_id else list(self._pending)
+        return [self._take(d) for d in device_ids if d in self._pending]
+
+    def _take(self, device_id: str) -> Dict[str, Any]:
+        pending = self._pending.pop(device_id)
+        sequence = self._sequence.get(device_id, 0) + 1
+        self._sequence[device_id] = sequence
+        self.frames_out += 1
+        return {
+            "device_id": device_id,
+            "seq": sequence,
+            "count": len(pending.signals),
+            "timestamps": pending.timestamps,           # 各采样的Unix时间（秒）
+            "signal": pending.signals,                  # [[A, B], ...]
+            "retention_time": pending.retention_times,  # 分钟
+        }
+
+    def reset(self, device_id: Optional[str] = None):
+        """清空未发布数据和波长缓存（重新启用时保证首帧带上波长）"""
+        if device_id:
+            self._pending.pop(device_id, None)
+            self._last_wavelength.pop(device_id, None)
+        else:
+            self._pending.clear()
+            self._last_wavelength.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.config.enabled,
+            "max_samples": self.config.max_samples,
+            "max_interval": self.config.max_interval,
+            "samples_in": self.samples_in,
+            "frames_out": self.frames_out,
+            "static_updates": self.static_updates,
+            "pending_samples": sum(len(p.signals) for p in self._pending.values()),
+        }
+
+
+__all__ = ['DetectorFrameConfig', 'DetectorFrameCoalescer']
@@ -9,6 +9,9 @@ import asyncio
 import logging
 from datetime import datetime
 from .base_processor import BaseProcessor
+from .frame_coalescer import DetectorFrameCoalescer, DetectorFrameConfig
+from .deadband import DeadbandFilter
+from .priority_publish_queue import PublishPriority
 
 logger = logging.getLogger(__name__)
 
@@ -16,9 +19,11 @@ logger = logging.getLogger(__name__)
 class HostDevicesProcessor(BaseProcessor):
     """主机设备数据处理器 - 自主管理数据采集和发布"""
 
-    def __init__(self, mqtt_manager=None):
+    def __init__(self, mqtt_manager=None, publisher=None):
         super().__init__("HostDevicesProcessor")
         self.mqtt_manager = mqtt_manager
+        # 优先级发布队列（MQTTPublisher）；设置后所有发布都经由它排队，告警先于状态和遥测发出
+        self.publisher = publisher
         self.devices = {}  # 存储注册的设备实例
         self.latest_data = {}  # 存储每个设备的最新数据
         self.is_running = False
@@ -28,6 +33,13 @@ class HostDevicesProcessor(BaseProcessor):
         self.collection_interval = 1.0  # 默认1秒采集一次
         self.pressure_publish_interval = 2.0  # 压力传感器2秒发布一次
         self.bubble_publish_interval = 2.0  # 气泡传感器2秒发布一次
+        # 检测器帧合并（默认关闭，保持逐采样发布 signal/retention_time）
+        self.detector_coalescer = DetectorFrameCoalescer(DetectorFrameConfig())
+        # 压力/气泡/泵/继电器等慢变化主题只在变化超过死区或心跳到期时发布
+        self.deadband = DeadbandFilter()
+        # 连续采集检测器的读取位置（环形缓冲区序号）和丢失的采样数
+        self._detector_cursors: Dict[str, int] = {}
+        self.detector_samples_lost = 0
 
     def register_device(self, device_name: str, device_instance):
         """
@@ -77,6 +89,9 @@ class HostDevicesProcessor(BaseProcessor):
             except asyncio.CancelledError:
                 pass
 
+        # 发布未满的检测器数据帧
+        await self._publish_detector_frames(self.detector_coalescer.flush())
+
         logger.info("HostDevicesProcessor数据采集已停止")
         logger.info("压力传感器MQTT发布已停止")
         logger.info("气泡传感器MQTT发布已停止")
@@ -147,8 +162,8 @@ class HostDevicesProcessor(BaseProcessor):
                 # 发布到MQTT
                 if self.mqtt_manager:
                     topic = f"chromatography/pressure/{device_name}/data"
-                    await self.mqtt_manager.publish(topic, pressure_data)
-                    logger.debug(f"发布压力数据: {device_name} -> {pressure_value} MPa")
+                    if await self._publish_on_change(topic, pressure_data, PublishPriority.TELEMETRY):
+                        logger.debug(f"发布压力数据: {device_name} -> {pressure_value} MPa")
 
         except Exception as e:
             logger.error(f"发布压力传感器 {device_name} 数据时出错: {e}")
@@ -215,8 +230,10 @@ class HostDevicesProcessor(BaseProcessor):
                         # 发布到MQTT
                         if self.mqtt_manager:
                             topic = f"chromatography/bubble/{device_name}/{sensor_id}"
-                            await self.mqtt_manager.publish(topic, bubble_data)
-                            logger.debug(f"发布气泡数据: {device_name}/{sensor_id} -> 气泡检测={sensor_data.get('bubble_detected', False)}")
+                            priority = (PublishPriority.EMERGENCY if bubble_data["bubble_detected"]
+                                        else PublishPriority.STATUS)
+                            if await self._publish_on_change(topic, bubble_data, priority):
+                                logger.debug(f"发布气泡数据: {device_name}/{sensor_id} -> 气泡检测={sensor_data.get('bubble_detected', False)}")
 
         except Exception as e:
             logger.error(f"发布气泡传感器 {device_name} 数据时出错: {e}")
@@ -245,11 +262,25 @@ class HostDevicesProcessor(BaseProcessor):
             except Exception as e:
                 logger.error(f"采集设备 {device_name} 数据时出错: {e}")
 
+        # 发布时间窗口已到期的检测器数据帧
+        if self.detector_coalescer.config.enabled:
+            await self._publish_detector_frames(self.detector_coalescer.flush_due())
+
     async def _collect_detector_data(self, device_name: str, detector):
         """采集并发布检测器数据"""
         try:
+            # 连续采集模式：批量取回环形缓冲区中的新采样；采集停止后再取一次剩余采样
+            if getattr(detector, 'is_streaming', False):
+                await self._collect_detector_stream(device_name, detector)
+                return
+            if device_name in self._detector_cursors:
+                await self._collect_detector_stream(device_name, detector)
+                self._detector_cursors.pop(device_name, None)
+
             # 检查设备是否在检测状态
             if not hasattr(detector, 'is_detecting') or not detector.is_detecting:
+                # 检测停止时立即发布该检测器未满的数据帧
+                await self._publish_detector_frames(self.detector_coalescer.flush(device_name))
                 return
 
             # 调用get_signal获取双通道信号
@@ -294,16 +325,31 @@ class HostDevicesProcessor(BaseProcessor):
                 # 存储到最新数据字典
                 self.latest_data[device_name] = detector_data
 
+                # 帧合并模式：N个采样合并为一帧发布，波长仅在变化时以retained消息发布
+                if self.mqtt_manager and self.detector_coalescer.config.enabled:
+                    frame, changed_wavelength = self.detector_coalescer.add(
+                        device_name, signals, retention_time, wavelengths
+                    )
+                    if changed_wavelength is not None:
+                        await self._publish(
+                            f"chromatography/detector/{device_name}/wavelength",
+                            changed_wavelength,
+                            PublishPriority.STATUS,
+                            retain=self.detector_coalescer.config.retain_static
+                        )
+                    if frame is not None:
+                        await self._publish_detector_frames([frame])
+
                 # 只发布信号数据到MQTT（不发布波长和通道数据）
-                if self.mqtt_manager:
+                elif self.mqtt_manager:
                     # 只发布双通道信号 [A, B]
-                    await self.mqtt_manager.publish(
+                    await self._publish(
                         f"chromatography/detector/{device_name}/signal",
                         signals
                     )
 
                     # 发布保留时间
-                    await self.mqtt_manager.publish(
+                    await self._publish(
                         f"chromatography/detector/{device_name}/retention_time",
                         {
                             "retention_time": round(retention_time, 2),
@@ -317,6 +363,157 @@ class HostDevicesProcessor(BaseProcessor):
         except Exception as e:
             logger.error(f"采集检测器 {device_name} 数据时出错: {e}")
 
+    async def _collect_detector_stream(self, device_name: str, detector):
+        """
+        取回连续采集的新采样，按硬件到达时间合并成帧发布到 chromatography/detector/{device}/frame；
+        未启用帧合并时另外以最新采样发布 signal/retention_time，兼容逐采样订阅者
+        """
+        cursor = self._detector_cursors.get(device_name, detector.sample_ring.next_seq)
+        samples, cursor, lost = detector.read_samples(cursor)
+        self._detector_cursors[device_name] = cursor
+        if lost:
+            self.detector_samples_lost += lost
+            logger.warning(f"检测器 {device_name} 采样读取落后，丢失 {lost} 个采样")
+        if not samples:
+            return
+
+        wavelengths = detector.get_wavelength() if hasattr(detector, 'get_wavelength') else None
+        for timestamp, signal_a, signal_b in samples:
+            retention_time = detector.retention_seconds_at(timestamp) / 60
+            frame, changed_wavelength = self.detector_coalescer.add(
+                device_name, [round(signal_a, 5), round(signal_b, 5)], retention_time, wavelengths, now=timestamp
+            )
+            if changed_wavelength is not None and self.mqtt_manager:
+                await self._publish(
+                    f"chromatography/detector/{device_name}/wavelength",
+                    changed_wavelength,
+                    PublishPriority.STATUS,
+                    retain=self.detector_coalescer.config.retain_static
+                )
+            if frame is not None:
+                await self._publish_detector_frames([frame])
+        # 本批剩余的采样立即成帧，不等下一个采集周期
+        await self._publish_detector_frames(self.detector_coalescer.flush(device_name))
+
+        timestamp, signal_a, signal_b = samples[-1]
+        signals = [round(signal_a, 5), round(signal_b, 5)]
+        retention_time = round(detector.retention_seconds_at(timestamp) / 60, 2)
+        self.latest_data[device_name] = {
+            "device_id": device_name,
+            "device_type": "detector",
+            "signal": signals,
+            "wavelength": wavelengths,
+            "retention_time": retention_time,
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            "is_detecting": detector.is_detecting,
+            "streaming": True,
+            "samples": len(samples),
+        }
+
+        if self.mqtt_manager and not self.detector_coalescer.config.enabled:
+            await self._publish(f"chromatography/detector/{device_name}/signal", signals)
+            await self._publish(
+                f"chromatography/detector/{device_name}/retention_time",
+                {
+                    "retention_time": retention_time,
+                    "unit": "min",
+                    "timestamp": datetime.fromtimestamp(timestamp).isoformat()
+                }
+            )
+
+    async def set_detector_streaming(self, enabled: bool, sample_rate: Optional[float] = None,
+                                     device_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        开启/关闭检测器连续采集
+        :param enabled: 是否开启
+        :param sample_rate: 采样频率（Hz），为None时保持检测器当前设置
+        :param device_name: 指定检测器，为None时作用于全部已注册的检测器
+        :return: 各检测器的连续采集状态
+        """
+        if sample_rate is not None and not 0 < sample_rate <= 100:
+            raise ValueError("sample_rate 必须在 (0, 100] Hz 范围内")
+
+        detectors = {name: device for name, device in self.devices.items()
+                     if hasattr(device, 'start_continuous_acquisition')
+                     and (device_name is None or name == device_name)}
+        if device_name is not None and not detectors:
+            raise ValueError(f"未找到支持连续采集的检测器: {device_name}")
+
+        for name, detector in detectors.items():
+            if enabled:
+                rate = sample_rate if sample_rate is not None else detector.sample_rate
+                if not await detector.start_continuous_acquisition(rate):
+                    logger.warning(f"检测器 {name} 未连接或无法开始检测，连续采集未开启")
+                    continue
+                # 从当前位置开始读取，不回放旧采样
+                self._detector_cursors[name] = detector.sample_ring.next_seq
+            else:
+                await detector.stop_continuous_acquisition()
+                # 发布缓冲区中剩余的采样
+                await self._collect_detector_stream(name, detector)
+                self._detector_cursors.pop(name, None)
+            logger.info(f"检测器 {name} 连续采集: enabled={enabled}, sample_rate={detector.sample_rate}Hz")
+
+        return self.get_detector_streaming_status()
+
+    def get_detector_streaming_status(self) -> Dict[str, Any]:
+        return {
+            "detectors": {
+                name: device.get_acquisition_status()
+                for name, device in self.devices.items()
+                if hasattr(device, 'get_acquisition_status')
+            },
+            "samples_lost": self.detector_samples_lost,
+        }
+
+    async def _publish(self, topic: str, data: Any,
+                       priority: PublishPriority = PublishPriority.TELEMETRY, retain: bool = False,
+                       on_drop=None) -> bool:
+        """
+        发布一条消息：有发布队列时按优先级入队，否则直接交给MQTT管理器
+
+        Returns:
+            bool: 是否已入队/发布；入队后又被挤出队列时调用 on_drop(topic)
+        """
+        if self.publisher is not None:
+            # 主题格式 chromatography/<设备类型>/<设备名>/...
+            parts = topic.split("/")
+            return await self.publisher.publish_message(
+                topic, data, priority,
+                device_type=parts[1] if len(parts) > 2 else "host_devices",
+                device_id=parts[2] if len(parts) > 2 else "system",
+                retain=retain,
+                on_drop=on_drop
+            )
+        if self.mqtt_manager:
+            return bool(await self.mqtt_manager.publish(topic, data, retain=retain))
+        return False
+
+    async def _publish_on_change(self, topic: str, data: Any,
+                                 priority: PublishPriority = PublishPriority.STATUS) -> bool:
+        """按死区规则发布：值没有明显变化且心跳未到期时跳过，返回是否已发布"""
+        if not self.deadband.should_publish(topic, data):
+            return False
+        # 消息未入队或入队后被挤出（状态/遥测按drop_oldest溢出）时清除死区记录，下一次采集重新发布
+        if not await self._publish(topic, data, priority, on_drop=self.deadband.reset):
+            self.deadband.reset(topic)
+            return False
+        return True
+
+    async def _publish_detector_frames(self, frames: List[Dict[str, Any]]):
+        """发布检测器数据帧到 chromatography/detector/{device}/frame"""
+        if not self.mqtt_manager:
+            return
+        for frame in frames:
+            try:
+                await self._publish(
+                    f"chromatography/detector/{frame['device_id']}/frame",
+                    frame
+                )
+                logger.debug(f"发布检测器数据帧: {frame['device_id']} seq={frame['seq']} count={frame['count']}")
+            except Exception as e:
+                logger.error(f"发布检测器数据帧时出错: {e}")
+
     async def _collect_pressure_data(self, device_name: str, pressure_sensor):
         """采集并发布压力传感器数据"""
         try:
@@ -324,13 +521,14 @@ class HostDevicesProcessor(BaseProcessor):
                 pressure = await pressure_sensor.get_pressure()
 
                 if self.mqtt_manager:
-                    await self.mqtt_manager.publish(
+                    await self._publish_on_change(
                         f"chromatography/pressure/{device_name}/value",
                         {
                             "pressure": pressure,
                             "unit": "MPa",
                             "timestamp": datetime.now().isoformat()
-                        }
+                        },
+                        PublishPriority.TELEMETRY
                     )
 
                 logger.debug(f"发布压力数据: {device_name} -> {pressure} MPa")
@@ -345,7 +543,7 @@ class HostDevicesProcessor(BaseProcessor):
                 status = await pump.get_status()
 
                 if self.mqtt_manager:
-                    await self.mqtt_manager.publish(
+                    await self._publish_on_change(
                         f"chromatography/pump/{device_name}/status",
                         status
                     )
@@ -362,7 +560,7 @@ class HostDevicesProcessor(BaseProcessor):
                 status = relay.get_all_status()
 
                 if self.mqtt_manager:
-                    await self.mqtt_manager.publish(
+                    await self._publish_on_change(
                         f"chromatography/relay/{device_name}/status",
                         status
                     )
@@ -379,12 +577,13 @@ class HostDevicesProcessor(BaseProcessor):
                 status = await bubble_sensor.get_bubble_status()
 
                 if self.mqtt_manager:
-                    await self.mqtt_manager.publish(
+                    await self._publish_on_change(
                         f"chromatography/bubble/{device_name}/status",
                         {
                             "bubble_detected": status,
                             "timestamp": datetime.now().isoformat()
-                        }
+                        },
+                        PublishPriority.EMERGENCY if status else PublishPriority.STATUS
                     )
 
                 logger.debug(f"发布气泡状态: {device_name} -> {status}")
@@ -401,9 +600,10 @@ class HostDevicesProcessor(BaseProcessor):
 
                 if self.mqtt_manager:
                     device_type = device.__class__.__name__.lower()
-                    await self.mqtt_manager.publish(
+                    await self._publish(
                         f"chromatography/{device_type}/{device_name}/status",
-                        status
+                        status,
+                        PublishPriority.STATUS
                     )
 
                 logger.debug(f"发布设备状态: {device_name}")
@@ -419,6 +619,31 @@ class HostDevicesProcessor(BaseProcessor):
         else:
             logger.warning("无效的采集间隔，必须大于0")
 
+    def set_detector_coalescing(self, enabled: bool, max_samples: Optional[int] = None,
+                                max_interval: Optional[float] = None):
+        """
+        设置检测器帧合并
+        :param enabled: 是否启用（启用后不再逐采样发布 signal/retention_time）
+        :param max_samples: 每帧最多采样数
+        :param max_interval: 每帧最长时间窗口（秒）
+        """
+        if max_samples is not None and max_samples < 1:
+            raise ValueError("max_samples 必须大于等于1")
+        if max_interval is not None and max_interval <= 0:
+            raise ValueError("max_interval 必须大于0")
+
+        config = self.detector_coalescer.config
+        if max_samples is not None:
+            config.max_samples = max_samples
+        if max_interval is not None:
+            config.max_interval = max_interval
+        if enabled != config.enabled:
+            # 切换模式时丢弃未发布数据，并让下一帧重新发布波长
+            self.detector_coalescer.reset()
+        config.enabled = enabled
+        logger.info(f"检测器帧合并: enabled={enabled}, max_samples={config.max_samples}, "
+                    f"max_interval={config.max_interval}秒")
+
     def get_device_data(self, device_name: str = None) -> Dict[str, Any]:
         """
         获取设备的最新数据
@@ -496,7 +721,9 @@ class HostDevicesProcessor(BaseProcessor):
             "collection_interval": self.collection_interval,
             "processed_count": self.processed_count,
             "last_process_time": self.last_process_time.isoformat() if self.last_process_time else None,
-            "latest_data_count": len(self.latest_data)
+            "latest_data_count": len(self.latest_data),
+            "detector_coalescing": self.detector_coalescer.get_stats(),
+            "deadband": self.deadband.get_stats()
         }
 
     # 保留原有的process_data方法以保持兼容性
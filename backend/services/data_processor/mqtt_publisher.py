@@ -1,14 +1,22 @@
 """
 MQTT发布管理器
 管理所有设备数据的MQTT发布
+
+批量发布：批次内的消息在并发窗口（max_in_flight）内同时发布，不逐条等待；
+发布失败的消息进入该主题自己的重试队列，不会阻塞其他主题。
+可选把批次内同一主题的多条消息合并为一条数组消息。
+发布队列按优先级分类且有界（见 priority_publish_queue），告警和控制消息优先于状态和遥测发出。
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional, Deque, Set
 from datetime import datetime
 import asyncio
 import logging
 import json
-from collections import defaultdict
+from collections import defaultdict, deque
+
+from utils.latency_histogram import LatencyHistogram
+from .priority_publish_queue import PriorityPublishQueue, PublishPriority, PriorityClassConfig
 
 logger = logging.getLogger(__name__)
 
@@ -16,17 +24,33 @@ logger = logging.getLogger(__name__)
 class MQTTPublisher:
     """MQTT发布管理器"""
 
-    def __init__(self, mqtt_manager):
+    # 连续采样类设备的数据按遥测发布，其余设备按状态发布
+    TELEMETRY_DEVICE_TYPES = {"detector", "pressure_sensor"}
+
+    def __init__(self, mqtt_manager,
+                 queue_config: Optional[Dict[PublishPriority, PriorityClassConfig]] = None):
         self.mqtt_manager = mqtt_manager
-        self.publish_queue = asyncio.Queue()
+        self.publish_queue = PriorityPublishQueue(queue_config, on_drop=self._on_queue_drop)
         self.batch_size = 10
         self.batch_interval = 0.5  # 批量发送间隔（秒）
         self.retry_count = 3
         self.retry_delay = 1.0  # 重试延迟（秒）
+        self.max_in_flight = 8  # 同时等待broker确认的最大消息数
+        self.ack_timeout = 10.0  # 等待broker确认的超时（秒）
+        self.merge_same_topic = False  # 批次内同一主题的多条消息合并为一条数组消息
+        self.stop_timeout = 5.0  # 停止时等待未完成发布的时间（秒）
         self._publisher_task = None
         self.is_running = False
         self.statistics = defaultdict(int)
 
+        # 并发窗口、进行中的发布任务，以及按主题的重试队列和重试任务
+        self._window = asyncio.Semaphore(self.max_in_flight)
+        self._in_flight: Set[asyncio.Task] = set()
+        self._retry_queues: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._retry_tasks: Dict[str, asyncio.Task] = {}
+        # 入队到broker确认的延迟
+        self.latency = LatencyHistogram()
+
         # 定义所有MQTT主题
         self.topics = {
             # 主机模块设备主题
@@ -71,59 +95,106 @@ class MQTTPublisher:
         self.is_running = False
 
         if self._publisher_task:
-            self._publisher_task.cancel()
-            try:
-                await self._publisher_task
-            except asyncio.CancelledError:
-                pass
+            # 不取消发布循环：取消可能打断发送到一半的批次，已发出的消息会被重复发送。
+            # 循环最多batch_interval秒后看到停止标志，发完手中的批次后退出
+            await self._publisher_task
+            self._publisher_task = None
 
-        # 发送队列中剩余的数据
+        # 发送队列中剩余的数据，并等待进行中的发布和重试完成
         await self._flush_queue()
+        await self._drain_pending()
         logger.info("MQTT发布管理器已停止")
 
-    async def publish_device_data(self, device_type: str, device_id: str, data: Dict[str, Any]):
+    async def publish_device_data(self, device_type: str, device_id: str, data: Dict[str, Any],
+                                  priority: Optional[PublishPriority] = None):
         """
         发布设备数据
         :param device_type: 设备类型
         :param device_id: 设备ID
         :param data: 设备数据
+        :param priority: 发布优先级，默认检测器/压力传感器为遥测，其余为状态
         """
         topic = self._get_topic(device_type, device_id)
         if topic:
-            await self.publish_queue.put({
+            if priority is None:
+                priority = (PublishPriority.TELEMETRY if device_type in self.TELEMETRY_DEVICE_TYPES
+                            else PublishPriority.STATUS)
+            if await self._enqueue({
                 "topic": topic,
                 "data": data,
                 "device_type": device_type,
                 "device_id": device_id
-            })
-            self.statistics[f"queued_{device_type}"] += 1
+            }, priority):
+                self.statistics[f"queued_{device_type}"] += 1
+
+    async def publish_message(self, topic: str, data: Any,
+                              priority: PublishPriority = PublishPriority.CONTROL,
+                              device_type: str = "custom", device_id: str = "system",
+                              retain: bool = False, on_drop: Optional[Callable[[str], None]] = None) -> bool:
+        """
+        发布任意主题的消息（默认按控制消息优先级）
+
+        Args:
+            on_drop: 消息入队后又被溢出策略挤出队列时以主题调用（未入队时直接返回False，不调用）
+        """
+        item = {
+            "topic": topic,
+            "data": data,
+            "device_type": device_type,
+            "device_id": device_id,
+            "retain": retain
+        }
+        if on_drop is not None:
+            item["on_drop"] = on_drop
+        return await self._enqueue(item, priority)
 
     async def publish_system_status(self, status: Dict[str, Any]):
         """发布系统状态"""
-        await self.publish_queue.put({
+        await self._enqueue({
             "topic": self.topics["system_status"],
             "data": status,
             "device_type": "system",
             "device_id": "system"
-        })
+        }, PublishPriority.STATUS)
 
     async def publish_alert(self, alert: Dict[str, Any]):
         """发布告警信息"""
-        await self.publish_queue.put({
+        await self._enqueue({
             "topic": self.topics["system_alert"],
             "data": alert,
             "device_type": "alert",
             "device_id": "system"
-        })
+        }, PublishPriority.EMERGENCY)
 
     async def publish_aggregated_data(self, aggregated_data: Dict[str, Any]):
         """发布聚合数据"""
-        await self.publish_queue.put({
+        await self._enqueue({
             "topic": self.topics["data_aggregated"],
             "data": aggregated_data,
             "device_type": "aggregated",
             "device_id": "system"
-        })
+        }, PublishPriority.TELEMETRY)
+
+    async def _enqueue(self, item: Dict[str, Any], priority: PublishPriority) -> bool:
+        """
+        按优先级放入发布队列，记录入队时间用于延迟统计
+
+        控制/告警类别队列满时等待；状态/遥测类别按溢出策略丢弃，返回是否入队。
+        """
+        item["enqueued_at"] = asyncio.get_running_loop().time()
+        item["attempts"] = 0
+        item["priority"] = priority
+        return await self.publish_queue.put(item, priority)
+
+    def _on_queue_drop(self, item: Dict[str, Any]):
+        """队列溢出挤出消息时通知发布方"""
+        self.statistics["dropped_queue_overflow"] += 1
+        callback = item.get("on_drop")
+        if callback is not None:
+            try:
+                callback(item["topic"])
+            except Exception as e:
+                logger.error(f"消息丢弃回调出错 [{item['topic']}]: {e}")
 
     def _get_topic(self, device_type: str, device_id: str) -> Optional[str]:
         """根据设备类型获取MQTT主题"""
@@ -190,45 +261,166 @@ class MQTTPublisher:
                         batch = []
                         last_publish_time = asyncio.get_event_loop().time()
 
-        except asyncio.CancelledError:
-            # 被取消，发送剩余数据
+            # 已停止，发送已取出的剩余数据
             if batch:
                 await self._publish_batch(batch)
-            raise
 
         except Exception as e:
             logger.error(f"发布循环错误: {e}")
 
     async def _publish_batch(self, batch: List[Dict[str, Any]]):
-        """批量发布数据"""
+        """
+        批量发布数据
+
+        每条消息占用一个并发窗口名额后立即发出，窗口已满时才等待；
+        某主题存在待重试消息时，该主题的新消息排在重试队列之后以保持顺序。
+        """
+        if self.merge_same_topic:
+            batch = self._merge_batch(batch)
+
         for item in batch:
-            await self._publish_with_retry(item)
+            retry_queue = self._retry_queues.get(item["topic"])
+            if retry_queue is not None:
+                retry_queue.append(item)
+                continue
+
+            window = self._window
+            await window.acquire()
+            task = asyncio.create_task(self._publish_in_window(item, window))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    def _merge_batch(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """把同一主题的多条消息合并为一条，data为按入队顺序排列的数组"""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        merged = []
+        for item in batch:
+            if item.get("retain"):
+                # 保留消息是主题的最新状态，不能合并成数组
+                merged.append(item)
+            else:
+                groups.setdefault(item["topic"], []).append(item)
+
+        for topic, items in groups.items():
+            if len(items) == 1:
+                merged.append(items[0])
+                continue
+            first = items[0]
+            merged.append({
+                "topic": topic,
+                "data": [item["data"] for item in items],
+                "device_type": first.get("device_type", "unknown"),
+                "device_id": first.get("device_id"),
+                "enqueued_at": min(item["enqueued_at"] for item in items),
+                "attempts": 0,
+                "priority": first.get("priority"),
+                "merged": len(items)
+            })
+            self.statistics["merged_items"] += len(items)
+            self.statistics["merged_messages"] += 1
+        return merged
 
-    async def _publish_with_retry(self, item: Dict[str, Any]):
-        """带重试的发布"""
+    async def _publish_in_window(self, item: Dict[str, Any], window: asyncio.Semaphore):
+        """占用窗口名额发布一条消息，失败时转入该主题的重试队列"""
+        try:
+            success = await self._publish_once(item)
+        finally:
+            window.release()
+
+        if not success:
+            item["attempts"] = 1
+            self._schedule_retry(item)
+
+    async def _publish_once(self, item: Dict[str, Any]) -> bool:
+        """
+        发布一次并等待broker确认
+
+        Returns:
+            bool: 已发布或已交给MQTT管理器的离线缓冲返回True，需要重试返回False
+        """
         topic = item["topic"]
-        data = item["data"]
         device_type = item.get("device_type", "unknown")
 
-        for attempt in range(self.retry_count):
-            try:
-                success = await self.mqtt_manager.publish_data(topic, data)
-                if success:
-                    self.statistics[f"published_{device_type}"] += 1
-                    logger.debug(f"成功发布到 {topic}")
-                    return
-                else:
-                    logger.warning(f"发布失败 (尝试 {attempt + 1}/{self.retry_count}): {topic}")
+        try:
+            success = await self.mqtt_manager.publish_data(topic, item["data"], retain=item.get("retain", False),
+                                                         ack_timeout=self.ack_timeout)
+        except Exception as e:
+            logger.error(f"发布异常 (尝试 {item['attempts'] + 1}/{self.retry_count}): {e}")
+            return False
 
-            except Exception as e:
-                logger.error(f"发布异常 (尝试 {attempt + 1}/{self.retry_count}): {e}")
+        if success:
+            self.statistics[f"published_{device_type}"] += 1
+            self.latency.record(asyncio.get_running_loop().time() - item["enqueued_at"])
+            logger.debug(f"成功发布到 {topic}")
+            return True
+
+        if not getattr(self.mqtt_manager, "is_connected", True):
+            # 断线时消息已进入MQTT管理器的离线缓冲，重连后补发，不再重试以免重复
+            self.statistics[f"buffered_offline_{device_type}"] += 1
+            return True
 
-            if attempt < self.retry_count - 1:
-                await asyncio.sleep(self.retry_delay)
+        logger.warning(f"发布失败 (尝试 {item['attempts'] + 1}/{self.retry_count}): {topic}")
+        return False
 
-        # 所有重试失败
-        self.statistics[f"failed_{device_type}"] += 1
-        logger.error(f"发布最终失败: {topic}")
+    def _schedule_retry(self, item: Dict[str, Any]):
+        """把失败的消息放到该主题重试队列的队首，并确保该主题的重试任务在运行"""
+        topic = item["topic"]
+        if item["attempts"] >= self.retry_count:
+            self._record_failure(item)
+            return
+
+        queue = self._retry_queues.setdefault(topic, deque())
+        queue.appendleft(item)
+        self.statistics["retried"] += 1
+
+        task = self._retry_tasks.get(topic)
+        if task is None or task.done():
+            self._retry_tasks[topic] = asyncio.create_task(self._retry_worker(topic))
+
+    async def _retry_worker(self, topic: str):
+        """按顺序重试一个主题的消息，只阻塞该主题"""
+        queue = self._retry_queues[topic]
+        try:
+            while queue:
+                item = queue[0]
+                if item["attempts"]:
+                    await asyncio.sleep(self.retry_delay)
+
+                window = self._window
+                async with window:
+                    success = await self._publish_once(item)
+
+                if success:
+                    queue.popleft()
+                    continue
+
+                item["attempts"] += 1
+                if item["attempts"] >= self.retry_count:
+                    queue.popleft()
+                    self._record_failure(item)
+        finally:
+            if self._retry_queues.get(topic) is queue and not queue:
+                del self._retry_queues[topic]
+            if self._retry_tasks.get(topic) is asyncio.current_task():
+                del self._retry_tasks[topic]
+
+    def _record_failure(self, item: Dict[str, Any]):
+        """所有重试失败"""
+        self.statistics[f"failed_{item.get('device_type', 'unknown')}"] += 1
+        logger.error(f"发布最终失败: {item['topic']}")
+
+    async def _drain_pending(self):
+        """等待进行中的发布和重试完成，超时后取消"""
+        pending = set(self._in_flight) | set(self._retry_tasks.values())
+        if not pending:
+            return
+        done, not_done = await asyncio.wait(pending, timeout=self.stop_timeout)
+        for task in not_done:
+            task.cancel()
+        if not_done:
+            dropped = sum(len(queue) for queue in self._retry_queues.values())
+            logger.warning(f"停止时仍有 {len(not_done)} 个发布任务未完成，丢弃待重试消息 {dropped} 条")
+            self._retry_queues.clear()
 
     async def _flush_queue(self):
         """清空队列中的所有数据"""
@@ -250,7 +442,13 @@ class MQTTPublisher:
         """获取发布统计信息"""
         return {
             "queue_size": self.publish_queue.qsize(),
+            "queues": self.publish_queue.get_stats(),
             "is_running": self.is_running,
+            "in_flight": len(self._in_flight),
+            "max_in_flight": self.max_in_flight,
+            "merge_same_topic": self.merge_same_topic,
+            "retry_queues": {topic: len(queue) for topic, queue in self._retry_queues.items()},
+            "latency": self.latency.to_dict(),
             "statistics": dict(self.statistics)
         }
 
@@ -265,7 +463,9 @@ class MQTTPublisher:
                 await self.publish_device_data(device_type, device_id, data)
 
     def set_batch_config(self, batch_size: Optional[int] = None,
-                        batch_interval: Optional[float] = None):
+                        batch_interval: Optional[float] = None,
+                        max_in_flight: Optional[int] = None,
+                        merge_same_topic: Optional[bool] = None):
         """设置批量配置"""
         if batch_size is not None and batch_size > 0:
             self.batch_size = batch_size
@@ -273,4 +473,14 @@ class MQTTPublisher:
 
         if batch_interval is not None and batch_interval > 0:
             self.batch_interval = batch_interval
-            logger.info(f"批量间隔设置为: {batch_interval}秒")
\ No newline at end of file
+            logger.info(f"批量间隔设置为: {batch_interval}秒")
+
+        if max_in_flight is not None and max_in_flight > 0:
+            # 新窗口只作用于之后的发布，进行中的发布仍释放旧窗口
+            self.max_in_flight = max_in_flight
+            self._window = asyncio.Semaphore(max_in_flight)
+            logger.info(f"并发发布窗口设置为: {max_in_flight}")
+
+        if merge_same_topic is not None:
+            self.merge_same_topic = merge_same_topic
+            logger.info(f"同主题消息合并: {'启用' if merge_same_topic else '关闭'}")
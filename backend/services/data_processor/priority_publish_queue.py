@@ -0,0 +1,182 @@
+"""
+有界优先级发布队列
+Bounded Priority Publish Queue
+
+按优先级分类排队：紧急/告警 > 控制 > 状态 > 遥测。取出时总是先取高优先级的消息，
+每个类别有独立的容量和溢出策略：
+- block:       队列满时等待（控制、告警消息不能丢）
+- drop_oldest: 丢弃最旧的消息（遥测只关心最新数据）
+- drop_newest: 丢弃新消息
+接口与 asyncio.Queue 保持一致（put / get / get_nowait / qsize / empty），put 额外接受优先级。
+"""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum, IntEnum
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+class PublishPriority(IntEnum):
+    """发布优先级，数值越小越优先"""
+    EMERGENCY = 0    # 紧急/告警
+    CONTROL = 1      # 控制指令
+    STATUS = 2       # 设备/系统状态
+    TELEMETRY = 3    # 遥测数据
+
+
+class OverflowPolicy(str, Enum):
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    DROP_NEWEST = "drop_newest"
+
+
+@dataclass
+class PriorityClassConfig:
+    capacity: int
+    policy: OverflowPolicy
+
+
+DEFAULT_CLASS_CONFIG: Dict[PublishPriority, PriorityClassConfig] = {
+    PublishPriority.EMERGENCY: PriorityClassConfig(200, OverflowPolicy.BLOCK),
+    PublishPriority.CONTROL: PriorityClassConfig(500, OverflowPolicy.BLOCK),
+    PublishPriority.STATUS: PriorityClassConfig(500, OverflowPolicy.DROP_OLDEST),
+    PublishPriority.TELEMETRY: PriorityClassConfig(2000, OverflowPolicy.DROP_OLDEST),
+}
+
+
+class _PriorityClass:
+    __slots__ = ("priority", "capacity", "policy", "items", "not_full",
+                 "enqueued", "dequeued", "dropped", "blocked", "max_depth")
+
+    def __init__(self, priority: PublishPriority, config: PriorityClassConfig):
+        self.priority = priority
+        self.capacity = config.capacity
+        self.policy = OverflowPolicy(config.policy)
+        self.items: Deque[Any] = deque()
+        self.not_full = asyncio.Event()
+        self.not_full.set()
+
+        # 统计信息
+        self.enqueued = 0
+        self.dequeued = 0
+        self.dropped = 0
+        self.blocked = 0      # put 因队列满而等待的次数
+        self.max_depth = 0
+
+    def full(self) -> bool:
+        return len(self.items) >= self.capacity
+
+
+class PriorityPublishQueue:
+    """按优先级分类的有界发布队列"""
+
+    def __init__(self, class_config: Optional[Dict[PublishPriority, PriorityClassConfig]] = None,
+                 on_drop: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            class_config: 各优先级类别的容量和溢出策略，未给出的类别使用默认配置
+            on_drop: drop_oldest 挤出已入队的消息时以该消息调用
+        """
+        self.on_drop = on_drop
+        config = dict(DEFAULT_CLASS_CONFIG)
+        config.update(class_config or {})
+        for priority, class_cfg in config.items():
+            if class_cfg.capacity < 1:
+                raise ValueError(f"队列容量必须大于0: {PublishPriority(priority).name}")
+        # 按优先级从高到低排列
+        self._classes = [_PriorityClass(PublishPriority(p), config[p]) for p in sorted(config)]
+        self._by_priority = {c.priority: c for c in self._classes}
+        self._not_empty = asyncio.Event()
+
+    # ============= 写入 =============
+
+    async def put(self, item: Any, priority: PublishPriority = PublishPriority.TELEMETRY) -> bool:
+        """
+        放入消息，队列满时按该类别的溢出策略处理
+
+        Returns:
+            bool: 消息是否入队（drop_newest 丢弃新消息时返回False）
+        """
+        cls = self._by_priority[PublishPriority(priority)]
+        if cls.full() and cls.policy == OverflowPolicy.BLOCK:
+            cls.blocked += 1
+            while cls.full():
+                cls.not_full.clear()
+                await cls.not_full.wait()
+        return self._put(cls, item)
+
+    def put_nowait(self, item: Any, priority: PublishPriority = PublishPriority.TELEMETRY) -> bool:
+        """不等待地放入消息；block 类别队列满时抛出 asyncio.QueueFull"""
+        cls = self._by_priority[PublishPriority(priority)]
+        if cls.full() and cls.policy == OverflowPolicy.BLOCK:
+            raise asyncio.QueueFull
+        return self._put(cls, item)
+
+    def _put(self, cls: _PriorityClass, item: Any) -> bool:
+        if cls.full():
+            cls.dropped += 1
+            if cls.policy == OverflowPolicy.DROP_NEWEST:
+                return False
+            dropped = cls.items.popleft()
+            if self.on_drop is not None:
+                self.on_drop(dropped)
+        cls.items.append(item)
+        cls.enqueued += 1
+        cls.max_depth = max(cls.max_depth, len(cls.items))
+        self._not_empty.set()
+        return True
+
+    # ============= 读取 =============
+
+    async def get(self) -> Any:
+        """取出优先级最高的消息，队列为空时等待"""
+        while True:
+            try:
+                return self.get_nowait()
+            except asyncio.QueueEmpty:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+
+    def get_nowait(self) -> Any:
+        for cls in self._classes:
+            if cls.items:
+                item = cls.items.popleft()
+                cls.dequeued += 1
+                cls.not_full.set()
+                return item
+        raise asyncio.QueueEmpty
+
+    def qsize(self) -> int:
+        return sum(len(cls.items) for cls in self._classes)
+
+    def empty(self) -> bool:
+        return not any(cls.items for cls in self._classes)
+
+    def depth(self, priority: PublishPriority) -> int:
+        return len(self._by_priority[PublishPriority(priority)].items)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各类别的深度、容量、溢出策略和计数"""
+        return {
+            cls.priority.name.lower(): {
+                "depth": len(cls.items),
+                "capacity": cls.capacity,
+                "policy": cls.policy.value,
+                "enqueued": cls.enqueued,
+                "dequeued": cls.dequeued,
+                "dropped": cls.dropped,
+                "blocked": cls.blocked,
+                "max_depth": cls.max_depth,
+            }
+            for cls in self._classes
+        }
+
+
+__all__ = [
+    'PublishPriority',
+    'OverflowPolicy',
+    'PriorityClassConfig',
+    'PriorityPublishQueue',
+    'DEFAULT_CLASS_CONFIG',
+]
@@ -22,6 +22,9 @@ from models.experiment_data_models import (
     DataType,
     DataQuality
 )
+from utils.algorithms.signal_processing import estimate_baseline, smooth
+from utils.algorithms import peak_detection
+from utils.sensor_batch import SensorDataBatch
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +36,8 @@ class ExperimentDataManager:
         self.mqtt_manager = mqtt_manager
         self.db = ChromatographyDB()
         self.active_experiments: Dict[str, Dict[str, Any]] = {}
-        self.data_buffers: Dict[str, List[SensorDataPoint]] = {}
+        self.data_buffers: Dict[str, SensorDataBatch] = {}
+        self.processed_buffers: Dict[str, SensorDataBatch] = {}
         self.processing_queue: List[Dict[str, Any]] = []
 
     async def start_data_collection(self, experiment_id: str, collection_config: Dict[str, Any]) -> bool:
@@ -54,7 +58,7 @@ class ExperimentDataManager:
             "devices": collection_config.get("devices", ["detector", "pressure", "flow"])
         }
 
-        self.data_buffers[experiment_id] = []
+        self.data_buffers[experiment_id] = SensorDataBatch(experiment_id)
 
         # 发布数据采集开始消息
         await self.mqtt_manager.publish_data(
@@ -85,15 +89,16 @@ class ExperimentDataManager:
         experiment_info["end_time"] = datetime.now()
 
         # 计算数据摘要
-        data_points = self.data_buffers.get(experiment_id, [])
-        summary = await self._generate_data_summary(experiment_id, data_points)
+        batch = self.data_buffers.get(experiment_id) or SensorDataBatch(experiment_id)
+        summary = await self._generate_data_summary(experiment_id, batch)
 
         # 保存数据到数据库
-        await self._save_experiment_data(experiment_id, data_points, summary)
+        await self._save_experiment_data(experiment_id, batch, summary)
 
         # 清理内存中的数据
         self.active_experiments.pop(experiment_id, None)
         self.data_buffers.pop(experiment_id, None)
+        self.processed_buffers.pop(experiment_id, None)
 
         # 发布数据采集完成消息
         await self.mqtt_manager.publish_data(
@@ -101,7 +106,7 @@ class ExperimentDataManager:
             {
                 "experiment_id": experiment_id,
                 "total_data_points": summary.total_data_points,
-                "duration_minutes": summary.duration_minutes,
+                "duration_minutes": summary.acquisition_duration_minutes,
                 "timestamp": datetime.now().isoformat()
             }
         )
@@ -110,7 +115,21 @@ class ExperimentDataManager:
         return summary
 
     async def add_data_point(self, experiment_id: str, data_point: SensorDataPoint) -> bool:
-        """添加数据点"""
+        """添加数据点（API入口，模型数据转为列式存储）"""
+        return await self.add_sample(
+            experiment_id,
+            data_point.device_id,
+            data_point.timestamp,
+            data_point.value,
+            data_point.unit,
+            data_point.data_type,
+            data_point.quality
+        )
+
+    async def add_sample(self, experiment_id: str, device_id: str, timestamp, value: float,
+                         unit: str = "", data_type: DataType = DataType.DETECTOR,
+                         quality: DataQuality = DataQuality.GOOD) -> bool:
+        """添加一个采样值到列式缓冲区（不构造数据点模型）"""
         if experiment_id not in self.active_experiments:
             return False
 
@@ -118,10 +137,10 @@ class ExperimentDataManager:
         if experiment_info["status"] != "collecting":
             return False
 
-        # 添加数据点到缓冲区
-        self.data_buffers[experiment_id].append(data_point)
+        # 添加到缓冲区
+        self.data_buffers[experiment_id].append(device_id, timestamp, value, unit, data_type, quality)
         experiment_info["total_data_points"] += 1
-        experiment_info["last_data_time"] = data_point.timestamp
+        experiment_info["last_data_time"] = timestamp
 
         # 定期发布实时数据状态
         if experiment_info["total_data_points"] % 100 == 0:
@@ -130,7 +149,7 @@ class ExperimentDataManager:
                 {
                     "experiment_id": experiment_id,
                     "total_points": experiment_info["total_data_points"],
-                    "last_value": data_point.value,
+                    "last_value": value,
                     "timestamp": datetime.now().isoformat()
                 }
             )
@@ -154,25 +173,35 @@ class ExperimentDataManager:
         }
 
         try:
+            # 基线校正和滤波在所选设备的连续数组上进行
+            series = raw_data.find_series(processing_params.device_id)
+            if series is None or not len(series):
+                raise ValueError(f"未找到设备 {processing_params.device_id} 的数据")
+            times = series.times_minutes()
+            values = series.values_array()
+            processing_result["device_id"] = series.device_id
+            suffixes = []
+
             # 步骤1: 基线校正
-            if processing_params.baseline_correction:
-                corrected_data = await self._apply_baseline_correction(raw_data, processing_params)
+            if processing_params.baseline_correction and processing_params.baseline_correction_method != "none":
+                values = await self._apply_baseline_correction(values, processing_params)
+                suffixes.append("_corrected")
                 processing_result["steps_completed"].append("baseline_correction")
-                logger.info("基线校正完成")
-            else:
-                corrected_data = raw_data
+                logger.info(f"基线校正完成 ({processing_params.baseline_correction_method})")
 
             # 步骤2: 噪声滤波
-            if processing_params.noise_filtering:
-                filtered_data = await self._apply_noise_filtering(corrected_data, processing_params)
+            if processing_params.noise_filtering and processing_params.noise_filtering_method != "none":
+                values = await self._apply_noise_filtering(values, processing_params)
+                suffixes.append("_filtered")
                 processing_result["steps_completed"].append("noise_filtering")
-                logger.info("噪声滤波完成")
-            else:
-                filtered_data = corrected_data
+                logger.info(f"噪声滤波完成 ({processing_params.noise_filtering_method})")
+
+            if suffixes:
+                self.processed_buffers[experiment_id] = raw_data.with_values(series, values)
 
             # 步骤3: 峰检测
             if processing_params.peak_detection:
-                peaks = await self._detect_peaks(filtered_data, processing_params)
+                peaks = await self._detect_peaks(experiment_id, times, values, processing_params)
                 processing_result["detected_peaks"] = len(peaks)
                 processing_result["steps_completed"].append("peak_detection")
                 logger.info(f"峰检测完成，检测到 {len(peaks)} 个峰")
@@ -180,12 +209,13 @@ class ExperimentDataManager:
                 peaks = []
 
             # 步骤4: 数据质量评估
-            quality_metrics = await self._assess_data_quality(filtered_data, peaks)
+            quality_metrics = await self._assess_data_quality(experiment_id, values, peaks)
             processing_result["quality_metrics"] = quality_metrics
 
             # 保存处理结果
             await self._save_processed_data(experiment_id, {
-                "processed_data": filtered_data,
+                "device_id": series.device_id,
+                "processed_points": int(values.size),
                 "detected_peaks": peaks,
                 "quality_metrics": quality_metrics,
                 "processing_parameters": processing_params.dict()
@@ -217,7 +247,12 @@ class ExperimentDataManager:
             raise ValueError(f"未找到实验 {experiment_id} 的数据")
 
         # 执行峰检测
-        peaks = await self._detect_peaks_with_params(processed_data, detection_params)
+        series = processed_data.find_series(detection_params.get("device_id"))
+        if series is None or not len(series):
+            raise ValueError(f"未找到实验 {experiment_id} 的检测器数据")
+        peaks = await self._detect_peaks_with_params(
+            experiment_id, series.times_minutes(), series.values_array(), detection_params
+        )
 
         # 保存峰检测结果
         await self._save_peak_detection_results(experiment_id, peaks, detection_params)
@@ -299,10 +334,9 @@ class ExperimentDataManager:
         try:
             while experiment_info["status"] == "collecting":
                 # 模拟从硬件设备读取数据
-                data_points = await self._simulate_sensor_readings(experiment_id)
-
-                for data_point in data_points:
-                    await self.add_data_point(experiment_id, data_point)
+                timestamp = datetime.now()
+                for device_id, value, unit, data_type in await self._simulate_sensor_readings(experiment_id):
+                    await self.add_sample(experiment_id, device_id, timestamp, value, unit, data_type)
 
                 await asyncio.sleep(sampling_interval)
 
@@ -310,15 +344,18 @@ class ExperimentDataManager:
             logger.error(f"数据采集循环异常: {e}")
             experiment_info["status"] = "error"
 
-    async def _simulate_sensor_readings(self, experiment_id: str) -> List[SensorDataPoint]:
-        """模拟传感器读数"""
-        current_time = datetime.now()
-        data_points = []
+    async def _simulate_sensor_readings(self, experiment_id: str) -> List[Tuple[str, float, str, DataType]]:
+        """模拟传感器读数
+
+        Returns:
+            List[(device_id, value, unit, data_type)]
+        """
+        readings = []
 
         experiment_info = self.active_experiments[experiment_id]
         devices = experiment_info["devices"]
 
-        for i, device in enumerate(devices):
+        for device in devices:
             # 模拟不同设备的数据
             if device == "detector":
                 value = np.random.normal(0.5, 0.1)  # 模拟检测器信号
@@ -337,187 +374,127 @@ class ExperimentDataManager:
                 data_type = DataType.DETECTOR  # 默认类型
                 unit = "AU"
 
-            # 生成唯一的数据ID
-            data_id = f"{experiment_id}_{device}_{int(current_time.timestamp() * 1000)}_{i}"
-
-            data_point = SensorDataPoint(
-                data_id=data_id,
-                experiment_id=experiment_id,
-                device_id=device,
-                timestamp=current_time,
-                value=value,
-                unit=unit,
-                data_type=data_type,
-                quality=DataQuality.GOOD
-            )
-            data_points.append(data_point)
+            readings.append((device, float(value), unit, data_type))
 
-        return data_points
+        return readings
 
-    async def _generate_data_summary(self, experiment_id: str, data_points: List[SensorDataPoint]) -> ExperimentDataSummary:
+    async def _generate_data_summary(self, experiment_id: str, batch: SensorDataBatch) -> ExperimentDataSummary:
         """生成数据摘要"""
-        if not data_points:
+        if not batch:
             return ExperimentDataSummary(
                 experiment_id=experiment_id,
                 total_data_points=0,
-                duration_minutes=0,
-                sampling_rate_hz=0,
+                total_peaks=0,
+                data_size_mb=0,
+                acquisition_duration_minutes=0,
                 data_quality_score=0
             )
 
-        start_time = min(dp.timestamp for dp in data_points)
-        end_time = max(dp.timestamp for dp in data_points)
+        start_time, end_time = batch.time_range()
         duration = (end_time - start_time).total_seconds() / 60
 
-        # 按设备分组
-        devices_data = {}
-        for dp in data_points:
-            if dp.device_id not in devices_data:
-                devices_data[dp.device_id] = []
-            devices_data[dp.device_id].append(dp)
-
         return ExperimentDataSummary(
             experiment_id=experiment_id,
-            start_time=start_time,
-            end_time=end_time,
-            total_data_points=len(data_points),
-            duration_minutes=duration,
-            sampling_rate_hz=len(data_points) / (duration * 60) if duration > 0 else 0,
-            devices_count=len(devices_data),
+            total_data_points=len(batch),
+            total_peaks=0,
+            data_size_mb=batch.nbytes / (1024 * 1024),
+            acquisition_duration_minutes=duration,
             data_quality_score=95.0  # 简化处理
         )
 
-    async def _apply_baseline_correction(self, data: List[SensorDataPoint], params: ProcessingParameters) -> List[SensorDataPoint]:
-        """应用基线校正"""
-        # 简化的基线校正实现
-        if not data:
-            return data
-
-        # 计算移动平均作为基线
-        window_size = params.baseline_window_size or 50
-        corrected_data = []
-
-        for i, point in enumerate(data):
-            start_idx = max(0, i - window_size // 2)
-            end_idx = min(len(data), i + window_size // 2)
-            baseline = np.mean([dp.value for dp in data[start_idx:end_idx]])
-
-            corrected_point = SensorDataPoint(
-                data_id=f"{point.data_id}_corrected",
-                experiment_id=point.experiment_id,
-                device_id=point.device_id,
-                timestamp=point.timestamp,
-                value=point.value - baseline,
-                unit=point.unit,
-                data_type=point.data_type,
-                quality=point.quality
-            )
-            corrected_data.append(corrected_point)
-
-        return corrected_data
+    async def _apply_baseline_correction(self, values: np.ndarray, params: ProcessingParameters) -> np.ndarray:
+        """应用基线校正：减去按所选方法估计的基线"""
+        if values.size == 0:
+            return values
+
+        # ALS 在没有 scipy 时使用纯 Python 五对角求解，长数据需要数百毫秒，放到线程中计算不阻塞事件循环
+        baseline = await asyncio.to_thread(
+            estimate_baseline,
+            values,
+            method=params.baseline_correction_method,
+            window=params.baseline_window_size,
+            lam=params.als_lambda,
+            p=params.als_asymmetry,
+            iterations=params.als_iterations
+        )
+        return values - baseline
 
-    async def _apply_noise_filtering(self, data: List[SensorDataPoint], params: ProcessingParameters) -> List[SensorDataPoint]:
+    async def _apply_noise_filtering(self, values: np.ndarray, params: ProcessingParameters) -> np.ndarray:
         """应用噪声滤波"""
-        # 简化的滤波实现（移动平均）
-        if not data:
-            return data
-
-        filter_window = params.filter_window_size or 5
-        filtered_data = []
-
-        for i, point in enumerate(data):
-            start_idx = max(0, i - filter_window // 2)
-            end_idx = min(len(data), i + filter_window // 2)
-            filtered_value = np.mean([dp.value for dp in data[start_idx:end_idx]])
-
-            filtered_point = SensorDataPoint(
-                data_id=f"{point.data_id}_filtered",
-                experiment_id=point.experiment_id,
-                device_id=point.device_id,
-                timestamp=point.timestamp,
-                value=filtered_value,
-                unit=point.unit,
-                data_type=point.data_type,
-                quality=point.quality
-            )
-            filtered_data.append(filtered_point)
-
-        return filtered_data
+        if values.size == 0:
+            return values
+
+        return smooth(
+            values,
+            method=params.noise_filtering_method,
+            window=params.filter_window_size,
+            polyorder=params.savgol_polyorder
+        )
 
-    async def _detect_peaks(self, data: List[SensorDataPoint], params: ProcessingParameters) -> List[PeakInfo]:
+    async def _detect_peaks(self, experiment_id: str, times: np.ndarray, values: np.ndarray,
+                            params: ProcessingParameters) -> List[PeakInfo]:
         """检测峰"""
-        return await self._detect_peaks_with_params(data, {
-            "threshold": params.peak_threshold or 0.1,
-            "min_peak_height": params.min_peak_height or 0.05,
-            "min_peak_width": params.min_peak_width or 0.1
+        return await self._detect_peaks_with_params(experiment_id, times, values, {
+            "threshold": params.peak_detection_threshold,
+            "min_peak_height": params.peak_detection_threshold,
+            "min_peak_width": params.min_peak_width,
+            "max_peak_width": params.max_peak_width,
+            "min_prominence": params.min_peak_prominence,
+            "integration_method": params.integration_method
         })
 
-    async def _detect_peaks_with_params(self, data: List[SensorDataPoint], params: Dict[str, Any]) -> List[PeakInfo]:
-        """使用指定参数检测峰"""
-        if not data:
+    async def _detect_peaks_with_params(self, experiment_id: str, times: np.ndarray, values: np.ndarray,
+                                        params: Dict[str, Any]) -> List[PeakInfo]:
+        """使用指定参数检测峰（导数过零 + 显著性过滤，按实际采样时间积分）
+
+        Args:
+            times: 相对于第一个数据点的时间（分钟）
+            values: 信号值
+        """
+        if values.size == 0:
             return []
 
-        # 简化的峰检测算法
-        threshold = params.get("threshold", 0.1)
-        min_height = params.get("min_peak_height", 0.05)
-        min_width = params.get("min_peak_width", 0.1)
+        integration = params.get("integration_method", "trapezoid")
+        # 长曲线的检测与积分耗时可达数百毫秒，放到线程中执行以免阻塞事件循环
+        detected = await asyncio.to_thread(
+            peak_detection.detect_peaks,
+            times,
+            values,
+            threshold=params.get("threshold", 0.1),
+            min_height=params.get("min_peak_height", 0.05),
+            min_prominence=params.get("min_prominence"),
+            min_width=params.get("min_peak_width", 0.1),
+            max_width=params.get("max_peak_width"),
+            integration=integration
+        )
 
         peaks = []
-        values = [dp.value for dp in data]
-        # 计算相对于第一个数据点的时间差（分钟）
-        if data:
-            start_time = data[0].timestamp
-            times = [(dp.timestamp - start_time).total_seconds() / 60 for dp in data]
-        else:
-            times = []
-
-        # 寻找局部最大值
-        for i in range(1, len(values) - 1):
-            if (values[i] > values[i-1] and values[i] > values[i+1] and
-                values[i] > threshold and values[i] > min_height):
-
-                # 计算峰宽（简化）
-                peak_width = self._calculate_peak_width(values, i, min_height)
-
-                if peak_width >= min_width:
-                    peak = PeakInfo(
-                        experiment_id=data[i].experiment_id,
-                        peak_id=f"peak_{len(peaks)+1:03d}",
-                        peak_number=len(peaks)+1,
-                        retention_time=times[i],
-                        height=values[i],
-                        area=values[i] * peak_width,  # 简化面积计算
-                        width_at_half_height=peak_width,
-                        baseline_start=times[max(0, i-5)],
-                        baseline_end=times[min(len(times)-1, i+5)],
-                        confidence=0.9
-                    )
-                    peaks.append(peak)
+        for number, peak in enumerate(detected, start=1):
+            peaks.append(PeakInfo(
+                experiment_id=experiment_id,
+                peak_id=f"peak_{number:03d}",
+                peak_number=number,
+                retention_time=peak.retention_time,
+                height=peak.height,
+                area=peak.area,
+                width_at_half_height=peak.width_at_half_height,
+                asymmetry_factor=peak.asymmetry_factor,
+                theoretical_plates=peak.theoretical_plates,
+                integration_method=integration,
+                baseline_start=peak.start_time,
+                baseline_end=peak.end_time,
+                signal_to_noise=peak.signal_to_noise if np.isfinite(peak.signal_to_noise) else None,
+                confidence=min(1.0, peak.signal_to_noise / 100) if np.isfinite(peak.signal_to_noise) else 1.0
+            ))
 
         return peaks
 
-    def _calculate_peak_width(self, values: List[float], peak_idx: int, baseline: float) -> float:
-        """计算峰宽"""
-        # 简化的峰宽计算
-        half_height = (values[peak_idx] + baseline) / 2
-
-        # 向左寻找半高点
-        left_idx = peak_idx
-        while left_idx > 0 and values[left_idx] > half_height:
-            left_idx -= 1
-
-        # 向右寻找半高点
-        right_idx = peak_idx
-        while right_idx < len(values) - 1 and values[right_idx] > half_height:
-            right_idx += 1
-
-        return (right_idx - left_idx) * 0.1  # 假设每个点代表0.1分钟
-
-    async def _assess_data_quality(self, data: List[SensorDataPoint], peaks: List[PeakInfo]) -> DataQualityMetrics:
+    async def _assess_data_quality(self, experiment_id: str, values: np.ndarray,
+                                   peaks: List[PeakInfo]) -> DataQualityMetrics:
         """评估数据质量"""
-        if not data:
+        if values.size == 0:
             return DataQualityMetrics(
-                experiment_id=data[0].experiment_id if data else "",
+                experiment_id=experiment_id,
                 overall_score=0,
                 noise_level=0,
                 baseline_stability=0,
@@ -525,8 +502,6 @@ class ExperimentDataManager:
                 signal_to_noise_ratio=0
             )
 
-        values = [dp.value for dp in data]
-
         # 计算噪声水平
         noise_level = float(np.std(values))
 
@@ -547,7 +522,7 @@ class ExperimentDataManager:
         overall_score = min(100, (baseline_stability + min(snr*10, 50) + peak_resolution) / 3)
 
         return DataQualityMetrics(
-            experiment_id=data[0].experiment_id,
+            experiment_id=experiment_id,
             overall_score=overall_score,
             noise_level=noise_level,
             baseline_stability=baseline_stability,
@@ -575,7 +550,7 @@ class ExperimentDataManager:
         return max(0, min(100, min_resolution))
 
     # 数据存储相关方法
-    async def _save_experiment_data(self, experiment_id: str, data_points: List[SensorDataPoint], summary: ExperimentDataSummary):
+    async def _save_experiment_data(self, experiment_id: str, batch: SensorDataBatch, summary: ExperimentDataSummary):
         """保存实验数据到数据库"""
         try:
             # 这里应该实现实际的数据库保存逻辑
@@ -586,7 +561,8 @@ class ExperimentDataManager:
                 f"保存实验数据: {experiment_id}",
                 {
                     "experiment_id": experiment_id,
-                    "data_points": len(data_points),
+                    "data_points": len(batch),
+                    "devices": batch.devices,
                     "summary": summary.dict()
                 }
             )
@@ -624,15 +600,15 @@ class ExperimentDataManager:
             logger.error(f"保存峰检测结果失败: {e}")
 
     # 数据检索相关方法
-    async def _get_experiment_raw_data(self, experiment_id: str) -> List[SensorDataPoint]:
+    async def _get_experiment_raw_data(self, experiment_id: str) -> SensorDataBatch:
         """获取实验原始数据"""
-        # 这里应该实现从数据库获取数据的逻辑
-        # 目前返回空列表
-        return []
+        # 采集中的实验直接使用内存缓冲区
+        # 这里应该实现从数据库获取已完成实验数据的逻辑
+        return self.data_buffers.get(experiment_id) or SensorDataBatch(experiment_id)
 
-    async def _get_experiment_processed_data(self, experiment_id: str) -> List[SensorDataPoint]:
+    async def _get_experiment_processed_data(self, experiment_id: str) -> SensorDataBatch:
         """获取实验处理后数据"""
-        return []
+        return self.processed_buffers.get(experiment_id) or SensorDataBatch(experiment_id)
 
     async def _get_experiment_peaks(self, experiment_id: str) -> List[PeakInfo]:
         """获取实验峰信息"""
@@ -653,9 +629,11 @@ class ExperimentDataManager:
             data_quality_score=0
         )
 
-    async def _calculate_quality_metrics(self, data: List[SensorDataPoint]) -> DataQualityMetrics:
+    async def _calculate_quality_metrics(self, batch: SensorDataBatch) -> DataQualityMetrics:
         """计算数据质量指标"""
-        return await self._assess_data_quality(data, [])
+        series = batch.find_series()
+        values = series.values_array() if series is not None else np.empty(0)
+        return await self._assess_data_quality(batch.experiment_id, values, [])
 
     # 数据导出相关方法
     async def _export_to_csv(self, request: DataExportRequest, raw_data, processed_data, peaks, metadata) -> List[str]:
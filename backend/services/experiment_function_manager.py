@@ -9,7 +9,7 @@ import time
 import json
 import uuid
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from models.experiment_function_models import (
     ExperimentConfig,
     ExperimentProgress,
@@ -19,9 +19,11 @@ from models.experiment_function_models import (
 )
 from core.mqtt_manager import MQTTManager
 from data.database_utils import ChromatographyDB
+from data.elution_curve_store import ElutionCurveChunkStore
 from services.tube_manager import TubeCollectionManager
 from services.system_preprocessing_manager import SystemPreprocessingManager
 from hardware.host_devices.pump_controller import PumpController
+from utils.signal_buffer import DetectorSignalBuffer
 
 logger = logging.getLogger(__name__)
 
@@ -46,6 +48,8 @@ class ExperimentFunctionManager:
         self.tube_managers: Dict[str, TubeCollectionManager] = {}
         # 检测器信号订阅主题
         self.detector_signal_topic = "chromatography/detector/detector_1/signal"
+        # 每个实验注册的信号处理器（同一主题可能有多个订阅者，取消订阅时只移除自己的处理器）
+        self.detector_signal_handlers: Dict[str, Callable] = {}
 
         # 收集控制相关主题
         self.collection_control_topic_template = "experiments/{}/collection/control"
@@ -65,6 +69,7 @@ class ExperimentFunctionManager:
         # 信号数据备份控制
         self.backup_tasks: Dict[str, asyncio.Task] = {}  # 每个实验的备份任务
         self.experiment_history_ids: Dict[str, str] = {}  # 每个实验对应的history_id
+        self.elution_curve_store = ElutionCurveChunkStore(self.db)  # 洗脱曲线分块存储
 
     async def start_experiment(self, config: ExperimentConfig) -> ExperimentProgress:
         """启动实验"""
@@ -116,7 +121,7 @@ class ExperimentFunctionManager:
         progress.experiment_start_timestamp = time.time()
 
         # 初始化检测器信号收集相关字段
-        progress.detector_signal_cache = []
+        progress.detector_signal_cache = DetectorSignalBuffer()
         progress.signal_collection_active = False
 
 
@@ -964,6 +969,7 @@ class ExperimentFunctionManager:
                 self._handle_detector_signal(experiment_id, topic, data)
 
             # 订阅MQTT主题
+            self.detector_signal_handlers[experiment_id] = signal_handler
             success = await self.mqtt_manager.subscribe_topic(
                 self.detector_signal_topic,
                 handler=signal_handler
@@ -992,10 +998,9 @@ class ExperimentFunctionManager:
 
             # 处理信号数据 - 期望格式: [1.73427, 2.61003]
             if isinstance(data, list) and len(data) >= 2:
-                signal_data = data[:2]  # 只取前两个值
-                progress.detector_signal_cache.append(signal_data)
+                progress.detector_signal_cache.append(float(data[0]), float(data[1]))  # 只取前两个值
 
-                logger.debug(f"收集信号数据: {signal_data} for experiment {experiment_id}")
+                logger.debug(f"收集信号数据: {data[:2]} for experiment {experiment_id}")
 
                 # 可选：定期发布信号收集状态
                 if len(progress.detector_signal_cache) % 100 == 0:  # 每100个数据点发布一次状态
@@ -1155,17 +1160,20 @@ class ExperimentFunctionManager:
                     "action": "stop_collection",
                     "history_id": history_id,
                     "total_signal_points": len(progress.detector_signal_cache),
-                    "signal_data_sample": progress.detector_signal_cache[-10:] if progress.detector_signal_cache else [],  # 最后10个数据点
+                    "signal_data_sample": progress.detector_signal_cache.tail(10),  # 最后10个数据点
                     "timestamp": datetime.now().isoformat()
                 }
             )
 
             # 取消订阅信号主题
-            await self.mqtt_manager.unsubscribe_topic(self.detector_signal_topic)
+            signal_handler = self.detector_signal_handlers.pop(experiment_id, None)
+            if signal_handler:
+                await self.mqtt_manager.unsubscribe_topic(self.detector_signal_topic, handler=signal_handler)
 
-            # 清理history_id
+            # 清理history_id及分块存储的写入状态
             if experiment_id in self.experiment_history_ids:
-                del self.experiment_history_ids[experiment_id]
+                history_id = self.experiment_history_ids.pop(experiment_id)
+                self.elution_curve_store.release(history_id)
 
         except Exception as e:
             logger.error(f"停止信号收集时出错: {e}")
@@ -1205,7 +1213,7 @@ class ExperimentFunctionManager:
             logger.error(f"备份循环任务异常 [{experiment_id}]: {e}")
 
     async def _backup_elution_curve_to_db(self, experiment_id: str):
-        """备份洗脱曲线数据到数据库的experiment_history表"""
+        """备份洗脱曲线数据：新增信号点追加写入分块表，experiment_history只保存元数据"""
         try:
             if experiment_id not in self.running_experiments:
                 logger.warning(f"实验未找到，跳过备份: {experiment_id}")
@@ -1218,77 +1226,85 @@ class ExperimentFunctionManager:
                 logger.error(f"未找到history_id，跳过备份: {experiment_id}")
                 return
 
-            # 获取信号数据（保持原格式：[[signal_a, signal_b], ...]）
-            signal_data = progress.detector_signal_cache.copy()
+            # 只取上次备份之后新增的信号点（零拷贝视图，不复制缓存）
+            persisted_count = self.elution_curve_store.persisted_points(history_id)
+            new_points = progress.detector_signal_cache.view(persisted_count)
 
-            if not signal_data:
-                logger.debug(f"没有信号数据，跳过备份: {experiment_id}")
+            if not len(new_points):
+                logger.debug(f"没有新增信号数据，跳过备份: {experiment_id}")
                 return
 
-            # 构建洗脱曲线JSON数据
-            elution_curve_data = {
-                "experiment_id": experiment_id,
-                "history_id": history_id,
-                "data_points": len(signal_data),
-                "sampling_rate_hz": 1.0,  # 每秒1个数据点
-                "channels": ["A", "B"],  # 双通道
-                "signal_data": signal_data,  # [[signal_a, signal_b], ...] 格式，下标=秒数
-                "last_updated": datetime.now().isoformat(),
-                "backup_info": {
-                    "backup_time": datetime.now().isoformat(),
-                    "data_format": "array_index_as_seconds",
-                    "note": "数组下标代表从实验开始的秒数"
-                }
-            }
-
-            # 转换为JSON字符串
-            elution_curve_json = json.dumps(elution_curve_data, ensure_ascii=False)
-
-            # 检查是否已存在该history_id的记录
-            existing_records = self.db.query_data(
-                "experiment_history",
-                where_condition="history_id = ?",
-                where_params=(history_id,)
-            )
-
             current_time = datetime.now().isoformat()
 
-            if existing_records:
-                # 更新现有记录
-                self.db.update_data(
-                    "experiment_history",
-                    {
-                        "elution_curve": elution_curve_json,
-                        "end_time": current_time,
-                        "updated_at": current_time
-                    },
-                    "history_id = ?",
-                    (history_id,)
-                )
-                logger.debug(f"更新洗脱曲线数据: {history_id}, 数据点: {len(signal_data)}")
+            # 数据块和元数据在同一事务中写入：要么都提交，要么都回滚
+            try:
+                with self.db.get_connection() as cursor:
+                    cursor.execute("SELECT 1 FROM experiment_history WHERE history_id = ?", (history_id,))
+                    history_exists = cursor.fetchone() is not None
+
+                    total_points = self.elution_curve_store.append_values(history_id, new_points, cursor=cursor)
+                    elution_curve_json = json.dumps(
+                        self._elution_curve_metadata(experiment_id, history_id, total_points),
+                        ensure_ascii=False
+                    )
+
+                    if history_exists:
+                        # 更新现有记录
+                        cursor.execute(
+                            "UPDATE experiment_history SET elution_curve = ?, end_time = ? WHERE history_id = ?",
+                            (elution_curve_json, current_time, history_id)
+                        )
+                    else:
+                        # 创建新记录
+                        cursor.execute(
+                            "INSERT INTO experiment_history "
+                            "(history_id, experiment_id, start_time, end_time, elution_curve, created_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            (history_id, int(experiment_id),
+                             progress.start_time.isoformat() if progress.start_time else current_time,
+                             current_time, elution_curve_json, current_time)
+                        )
+            except Exception:
+                # 事务已回滚，丢弃内存中的写入位置，下次备份从数据库重新定位
+                self.elution_curve_store.release(history_id)
+                raise
+
+            if history_exists:
+                logger.debug(f"追加洗脱曲线数据: {history_id}, 新增: {len(new_points)}, 总数据点: {total_points}")
             else:
-                # 创建新记录
-                self.db.insert_data("experiment_history", {
-                    "history_id": history_id,
-                    "experiment_id": int(experiment_id),
-                    "start_time": progress.start_time.isoformat() if progress.start_time else current_time,
-                    "end_time": current_time,
-                    "elution_curve": elution_curve_json,
-                    "created_at": current_time,
-                    "updated_at": current_time
-                })
-                logger.info(f"创建洗脱曲线记录: {history_id}, 数据点: {len(signal_data)}")
+                logger.info(f"创建洗脱曲线记录: {history_id}, 数据点: {total_points}")
 
         except Exception as e:
             logger.error(f"备份洗脱曲线数据失败 [{experiment_id}]: {e}")
 
-    async def get_signal_data(self, experiment_id: str) -> List[List[float]]:
-        """获取实验的信号数据"""
+    def _elution_curve_metadata(self, experiment_id: str, history_id: str, total_points: int) -> Dict[str, Any]:
+        """洗脱曲线元数据（大小固定，不包含信号数组）"""
+        return {
+            "experiment_id": experiment_id,
+            "history_id": history_id,
+            "data_points": total_points,
+            "sampling_rate_hz": 1.0,  # 每秒1个数据点
+            "channels": ["A", "B"],  # 双通道
+            "storage": {
+                "table": self.elution_curve_store.TABLE,
+                "chunk_points": self.elution_curve_store.chunk_points,
+                "encoding": "float64_le_interleaved"
+            },
+            "last_updated": datetime.now().isoformat(),
+            "backup_info": {
+                "backup_time": datetime.now().isoformat(),
+                "data_format": "array_index_as_seconds",
+                "note": "数组下标代表从实验开始的秒数，信号数据按块存储于elution_curve_chunks表"
+            }
+        }
+
+    async def get_signal_data(self, experiment_id: str) -> memoryview:
+        """获取实验的信号数据（只读零拷贝视图，形状 [n, 2]，tolist() 得到 [[signal_a, signal_b], ...]）"""
         if experiment_id not in self.running_experiments:
-            return []
+            return DetectorSignalBuffer(capacity=1).view()
 
         progress = self.running_experiments[experiment_id]
-        return progress.detector_signal_cache.copy()  # 返回副本避免外部修改
+        return progress.detector_signal_cache.view()  # 只读视图避免外部修改
 
     # ==================== 三种停止实验情况的专用方法 ====================
 
@@ -1415,7 +1431,9 @@ class ExperimentFunctionManager:
             self.backup_tasks.pop(experiment_id, None)
 
         # 清理history_id（防止遗漏）
-        self.experiment_history_ids.pop(experiment_id, None)
+        history_id = self.experiment_history_ids.pop(experiment_id, None)
+        if history_id:
+            self.elution_curve_store.release(history_id)
 
         # 清理收集监控任务
         if experiment_id in self.collection_monitor_tasks:
@@ -1482,8 +1500,9 @@ class ExperimentFunctionManager:
         try:
             control_topic = self.collection_control_topic_template.format(experiment_id)
 
-            def control_handler(topic: str, data: Any):
-                asyncio.create_task(self._handle_collection_control(experiment_id, data))
+            # MQTTManager 在事件循环中调用处理器，协程处理器会被直接等待
+            async def control_handler(topic: str, data: Any):
+                await self._handle_collection_control(experiment_id, data)
 
             success = await self.mqtt_manager.subscribe_topic(control_topic, control_handler)
             if success:
@@ -7,7 +7,7 @@ import asyncio
 import logging
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-from core.mqtt_manager import MQTTManager
+from core.mqtt_manager import MQTTManager, create_mqtt_manager
 from core.database import DatabaseManager
 from models.initialization_models import (
     SystemInitConfig,
@@ -128,7 +128,7 @@ class InitializationManager:
         """初始化MQTT连接"""
         try:
             logger.info(f"初始化MQTT连接: {broker}:{port}")
-            self.mqtt_manager = MQTTManager()
+            self.mqtt_manager = create_mqtt_manager()
             self.mqtt_manager.broker_host = broker
             self.mqtt_manager.broker_port = port
 
@@ -318,6 +318,11 @@ class InitializationManager:
             await self.mqtt_manager.disconnect()
             logger.info("MQTT连接已关闭")
 
+        # 关闭数据库连接
+        if self.db_manager:
+            await self.db_manager.close()
+            logger.info("数据库连接已关闭")
+
         # 关闭设备
         for device_id in self.initialized_devices:
             self.initialized_devices[device_id]["status"] = "shutdown"
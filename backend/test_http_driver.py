@@ -0,0 +1,224 @@
+"""
+测试HTTP驱动（本地 asyncio 服务器）
+Test HTTP Driver against a local server
+
+覆盖 keep-alive 连接复用、分块响应体、复用连接失效时的重发、
+幂等/非幂等请求在 5xx 和超时时的重试差异，以及过长响应头的错误映射。
+"""
+
+import asyncio
+
+import pytest
+
+from hardware.drivers.http_driver import MAX_HEADER_BYTES, HTTPClient, HTTPConfig, HTTPRequestError
+
+
+def _response(status: int = 200, body: bytes = b"ok", headers=()) -> bytes:
+    lines = [f"HTTP/1.1 {status} X", f"Content-Length: {len(body)}", *headers]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+class _Server:
+    """
+    按脚本应答的本地HTTP服务器
+
+    handler(n, method, path) 返回完整的响应字节；返回 None 时不应答并关闭连接。
+    requests 记录 (连接序号, 方法, 路径)。
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.connections = 0
+        self.requests = []
+        self._tasks = set()
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def client(self, **config) -> HTTPClient:
+        config.setdefault("timeout", 2.0)
+        config.setdefault("retry_count", 2)
+        config.setdefault("retry_backoff", 0.01)
+        return HTTPClient(HTTPConfig(base_url=f"http://127.0.0.1:{self.port}", **config))
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._tasks.add(asyncio.current_task())
+        self.connections += 1
+        connection = self.connections
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = request_line.split(" ", 2)
+                headers = {name.strip().lower(): value.strip()
+                           for name, value in (line.split(":", 1) for line in header_lines if ":" in line)}
+                if int(headers.get("content-length", 0)):
+                    await reader.readexactly(int(headers["content-length"]))
+                self.requests.append((connection, method, path))
+
+                reply = await self.handler(len(self.requests), method, path)
+                if reply is None:
+                    break
+                writer.write(reply)
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+            self._tasks.discard(asyncio.current_task())
+
+
+def test_keep_alive_reuse():
+    """连续请求复用同一个连接"""
+    async def scenario():
+        async def handler(n, method, path):
+            return _response(body=f"{n}".encode())
+
+        async with _Server(handler) as server:
+            client = server.client()
+            bodies = [(await client.get("/device/data")).text for _ in range(3)]
+            await client.close()
+
+        assert bodies == ["1", "2", "3"]
+        assert server.connections == 1
+        assert client.session.get_stats()["reused"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_chunked_body():
+    """分块响应体（含 chunk 扩展和 trailer）按顺序拼接，之后连接仍可复用"""
+    async def scenario():
+        async def handler(n, method, path):
+            if n == 1:
+                return (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                        b"5;ext=1\r\nhello\r\n6\r\n world\r\n0\r\nX-Trailer: 1\r\n\r\n")
+            return _response(body=b"after")
+
+        async with _Server(handler) as server:
+            client = server.client()
+            first = await client.get("/chunked")
+            second = await client.get("/plain")
+            await client.close()
+
+        assert first.content == b"hello world"
+        assert second.content == b"after"
+        assert server.connections == 1
+
+    asyncio.run(scenario())
+
+
+def test_stale_connection_resend():
+    """复用的空闲连接已被对端关闭（未返回任何字节）时换新连接重发一次"""
+    async def scenario():
+        async def handler(n, method, path):
+            # 第二个请求到达时服务器关闭了第一个连接
+            return None if n == 2 else _response(body=f"{n}".encode())
+
+        async with _Server(handler) as server:
+            client = server.client(retry_count=0)
+            await client.get("/first")
+            response = await client.post("/valve/on", {"valve": 1})
+            await client.close()
+
+        assert response.text == "3"
+        assert server.connections == 2
+        assert client.retries == 0
+
+    asyncio.run(scenario())
+
+
+def test_5xx_retried_only_when_idempotent():
+    """5xx：幂等请求按配置重试，非幂等请求只发送一次；重试用尽后都返回最后的响应"""
+    async def scenario():
+        async def handler(n, method, path):
+            return _response(503, b"busy") if n < 6 else _response()
+
+        async with _Server(handler) as server:
+            client = server.client(retry_count=2)
+            exhausted = await client.get("/device/data", idempotent=True)
+            idempotent_requests = len(server.requests)
+
+            response = await client.post("/valve/on", {"valve": 1})
+            recovered = await client.get("/device/data", idempotent=True)
+            await client.close()
+
+        assert exhausted.status_code == 503
+        assert idempotent_requests == 3
+        assert response.status_code == 503
+        assert recovered.status_code == 200
+        assert len(server.requests) == 6
+
+    asyncio.run(scenario())
+
+
+def test_timeout_retried_only_when_idempotent():
+    """请求发出后超时：幂等请求重试，非幂等请求不重发"""
+    async def scenario():
+        async def handler(n, method, path):
+            await asyncio.sleep(1.0)
+            return _response()
+
+        async with _Server(handler) as server:
+            client = server.client(timeout=0.1, retry_count=2)
+            with pytest.raises(HTTPRequestError):
+                await client.get("/device/data", idempotent=True)
+            await asyncio.sleep(0.05)
+            idempotent_requests = len(server.requests)
+
+            with pytest.raises(HTTPRequestError):
+                await client.post("/valve/on", {"valve": 1})
+            await asyncio.sleep(0.05)
+            await client.close()
+
+        assert idempotent_requests == 3
+        assert len(server.requests) == 4
+
+    asyncio.run(scenario())
+
+
+def test_connect_failure_retried():
+    """请求发出前的连接失败总是按配置重试"""
+    async def scenario():
+        async with _Server(None) as server:
+            port = server.port
+        client = HTTPClient(HTTPConfig(base_url=f"http://127.0.0.1:{port}", timeout=1.0,
+                                       retry_count=2, retry_backoff=0.01))
+        with pytest.raises(HTTPRequestError):
+            await client.post("/valve/on", {"valve": 1})
+        assert client.retries == 2
+
+    asyncio.run(scenario())
+
+
+def test_oversized_header_raises_request_error():
+    """响应头超过上限时抛出 HTTPRequestError，而不是 LimitOverrunError"""
+    async def scenario():
+        async def handler(n, method, path):
+            return _response(headers=[f"X-Big: {'a' * (MAX_HEADER_BYTES + 10)}"])
+
+        async with _Server(handler) as server:
+            client = server.client(retry_count=0)
+            with pytest.raises(HTTPRequestError, match="响应头"):
+                await client.get("/device/data", idempotent=True)
+            await client.close()
+
+    asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,44 @@
+"""
+测试检测器信号缓冲区
+Test Detector Signal Buffer
+"""
+
+from models.experiment_function_models import ExperimentPhase, ExperimentProgress, ExperimentStatus
+from utils.signal_buffer import DetectorSignalBuffer
+
+
+def test_empty_buffer():
+    """空缓冲区的视图、列表、尾部读取"""
+    buffer = DetectorSignalBuffer(capacity=1)
+    assert len(buffer.view()) == 0
+    assert buffer.view().nbytes == 0
+    assert buffer.tolist() == []
+    assert buffer.tail(10) == []
+    assert buffer.tobytes() == b""
+    assert buffer[:] == []
+
+
+def test_empty_slice():
+    """非空缓冲区的空切片"""
+    buffer = DetectorSignalBuffer([[1.0, 2.0], [3.0, 4.0]])
+    assert buffer.view(2).tolist() == []
+    assert buffer.view(5, 1).tolist() == []
+    assert buffer.tolist(1, 1) == []
+    assert buffer.view(1).tolist() == [[3.0, 4.0]]
+    assert buffer.tail(1) == [[3.0, 4.0]]
+
+
+def test_progress_serialization_without_samples():
+    """没有采样的实验进度可以序列化"""
+    progress = ExperimentProgress(experiment_id="exp_empty", current_phase=ExperimentPhase.PRE_EXPERIMENT,
+                                  current_status=ExperimentStatus.PENDING, progress_percentage=0)
+    assert progress.model_dump()["detector_signal_cache"] == []
+    progress.detector_signal_cache.append(1.0, 2.0)
+    assert progress.model_dump()["detector_signal_cache"] == [[1.0, 2.0]]
+
+
+if __name__ == "__main__":
+    test_empty_buffer()
+    test_empty_slice()
+    test_progress_serialization_without_samples()
+    print("所有测试通过")
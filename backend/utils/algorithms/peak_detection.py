@@ -0,0 +1,349 @@
+"""
+色谱峰检测与积分
+Vectorized Peak Detection and Integration
+
+基于实际采样时间（分钟）工作：
+- 候选峰：一阶差分由正变为非正的点（导数过零），按峰高阈值过滤
+- 显著性（prominence）：向两侧找到更高峰之前的最低点，按显著性过滤噪声峰
+- 默认显著性阈值：基线噪声在整段数据上的期望峰峰值 2·√(2·ln n)·σ，纯噪声不会被报告为峰
+- 基线：峰簇（信号高于基线噪声带的连续区域）两侧噪声带内的中位数连线
+- 峰形参数在按最窄峰宽自适应的滑动平均信号上确定，面积对原始信号积分
+- 积分区间：相邻峰之间的谷点，并在信号回落到基线噪声带时截止；
+  重叠峰在谷点处垂直分割（drop-line），各自积分到峰簇基线
+- 峰高、峰面积均相对峰簇基线：梯形或 Simpson 积分
+- 半峰宽、不对称因子（10%峰高处）、理论塔板数 N = 5.54 (tR / W½)²
+
+逐点运算全部为 NumPy 向量化；只有候选峰/峰级别的处理为 Python 循环。
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+INTEGRATION_METHODS = ("trapezoid", "simpson")
+# 估计峰簇两侧基线时使用的噪声带点数
+BASELINE_POINTS = 32
+
+
+@dataclass
+class DetectedPeak:
+    """检测到的峰（时间单位为分钟）"""
+    index: int                       # 峰顶点下标
+    retention_time: float            # 保留时间（抛物线插值后的峰顶时间）
+    height: float                    # 峰顶到峰簇基线的高度
+    prominence: float                # 显著性
+    area: float                      # 积分区间内信号与峰簇基线之间的面积
+    width_at_half_height: float      # 半峰宽
+    asymmetry_factor: Optional[float]
+    theoretical_plates: Optional[int]
+    start_index: int                 # 积分起点
+    end_index: int                   # 积分终点
+    start_time: float
+    end_time: float
+    signal_to_noise: float
+
+
+def estimate_noise(values: np.ndarray) -> float:
+    """基于一阶差分中位数绝对偏差的噪声标准差估计（对峰不敏感）"""
+    if values.size < 3:
+        return 0.0
+    diff = np.diff(values)
+    mad = np.median(np.abs(diff - np.median(diff)))
+    return float(mad / 0.6745 / np.sqrt(2))
+
+
+def noise_prominence(noise: float, size: int) -> float:
+    """n 个高斯噪声点的期望峰峰值 2·√(2·ln n)·σ，作为默认最小显著性"""
+    if size < 2:
+        return 0.0
+    return float(2.0 * np.sqrt(2.0 * np.log(size)) * noise)
+
+
+def _moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """居中滑动平均（两端窗口截短），基于累积和，O(n)"""
+    if window <= 1:
+        return values
+    half = window // 2
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    index = np.arange(values.size)
+    lo = np.maximum(index - half, 0)
+    hi = np.minimum(index + half + 1, values.size)
+    return (cumulative[hi] - cumulative[lo]) / (hi - lo)
+
+
+def _smoothing_window(values: np.ndarray, peaks: np.ndarray, prominence: np.ndarray,
+                      left_base: np.ndarray, right_base: np.ndarray) -> int:
+    """按最窄峰的半峰宽（点数）的 1/8 取平滑窗口（奇数），对峰形的展宽可忽略"""
+    narrowest = values.size
+    for apex, prom, lb, rb in zip(peaks.tolist(), prominence.tolist(), left_base.tolist(), right_base.tolist()):
+        level = values[apex] - 0.5 * prom
+        left = np.flatnonzero(values[lb:apex + 1] <= level)
+        right = np.flatnonzero(values[apex:rb + 1] <= level)
+        left_index = lb + left[-1] if left.size else lb
+        right_index = apex + right[0] if right.size else rb
+        narrowest = min(narrowest, right_index - left_index)
+    return max(narrowest // 8, 1) | 1
+
+
+def _local_maxima(values: np.ndarray) -> np.ndarray:
+    """导数由正变为非正的点；平台取起点"""
+    diff = np.diff(values)
+    return np.flatnonzero((diff[:-1] > 0) & (diff[1:] <= 0)) + 1
+
+
+def _segment_argmin(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    每个闭区间 [starts[k], ends[k]] 内最小值的下标（向量化，区间按顺序且互不重叠，端点可共享）
+    """
+    lengths = ends - starts + 1
+    index = np.repeat(starts, lengths) + (np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths))
+    segment_values = values[index]
+    offsets = np.cumsum(lengths) - lengths
+    minima = np.minimum.reduceat(segment_values, offsets)
+    is_min = segment_values == np.repeat(minima, lengths)
+    first = np.flatnonzero(is_min)
+    return index[first[np.searchsorted(first, offsets)]]
+
+
+def _base_points(values: np.ndarray, peaks: np.ndarray, valleys: np.ndarray,
+                 left_edge: int, right_edge: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    显著性基点：向左（右）直到遇到更高的峰为止的最低点
+
+    valleys[k] 为 peaks[k] 与 peaks[k+1] 之间的最低点，left_edge/right_edge 为首峰左侧、末峰右侧的最低点。
+    使用单调栈，每个峰只入栈出栈一次。
+    """
+    heights = values[peaks].tolist()
+    valley_values = values[valleys].tolist()
+    count = len(heights)
+
+    def sweep(order, gap_index, edge):
+        bases = [0] * count
+        stack: List[Tuple[float, float, int]] = []  # (峰高, 区域最小值, 区域最小值下标)
+        for position, k in enumerate(order):
+            if position == 0:
+                low, low_index = values[edge], edge
+            else:
+                g = gap_index(k)
+                low, low_index = valley_values[g], int(valleys[g])
+            while stack and stack[-1][0] <= heights[k]:
+                _, top_low, top_index = stack.pop()
+                if top_low < low:
+                    low, low_index = top_low, top_index
+            # 栈为空时区域已累积到边界，即该方向没有更高的峰
+            bases[k] = low_index
+            stack.append((heights[k], low, low_index))
+        return np.asarray(bases, dtype=np.int64)
+
+    left = sweep(range(count), lambda k: k - 1, left_edge)
+    right = sweep(range(count - 1, -1, -1), lambda k: k, right_edge)
+    return left, right
+
+
+def _crossing(times: np.ndarray, values: np.ndarray, start: int, stop: int, level: float,
+              rising: bool) -> Optional[float]:
+    """在 [start, stop] 内线性插值求信号穿过 level 的时间"""
+    segment = values[start:stop + 1]
+    below = np.flatnonzero(segment <= level)
+    if below.size == 0:
+        return None
+    if rising:
+        i = start + below[-1]          # 峰左侧最后一个低于 level 的点
+        j = i + 1
+    else:
+        j = start + below[0]           # 峰右侧第一个低于 level 的点
+        i = j - 1
+    if j >= values.size or i < 0:
+        return None
+    y0, y1 = values[i], values[j]
+    if y1 == y0:
+        return float(times[i])
+    return float(times[i] + (level - y0) * (times[j] - times[i]) / (y1 - y0))
+
+
+def _simpson(t: np.ndarray, y: np.ndarray) -> float:
+    """非等间距复合 Simpson 积分（奇数个区间时最后一段用梯形）"""
+    if t.size < 3:
+        return float(np.sum(0.5 * (y[1:] + y[:-1]) * np.diff(t)))
+    h = np.diff(t)
+    pairs = (h.size // 2) * 2
+    h0, h1 = h[0:pairs:2], h[1:pairs:2]
+    y0, y1, y2 = y[0:pairs:2], y[1:pairs + 1:2], y[2:pairs + 1:2]
+    total = np.sum((h0 + h1) / 6.0 * (
+        (2 - h1 / h0) * y0 + (h0 + h1) ** 2 / (h0 * h1) * y1 + (2 - h0 / h1) * y2))
+    if pairs < h.size:
+        total += 0.5 * h[-1] * (y[-1] + y[-2])
+    return float(total)
+
+
+def detect_peaks(times, values, threshold: float = 0.0, min_height: float = 0.0,
+                 min_prominence: Optional[float] = None, min_width: float = 0.0,
+                 max_width: Optional[float] = None,
+                 integration: str = "trapezoid") -> List[DetectedPeak]:
+    """
+    检测并积分色谱峰
+
+    Args:
+        times: 采样时间（分钟，单调递增）
+        values: 信号值
+        threshold / min_height: 峰顶最低值
+        min_prominence: 最小显著性，默认 max(threshold, noise_prominence(噪声, 点数))
+        min_width / max_width: 半峰宽范围（分钟）
+        integration: "trapezoid" 或 "simpson"
+
+    Returns:
+        List[DetectedPeak]: 按保留时间排序
+    """
+    if integration not in INTEGRATION_METHODS:
+        raise ValueError(f"不支持的积分方法: {integration}")
+
+    t = np.ascontiguousarray(times, dtype=np.float64)
+    y = np.ascontiguousarray(values, dtype=np.float64)
+    n = y.size
+    if n < 3 or t.size != n:
+        return []
+
+    noise = estimate_noise(y)
+    if min_prominence is None:
+        min_prominence = max(threshold, noise_prominence(noise, n))
+
+    # 候选峰（按峰顶高度过滤后，更低的峰不影响显著性计算；
+    # 显著性不可能超过峰顶与全局最小值之差，先据此剔除大部分噪声极大值）
+    peaks = _local_maxima(y)
+    peaks = peaks[(y[peaks] >= max(threshold, min_height)) & (y[peaks] - y.min() >= min_prominence)]
+    if peaks.size == 0:
+        return []
+
+    # 相邻候选峰之间的谷点，以及两端到边界的最低点
+    if peaks.size > 1:
+        valleys = _segment_argmin(y, peaks[:-1], peaks[1:])
+    else:
+        valleys = np.empty(0, dtype=np.int64)
+    left_edge = int(np.argmin(y[:peaks[0] + 1]))
+    right_edge = int(peaks[-1] + np.argmin(y[peaks[-1]:]))
+
+    left_base, right_base = _base_points(y, peaks, valleys, left_edge, right_edge)
+    prominence = y[peaks] - np.maximum(y[left_base], y[right_base])
+    keep = prominence >= min_prominence
+    peaks, prominence = peaks[keep], prominence[keep]
+    if peaks.size == 0:
+        return []
+
+    # 峰形参数（积分端点、峰顶、峰宽）在平滑后的信号上确定，避免噪声使端点和半峰宽向内偏移；
+    # 面积仍对原始信号积分
+    window = _smoothing_window(y, peaks, prominence, left_base[keep], right_base[keep]) if noise > 0 else 1
+    g = _moving_average(y, window)
+    g_noise = noise / np.sqrt(window)
+
+    # 积分区间：相邻保留峰之间的谷点，且信号回落到基线噪声带即截止
+    if peaks.size > 1:
+        valleys = _segment_argmin(g, peaks[:-1], peaks[1:])
+    else:
+        valleys = np.empty(0, dtype=np.int64)
+    left_valley = np.concatenate(([int(np.argmin(g[:peaks[0] + 1]))], valleys))
+    right_valley = np.concatenate((valleys, [int(peaks[-1] + np.argmin(g[peaks[-1]:]))]))
+
+    level = float(np.median(g)) + 3.0 * g_noise
+    low = np.flatnonzero(g <= level)
+    before = np.searchsorted(low, peaks, side="left") - 1
+    after = np.searchsorted(low, peaks, side="right")
+    if low.size:
+        left_low = np.where(before >= 0, low[np.clip(before, 0, low.size - 1)], -1)
+        right_low = np.where(after < low.size, low[np.clip(after, 0, low.size - 1)], n)
+        start = np.maximum(left_valley, left_low)
+        end = np.minimum(right_valley, right_low)
+    else:
+        start, end = left_valley, right_valley
+
+    def baseline_anchor(k: int, left: bool, fallback: int) -> Tuple[float, float]:
+        """峰簇一侧的基线点：紧邻峰簇的噪声带点的中位数；该侧没有噪声带点时取积分端点"""
+        if not 0 <= k < low.size:
+            return float(t[fallback]), float(y[fallback])
+        window = low[max(k - BASELINE_POINTS + 1, 0):k + 1] if left else low[k:k + BASELINE_POINTS]
+        return float(t[low[k]]), float(np.median(y[window]))
+
+    # 梯形累积积分，用于按区间快速求面积
+    cumulative = np.concatenate(([0.0], np.cumsum(0.5 * (y[1:] + y[:-1]) * np.diff(t))))
+
+    results: List[DetectedPeak] = []
+    for _, prom, s, e, b_k, a_k in zip(peaks.tolist(), prominence.tolist(), start.tolist(), end.tolist(),
+                                         before.tolist(), after.tolist()):
+        if e - s < 2:
+            continue
+        t_s, t_e = t[s], t[e]
+
+        # 峰簇基线（重叠峰共享同一条基线，谷点处垂直分割）
+        bt_l, by_l = baseline_anchor(b_k, True, s)
+        bt_r, by_r = baseline_anchor(a_k, False, e)
+        slope = (by_r - by_l) / (bt_r - bt_l) if bt_r > bt_l else 0.0
+
+        def baseline(at: float) -> float:
+            return by_l + slope * (at - bt_l)
+
+        # 平滑信号在积分区间内的最高点作为峰顶，抛物线插值峰顶位置
+        apex = min(max(s + int(np.argmax(g[s:e + 1])), 1), n - 2)
+        y_l, y_c, y_r = g[apex - 1], g[apex], g[apex + 1]
+        curvature = y_l - 2 * y_c + y_r
+        shift = 0.5 * (y_l - y_r) / curvature if curvature < 0 else 0.0
+        shift = min(max(shift, -0.5), 0.5)
+        neighbour = apex + 1 if shift >= 0 else apex - 1
+        retention = float(t[apex] + abs(shift) * (t[neighbour] - t[apex]))
+
+        base_at_apex = baseline(t[apex])
+        height = float(y_c - base_at_apex)
+        if height <= 0:
+            continue
+
+        # 半峰宽和10%峰高处的前后沿宽度；重叠峰一侧未回落到该高度时按另一侧对称估计
+        def width_at(fraction: float) -> Tuple[Optional[float], Optional[float]]:
+            level_at = base_at_apex + fraction * height
+            left = _crossing(t, g, s, apex, level_at, rising=True)
+            right = _crossing(t, g, apex, e, level_at, rising=False)
+            return left, right
+
+        half_left, half_right = width_at(0.5)
+        if half_left is None and half_right is None:
+            continue
+        if half_left is None:
+            half_left = 2 * retention - half_right
+        elif half_right is None:
+            half_right = 2 * retention - half_left
+        half_width = half_right - half_left
+        if half_width <= 0 or half_width < min_width or (max_width is not None and half_width > max_width):
+            continue
+
+        tenth_left, tenth_right = width_at(0.1)
+        asymmetry = None
+        if tenth_left is not None and tenth_right is not None and retention - tenth_left > 0:
+            asymmetry = (tenth_right - retention) / (retention - tenth_left)
+            asymmetry = asymmetry if asymmetry > 0 else None
+
+        plates = int(round(5.54 * (retention / half_width) ** 2)) if retention > 0 else 0
+
+        if integration == "simpson":
+            gross = _simpson(t[s:e + 1], y[s:e + 1])
+        else:
+            gross = cumulative[e] - cumulative[s]
+        area = gross - 0.5 * (baseline(t_s) + baseline(t_e)) * (t_e - t_s)
+
+        results.append(DetectedPeak(
+            index=apex,
+            retention_time=retention,
+            height=height,
+            prominence=float(prom),
+            area=max(float(area), 0.0),
+            width_at_half_height=half_width,
+            asymmetry_factor=asymmetry,
+            theoretical_plates=plates or None,
+            start_index=s,
+            end_index=e,
+            start_time=float(t_s),
+            end_time=float(t_e),
+            signal_to_noise=float(height / noise) if noise > 0 else float("inf")
+        ))
+
+    return results
+
+
+__all__ = ['DetectedPeak', 'detect_peaks', 'estimate_noise', 'noise_prominence', 'INTEGRATION_METHODS']
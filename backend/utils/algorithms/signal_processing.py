@@ -0,0 +1,259 @@
+"""
+色谱信号基线校正与噪声滤波
+Vectorized Baseline Correction and Noise Filtering
+
+所有函数输入输出均为一维 float64 连续数组，基于累加和/卷积实现，
+计算量为 O(n)（ALS 为每次迭代 O(n) 的五对角方程求解），不逐点构造对象。
+"""
+
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    from scipy.sparse.linalg import spsolve
+    SCIPY_AVAILABLE = True
+except ImportError:  # scipy为可选依赖，缺失时ALS使用内置的纯Python五对角求解（慢）
+    SCIPY_AVAILABLE = False
+
+
+def _as_array(values) -> np.ndarray:
+    return np.ascontiguousarray(values, dtype=np.float64)
+
+
+# ============= 滤波 =============
+
+def moving_average(values, window: int) -> np.ndarray:
+    """
+    居中移动平均（累加和实现）
+
+    第 i 点取 [i - window//2, i + window//2) 范围内的均值，边界处窗口截断，
+    与原逐点 np.mean 实现的结果一致。
+    """
+    y = _as_array(values)
+    n = y.size
+    half = max(int(window), 1) // 2
+    if n == 0 or half == 0:
+        return y.copy()
+
+    cumsum = np.concatenate(([0.0], np.cumsum(y)))
+    index = np.arange(n)
+    start = np.maximum(index - half, 0)
+    end = np.minimum(index + half, n)
+    return (cumsum[end] - cumsum[start]) / (end - start)
+
+
+def savitzky_golay(values, window: int, polyorder: int = 2) -> np.ndarray:
+    """
+    Savitzky–Golay 平滑（最小二乘多项式卷积核，边界镜像延拓）
+
+    Args:
+        window: 窗口长度，偶数时自动加1
+        polyorder: 多项式阶数，须小于窗口长度
+    """
+    y = _as_array(values)
+    window = max(int(window), 1)
+    if window % 2 == 0:
+        window += 1
+    if y.size < 2 or window < 3:
+        return y.copy()
+    if window > y.size:
+        window = y.size if y.size % 2 == 1 else y.size - 1
+    polyorder = min(int(polyorder), window - 1)
+
+    half = window // 2
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+    vandermonde = np.vander(offsets, polyorder + 1, increasing=True)
+    coefficients = np.linalg.pinv(vandermonde)[0]
+
+    padded = np.pad(y, half, mode="reflect")
+    return np.convolve(padded, coefficients[::-1], mode="valid")
+
+
+def gaussian_smooth(values, window: int, sigma: Optional[float] = None) -> np.ndarray:
+    """高斯核卷积平滑（sigma默认为窗口的1/6，边界镜像延拓）"""
+    y = _as_array(values)
+    window = max(int(window), 1)
+    if window % 2 == 0:
+        window += 1
+    if y.size < 2 or window < 3:
+        return y.copy()
+    half = min(window // 2, y.size - 1)
+    sigma = sigma or max(window / 6.0, 1e-6)
+
+    offsets = np.arange(-half, half + 1, dtype=np.float64)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    kernel /= kernel.sum()
+
+    padded = np.pad(y, half, mode="reflect")
+    return np.convolve(padded, kernel, mode="valid")
+
+
+# ============= 基线 =============
+
+def rolling_min(values, window: int) -> np.ndarray:
+    """
+    居中滑动最小值（van Herk / Gil-Werman 分块前后缀最小值，O(n)）
+    """
+    y = _as_array(values)
+    n = y.size
+    window = max(int(window), 1)
+    if n == 0 or window == 1:
+        return y.copy()
+
+    half = window // 2
+    padded = np.pad(y, (half, window - 1 - half), mode="edge")
+    blocks = -(-padded.size // window)
+    filled = np.full(blocks * window, np.inf)
+    filled[:padded.size] = padded
+    filled = filled.reshape(blocks, window)
+
+    prefix = np.minimum.accumulate(filled, axis=1).ravel()
+    suffix = np.minimum.accumulate(filled[:, ::-1], axis=1)[:, ::-1].ravel()
+    # 窗口 [i, i+window-1] 的最小值 = min(suffix[i], prefix[i+window-1])
+    return np.minimum(suffix[:n], prefix[window - 1:window - 1 + n])
+
+
+def rolling_min_baseline(values, window: int) -> np.ndarray:
+    """滑动最小值基线：先取滑动最小值，再以同样窗口移动平均平滑"""
+    return moving_average(rolling_min(values, window), window)
+
+
+def _solve_pentadiagonal(weights: np.ndarray, lam: float, rhs: np.ndarray) -> np.ndarray:
+    """
+    求解 (W + lam * D'D) z = rhs，D为二阶差分矩阵（对称正定五对角，LDL'分解）
+
+    仅在没有 scipy 时使用。分解和回代是逐点递推，无法用 numpy 向量化，这里是纯 Python 循环：
+    72000 点单次求解约 0.13 秒，ALS 迭代至收敛约 0.9 秒。长数据请安装 scipy，
+    或像 ExperimentDataManager 那样在线程中调用。
+    """
+    n = rhs.size
+    # D'D 的三条对角线
+    d0 = np.full(n, 6.0)
+    d0[[0, -1]] = 1.0
+    d0[[1, -2]] = 5.0
+    d1 = np.full(n - 1, -4.0)
+    d1[[0, -1]] = -2.0
+    d2 = np.ones(n - 2)
+
+    a = (weights + lam * d0).tolist()
+    b = (lam * d1).tolist()
+    c = (lam * d2).tolist()
+    z = rhs.tolist()
+
+    # LDL' 分解，L 为单位下三角带宽2
+    diag = [0.0] * n
+    l1 = [0.0] * (n - 1)
+    l2 = [0.0] * (n - 2)
+    for i in range(n):
+        value = a[i]
+        if i >= 1:
+            value -= l1[i - 1] ** 2 * diag[i - 1]
+        if i >= 2:
+            value -= l2[i - 2] ** 2 * diag[i - 2]
+        diag[i] = value
+        if i + 1 < n:
+            sub = b[i]
+            if i >= 1:
+                sub -= l1[i - 1] * l2[i - 1] * diag[i - 1]
+            l1[i] = sub / value
+        if i + 2 < n:
+            l2[i] = c[i] / value
+
+    # 前代、对角、回代
+    for i in range(1, n):
+        z[i] -= l1[i - 1] * z[i - 1] + (l2[i - 2] * z[i - 2] if i >= 2 else 0.0)
+    for i in range(n):
+        z[i] /= diag[i]
+    for i in range(n - 2, -1, -1):
+        z[i] -= l1[i] * z[i + 1] + (l2[i] * z[i + 2] if i + 2 < n else 0.0)
+    return np.asarray(z)
+
+
+def als_baseline(values, lam: float = 1e9, p: float = 0.01, iterations: int = 10) -> np.ndarray:
+    """
+    非对称最小二乘基线（Eilers & Boelens）
+
+    Args:
+        lam: 平滑系数，越大基线越平滑
+        p: 非对称权重，信号高于基线的点权重为 p，低于基线为 1-p
+        iterations: 重加权迭代次数
+
+    有 scipy 时使用稀疏求解；否则退回纯 Python 的 _solve_pentadiagonal，长数据明显较慢（见其说明）。
+    """
+    y = _as_array(values)
+    n = y.size
+    if n < 4:
+        return y.copy()
+
+    weights = np.ones(n)
+    baseline = y
+    if SCIPY_AVAILABLE:
+        diff = sparse.diags([1.0, -2.0, 1.0], [0, -1, -2], shape=(n, n - 2))
+        penalty = lam * diff.dot(diff.transpose())
+        for _ in range(max(int(iterations), 1)):
+            system = sparse.csc_matrix(sparse.spdiags(weights, 0, n, n) + penalty)
+            baseline = spsolve(system, weights * y)
+            updated = np.where(y > baseline, p, 1.0 - p)
+            if np.array_equal(updated, weights):
+                break
+            weights = updated
+    else:
+        for _ in range(max(int(iterations), 1)):
+            baseline = _solve_pentadiagonal(weights, lam, weights * y)
+            updated = np.where(y > baseline, p, 1.0 - p)
+            if np.array_equal(updated, weights):
+                break
+            weights = updated
+    return np.asarray(baseline, dtype=np.float64)
+
+
+# ============= 算法注册表 =============
+
+FILTER_METHODS: Dict[str, Callable[..., np.ndarray]] = {
+    "moving_average": lambda y, window, **kw: moving_average(y, window),
+    "savitzky_golay": lambda y, window, polyorder=2, **kw: savitzky_golay(y, window, polyorder),
+    "gaussian": lambda y, window, **kw: gaussian_smooth(y, window),
+}
+
+BASELINE_METHODS: Dict[str, Callable[..., np.ndarray]] = {
+    "moving_average": lambda y, window, **kw: moving_average(y, window),
+    "rolling_min": lambda y, window, **kw: rolling_min_baseline(y, window),
+    "als": lambda y, window, lam=1e9, p=0.01, iterations=10, **kw: als_baseline(y, lam, p, iterations),
+}
+
+# 兼容旧的方法名
+BASELINE_METHODS["automatic"] = BASELINE_METHODS["moving_average"]
+
+
+def estimate_baseline(values, method: str = "moving_average", window: int = 50, **options) -> np.ndarray:
+    """按方法名估计基线"""
+    try:
+        estimator = BASELINE_METHODS[method]
+    except KeyError:
+        raise ValueError(f"不支持的基线校正方法: {method}")
+    return estimator(_as_array(values), window, **options)
+
+
+def smooth(values, method: str = "moving_average", window: int = 5, **options) -> np.ndarray:
+    """按方法名滤波"""
+    try:
+        smoother = FILTER_METHODS[method]
+    except KeyError:
+        raise ValueError(f"不支持的噪声滤波方法: {method}")
+    return smoother(_as_array(values), window, **options)
+
+
+__all__ = [
+    'moving_average',
+    'savitzky_golay',
+    'gaussian_smooth',
+    'rolling_min',
+    'rolling_min_baseline',
+    'als_baseline',
+    'estimate_baseline',
+    'smooth',
+    'FILTER_METHODS',
+    'BASELINE_METHODS',
+]
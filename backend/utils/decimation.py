@@ -0,0 +1,79 @@
+"""
+时间序列最小/最大值降采样
+Streaming Min/Max Decimation
+
+把时间范围按目标像素宽度等分为桶，每个桶只保留最小值和最大值两个点（按出现顺序），
+折线图形状与全量数据一致。数据按时间顺序逐点输入，内存占用与数据量无关。
+"""
+
+from typing import List, Optional, Tuple
+
+# (ts, value)
+Point = Tuple[float, float]
+
+
+class MinMaxDecimator:
+    """
+    流式最小/最大值降采样器
+
+    用法：
+        decimator = MinMaxDecimator(start_ts, end_ts, width=800)
+        for ts, vmin, vmax in rows:          # rows 按 ts 升序
+            for point in decimator.add(ts, vmin, vmax):
+                emit(point)
+        for point in decimator.finish():
+            emit(point)
+    """
+
+    def __init__(self, start_ts: float, end_ts: float, width: int):
+        self.start_ts = start_ts
+        self.width = max(int(width), 1)
+        self.bucket_seconds = max(end_ts - start_ts, 1e-9) / self.width
+
+        self._bucket: Optional[int] = None
+        self._min: Optional[Point] = None
+        self._max: Optional[Point] = None
+
+    def _bucket_index(self, ts: float) -> int:
+        return min(int((ts - self.start_ts) / self.bucket_seconds), self.width - 1)
+
+    def _flush(self) -> List[Point]:
+        if self._min is None:
+            return []
+        if self._min == self._max:
+            points = [self._min]
+        elif self._min[0] <= self._max[0]:
+            points = [self._min, self._max]
+        else:
+            points = [self._max, self._min]
+        self._min = self._max = None
+        return points
+
+    def add(self, ts: float, value_min: float, value_max: Optional[float] = None) -> List[Point]:
+        """
+        输入一个点（或一个已汇总区间的min/max），返回因换桶而输出的点
+
+        Returns:
+            List[(ts, value)]: 上一个桶的min/max点，同一桶内返回空列表
+        """
+        if value_max is None:
+            value_max = value_min
+
+        bucket = self._bucket_index(ts)
+        emitted: List[Point] = []
+        if bucket != self._bucket:
+            emitted = self._flush()
+            self._bucket = bucket
+
+        if self._min is None or value_min < self._min[1]:
+            self._min = (ts, value_min)
+        if self._max is None or value_max > self._max[1]:
+            self._max = (ts, value_max)
+        return emitted
+
+    def finish(self) -> List[Point]:
+        """输出最后一个桶"""
+        return self._flush()
+
+
+__all__ = ['MinMaxDecimator']
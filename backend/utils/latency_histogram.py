@@ -0,0 +1,75 @@
+"""
+延迟直方图
+Latency Histogram
+
+固定桶边界（毫秒）的累计直方图，记录 O(log 桶数)，内存固定；
+分位数按桶上界估计（不超过实际记录的最大值），用于发布延迟等运行时统计。
+"""
+
+import bisect
+from typing import Any, Dict, List, Optional, Sequence
+
+# 默认桶上界（毫秒），最后一个桶为 +inf
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class LatencyHistogram:
+    """延迟直方图（单位：秒输入，毫秒展示）"""
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.bounds: List[float] = sorted(float(b) for b in buckets_ms)
+        self.reset()
+
+    def reset(self):
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms: Optional[float] = None
+        self.max_ms: Optional[float] = None
+
+    def record(self, seconds: float):
+        """记录一次延迟（秒）"""
+        ms = max(seconds, 0.0) * 1000.0
+        self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if self.min_ms is None or ms < self.min_ms:
+            self.min_ms = ms
+        if self.max_ms is None or ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q: float) -> Optional[float]:
+        """估计第 q 分位数（0~100），返回所在桶的上界（毫秒），不超过记录到的最大值"""
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= rank and bucket_count:
+                if index < len(self.bounds):
+                    return min(self.bounds[index], self.max_ms)
+                return self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = {f"le_{bound:g}ms": count for bound, count in zip(self.bounds, self.counts)}
+        buckets["inf"] = self.counts[-1]
+
+        def percentile_ms(q: float) -> Optional[float]:
+            value = self.percentile(q)
+            return round(value, 3) if value is not None else None
+
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "min_ms": round(self.min_ms, 3) if self.min_ms is not None else None,
+            "max_ms": round(self.max_ms, 3) if self.max_ms is not None else None,
+            "p50_ms": percentile_ms(50),
+            "p95_ms": percentile_ms(95),
+            "p99_ms": percentile_ms(99),
+            "buckets": buckets,
+        }
+
+
+__all__ = ['LatencyHistogram', 'DEFAULT_BUCKETS_MS']
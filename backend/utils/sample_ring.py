@@ -0,0 +1,89 @@
+"""
+带时间戳的双通道采样环形缓冲区
+Timestamped Two-Channel Sample Ring Buffer
+
+以 array('d') 固定容量存储 [timestamp, a, b]，写满后覆盖最旧的采样。
+每个采样有单调递增的序号，消费者各自保存读取位置（cursor），
+以任意频率调用 read_since 取回新采样；读取落后超过容量时返回丢失的采样数。
+"""
+
+from array import array
+from typing import List, Optional, Tuple
+
+# 每个采样的字段数：时间戳、A通道、B通道
+FIELDS = 3
+DEFAULT_CAPACITY = 3000
+
+
+class SampleRingBuffer:
+    """固定容量的带时间戳采样环形缓冲区"""
+
+    __slots__ = ("_data", "_capacity", "_next_seq")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity 必须大于0")
+        self._capacity = capacity
+        self._data = array("d", bytes(capacity * FIELDS * 8))
+        self._next_seq = 0
+
+    def append(self, timestamp: float, signal_a: float, signal_b: float) -> int:
+        """写入一个采样，返回其序号"""
+        seq = self._next_seq
+        index = (seq % self._capacity) * FIELDS
+        self._data[index] = timestamp
+        self._data[index + 1] = signal_a
+        self._data[index + 2] = signal_b
+        self._next_seq = seq + 1
+        return seq
+
+    @property
+    def oldest_seq(self) -> int:
+        return max(self._next_seq - self._capacity, 0)
+
+    @property
+    def next_seq(self) -> int:
+        """下一个写入的序号；作为 cursor 时只读取此后写入的采样"""
+        return self._next_seq
+
+    def read_since(self, cursor: int, max_samples: Optional[int] = None
+                   ) -> Tuple[List[Tuple[float, float, float]], int, int]:
+        """
+        读取序号 >= cursor 的采样
+
+        Returns:
+            (samples, next_cursor, lost): samples 为 [(timestamp, a, b), ...]；
+            next_cursor 传给下一次调用；lost 为已被覆盖而没有读到的采样数
+        """
+        start = max(cursor, self.oldest_seq)
+        lost = start - cursor if cursor < start else 0
+        stop = self._next_seq
+        if max_samples is not None:
+            stop = min(stop, start + max_samples)
+
+        data = self._data
+        samples = []
+        for seq in range(start, stop):
+            index = (seq % self._capacity) * FIELDS
+            samples.append((data[index], data[index + 1], data[index + 2]))
+        return samples, stop, lost
+
+    def latest(self) -> Optional[Tuple[float, float, float]]:
+        """最新的采样"""
+        if not self._next_seq:
+            return None
+        index = ((self._next_seq - 1) % self._capacity) * FIELDS
+        return self._data[index], self._data[index + 1], self._data[index + 2]
+
+    def __len__(self) -> int:
+        return self._next_seq - self.oldest_seq
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __repr__(self) -> str:
+        return f"SampleRingBuffer(samples={len(self)}, capacity={self._capacity}, next_seq={self._next_seq})"
+
+
+__all__ = ['SampleRingBuffer', 'FIELDS']
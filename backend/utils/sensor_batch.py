@@ -0,0 +1,216 @@
+"""
+传感器数据列式批次
+Columnar Sensor Data Batch
+
+按设备分列存储：时间戳（int64 纳秒）、数值（float64）以及单位/数据类型/质量的单字节编码，
+设备ID和单位字符串驻留（intern）后只保存一份。每个数据点约 19 字节，追加时不做模型校验；
+SensorDataPoint 模型只在 API 边界通过 from_point / to_points 转换。
+"""
+
+import sys
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from models.experiment_data_models import SensorDataPoint, DataType, DataQuality
+
+# 枚举 <-> 单字节编码
+_DATA_TYPES: List[DataType] = list(DataType)
+_DATA_TYPE_CODES: Dict[DataType, int] = {member: code for code, member in enumerate(_DATA_TYPES)}
+_QUALITIES: List[DataQuality] = list(DataQuality)
+_QUALITY_CODES: Dict[DataQuality, int] = {member: code for code, member in enumerate(_QUALITIES)}
+
+
+def to_ns(timestamp) -> int:
+    """datetime / 秒级时间戳 / 纳秒整数 -> 纳秒整数"""
+    if isinstance(timestamp, datetime):
+        return int(timestamp.timestamp() * 1_000_000) * 1000
+    if isinstance(timestamp, float):
+        return int(timestamp * 1e9)
+    return int(timestamp)
+
+
+class DeviceSeries:
+    """单个设备的列式数据"""
+
+    __slots__ = ("device_id", "timestamps", "values", "unit_codes", "type_codes", "quality_codes")
+
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.timestamps = array("q")     # int64 纳秒
+        self.values = array("d")         # float64
+        self.unit_codes = array("B")
+        self.type_codes = array("B")
+        self.quality_codes = array("B")
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def times_ns(self) -> np.ndarray:
+        """时间戳数组副本（int64 纳秒）"""
+        return np.array(self.timestamps, dtype=np.int64)
+
+    def values_array(self) -> np.ndarray:
+        """数值数组副本（float64）"""
+        return np.array(self.values, dtype=np.float64)
+
+    def times_minutes(self) -> np.ndarray:
+        """相对首个数据点的时间（分钟）"""
+        times = self.times_ns()
+        if times.size == 0:
+            return times.astype(np.float64)
+        return (times - times[0]) / 60e9
+
+    def primary_type(self) -> Optional[DataType]:
+        """该设备最后一个数据点的数据类型"""
+        return _DATA_TYPES[self.type_codes[-1]] if self.type_codes else None
+
+
+class SensorDataBatch:
+    """
+    一个实验的列式传感器数据
+
+    - append: 追加一个采样值（热路径，不构造模型）
+    - append_point: 从 SensorDataPoint 追加（API 边界）
+    - series / devices: 按设备获取连续数组
+    - to_points: 转换回 SensorDataPoint 列表（仅在需要返回模型时使用）
+    """
+
+    def __init__(self, experiment_id: str):
+        self.experiment_id = experiment_id
+        self._series: Dict[str, DeviceSeries] = {}
+        self._units: List[str] = []
+        self._unit_codes: Dict[str, int] = {}
+        self._size = 0
+        self._min_ns: Optional[int] = None
+        self._max_ns: Optional[int] = None
+
+    # ============= 写入 =============
+
+    def _unit_code(self, unit: str) -> int:
+        code = self._unit_codes.get(unit)
+        if code is None:
+            if len(self._units) >= 256:
+                raise ValueError("单位种类超过256种")
+            code = len(self._units)
+            self._units.append(sys.intern(unit))
+            self._unit_codes[self._units[code]] = code
+        return code
+
+    def append(self, device_id: str, timestamp, value: float, unit: str = "",
+               data_type: DataType = DataType.DETECTOR,
+               quality: DataQuality = DataQuality.GOOD):
+        """追加一个采样值"""
+        series = self._series.get(device_id)
+        if series is None:
+            device_id = sys.intern(device_id)
+            series = self._series[device_id] = DeviceSeries(device_id)
+
+        ts = to_ns(timestamp)
+        series.timestamps.append(ts)
+        series.values.append(value)
+        series.unit_codes.append(self._unit_code(unit))
+        series.type_codes.append(_DATA_TYPE_CODES[DataType(data_type)])
+        series.quality_codes.append(_QUALITY_CODES[DataQuality(quality)])
+
+        self._size += 1
+        if self._min_ns is None or ts < self._min_ns:
+            self._min_ns = ts
+        if self._max_ns is None or ts > self._max_ns:
+            self._max_ns = ts
+
+    def append_point(self, point: SensorDataPoint):
+        """从 SensorDataPoint 追加"""
+        self.append(point.device_id, point.timestamp, point.value, point.unit,
+                    point.data_type, point.quality)
+
+    # ============= 读取 =============
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    @property
+    def devices(self) -> List[str]:
+        return list(self._series)
+
+    def series(self, device_id: str) -> Optional[DeviceSeries]:
+        return self._series.get(device_id)
+
+    def iter_series(self) -> Iterator[DeviceSeries]:
+        return iter(self._series.values())
+
+    def find_series(self, device_id: Optional[str] = None,
+                    data_type: DataType = DataType.DETECTOR) -> Optional[DeviceSeries]:
+        """按设备ID查找；未指定时返回第一个指定类型的设备，都没有则返回数据最多的设备"""
+        if device_id:
+            return self._series.get(device_id)
+        for series in self._series.values():
+            if series.primary_type() == data_type:
+                return series
+        return max(self._series.values(), key=len, default=None)
+
+    def time_range(self) -> Tuple[Optional[datetime], Optional[datetime]]:
+        """最早和最晚数据点时间"""
+        if self._min_ns is None:
+            return None, None
+        return (datetime.fromtimestamp(self._min_ns / 1e9),
+                datetime.fromtimestamp(self._max_ns / 1e9))
+
+    @property
+    def nbytes(self) -> int:
+        """列数据占用字节数"""
+        return sum(
+            len(s) * (s.timestamps.itemsize + s.values.itemsize + 3)
+            for s in self._series.values()
+        )
+
+    def with_values(self, series: DeviceSeries, values: np.ndarray) -> "SensorDataBatch":
+        """生成只包含该设备、数值替换为 values 的新批次（用于保存处理结果）"""
+        batch = SensorDataBatch(self.experiment_id)
+        processed = DeviceSeries(series.device_id)
+        processed.timestamps = array("q", series.timestamps)
+        processed.values = array("d", np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        processed.unit_codes = array("B", series.unit_codes)
+        processed.type_codes = array("B", series.type_codes)
+        processed.quality_codes = array("B", series.quality_codes)
+        batch._series[series.device_id] = processed
+        batch._units = list(self._units)
+        batch._unit_codes = dict(self._unit_codes)
+        batch._size = len(processed)
+        if processed.timestamps:
+            batch._min_ns = min(processed.timestamps)
+            batch._max_ns = max(processed.timestamps)
+        return batch
+
+    def to_points(self, device_id: Optional[str] = None, limit: Optional[int] = None) -> List[SensorDataPoint]:
+        """转换为 SensorDataPoint 列表（API 边界）"""
+        points: List[SensorDataPoint] = []
+        for series in self._series.values():
+            if device_id and series.device_id != device_id:
+                continue
+            for i in range(len(series)):
+                if limit is not None and len(points) >= limit:
+                    return points
+                ts_ns = series.timestamps[i]
+                points.append(SensorDataPoint(
+                    data_id=f"{self.experiment_id}_{series.device_id}_{ts_ns // 1_000_000}_{i}",
+                    device_id=series.device_id,
+                    experiment_id=self.experiment_id,
+                    timestamp=datetime.fromtimestamp(ts_ns / 1e9),
+                    value=series.values[i],
+                    unit=self._units[series.unit_codes[i]],
+                    data_type=_DATA_TYPES[series.type_codes[i]],
+                    quality=_QUALITIES[series.quality_codes[i]]
+                ))
+        return points
+
+    def __repr__(self) -> str:
+        return f"SensorDataBatch(experiment_id={self.experiment_id!r}, points={self._size}, devices={len(self._series)})"
+
+
+__all__ = ['SensorDataBatch', 'DeviceSeries', 'to_ns']
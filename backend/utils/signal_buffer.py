@@ -0,0 +1,157 @@
+"""
+检测器双通道信号缓冲区
+Compact Two-Channel Detector Signal Buffer
+
+以 array('d') 交错存储 [a0, b0, a1, b1, ...]，每个数据点固定 16 字节。
+容量按倍数预分配，追加为均摊 O(1)；扩容时换用新数组而不是原地调整大小，
+因此已经导出的切片视图始终有效，且不会阻塞后续追加。
+"""
+
+from array import array
+from typing import Iterator, List, Optional, Sequence
+
+# 每个数据点的通道数（A/B 双通道）
+CHANNELS = 2
+# 初始容量（数据点数）
+DEFAULT_CAPACITY = 4096
+
+
+class DetectorSignalBuffer:
+    """
+    双通道可增长信号缓冲区
+
+    - append / append_point: 均摊 O(1) 追加
+    - view: 零拷贝切片视图（memoryview，形状 [n, 2]，格式 'd'）
+    - as_memoryview / __buffer__: 缓冲区协议导出，可直接交给 numpy.frombuffer
+    - 下标访问、切片、迭代与原 [[a, b], ...] 列表格式兼容
+    """
+
+    __slots__ = ("_data", "_size")
+
+    def __init__(self, points: Optional[Sequence[Sequence[float]]] = None,
+                 capacity: int = DEFAULT_CAPACITY):
+        self._data = array("d", bytes(max(capacity, 1) * CHANNELS * 8))
+        self._size = 0
+        if points:
+            self.extend(points)
+
+    # ============= 写入 =============
+
+    def _grow(self, min_points: int):
+        """扩容：分配新数组并复制已有数据，旧数组仍被已导出的视图持有"""
+        capacity = len(self._data) // CHANNELS
+        while capacity < min_points:
+            capacity *= 2
+        data = array("d", bytes(capacity * CHANNELS * 8))
+        data[:self._size * CHANNELS] = self._data[:self._size * CHANNELS]
+        self._data = data
+
+    def append(self, signal_a: float, signal_b: float):
+        """追加一个数据点"""
+        index = self._size * CHANNELS
+        if index + CHANNELS > len(self._data):
+            self._grow(self._size + 1)
+        self._data[index] = signal_a
+        self._data[index + 1] = signal_b
+        self._size += 1
+
+    def append_point(self, point: Sequence[float]):
+        """追加一个 [signal_a, signal_b] 格式的数据点"""
+        self.append(float(point[0]), float(point[1]))
+
+    def extend(self, points: Sequence[Sequence[float]]):
+        """批量追加数据点"""
+        if len(self._data) < (self._size + len(points)) * CHANNELS:
+            self._grow(self._size + len(points))
+        for point in points:
+            self.append_point(point)
+
+    def clear(self):
+        """清空数据（保留容量）"""
+        self._data = array("d", bytes(len(self._data) * 8))
+        self._size = 0
+
+    # ============= 读取 =============
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._size)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self.tolist(start, stop)
+
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("signal buffer index out of range")
+        return [self._data[index * CHANNELS], self._data[index * CHANNELS + 1]]
+
+    def __iter__(self) -> Iterator[List[float]]:
+        data = self._data
+        for i in range(0, self._size * CHANNELS, CHANNELS):
+            yield [data[i], data[i + 1]]
+
+    def _bounds(self, start: int, stop: Optional[int]):
+        start, stop, _ = slice(start, stop).indices(self._size)
+        return start, max(start, stop)
+
+    def view(self, start: int = 0, stop: Optional[int] = None) -> memoryview:
+        """
+        零拷贝切片视图
+
+        Returns:
+            memoryview: 只读，格式 'd'，形状 [n, 2]；空范围时为长度0的一维视图
+            （memoryview 无法 cast 出含0的形状）
+        """
+        start, stop = self._bounds(start, stop)
+        if start == stop:
+            return memoryview(array("d")).toreadonly()
+        flat = memoryview(self._data)[start * CHANNELS:stop * CHANNELS]
+        return flat.cast("B").cast("d", [stop - start, CHANNELS]).toreadonly()
+
+    def channel(self, index: int, start: int = 0, stop: Optional[int] = None) -> memoryview:
+        """单通道零拷贝视图（步长为2，index=0为A通道，1为B通道）"""
+        start, stop = self._bounds(start, stop)
+        return memoryview(self._data)[start * CHANNELS + index:stop * CHANNELS:CHANNELS].toreadonly()
+
+    def as_memoryview(self) -> memoryview:
+        """缓冲区协议导出全部有效数据"""
+        return self.view()
+
+    def __buffer__(self, flags: int) -> memoryview:
+        # PEP 688 (Python 3.12+): 使 memoryview(buffer) / numpy.asarray(buffer) 直接可用
+        return self.view()
+
+    def tobytes(self, start: int = 0, stop: Optional[int] = None) -> bytes:
+        """导出交错存储的原始字节"""
+        return self.view(start, stop).tobytes()
+
+    def tolist(self, start: int = 0, stop: Optional[int] = None) -> List[List[float]]:
+        """转换为 [[signal_a, signal_b], ...] 列表"""
+        return self.view(start, stop).tolist()
+
+    def tail(self, count: int) -> List[List[float]]:
+        """最后 count 个数据点"""
+        return self.tolist(max(self._size - count, 0))
+
+    @property
+    def capacity(self) -> int:
+        """当前容量（数据点数）"""
+        return len(self._data) // CHANNELS
+
+    @property
+    def nbytes(self) -> int:
+        """已分配内存字节数"""
+        return len(self._data) * self._data.itemsize
+
+    def __repr__(self) -> str:
+        return f"DetectorSignalBuffer(points={self._size}, capacity={self.capacity})"
+
+
+__all__ = ['DetectorSignalBuffer', 'CHANNELS']